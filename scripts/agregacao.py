@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Agregação em passagem única (streaming) dos registros de monitoramento do PRAD.
+
+Usado por `indicadores_prad.py` e `gerar_visuais.py`: cada grupo (por exemplo
+parcela+data ou espécie+data) guarda apenas somas, contagens e o total de
+vivos por espécie, de modo que a memória depende do número de grupos e não
+do número de linhas do CSV.
+
+As linhas do CSV são convertidas uma única vez em `Registro` (valores já
+tipados) por `ler_registros`; células inválidas são contadas em um
+`RelatorioValidacao` em vez de descartadas em silêncio.
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import csv
+import math
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from operator import attrgetter, itemgetter
+
+CHAVE_PARCELA_DATA = ('parcela', 'data')
+CHAVE_ESPECIE_DATA = ('especie', 'data')
+
+# Abaixo deste tamanho (bytes) `agregar_paralelo` não compensa o custo de criar processos
+TAMANHO_MINIMO_SHARD = 4 * 1024 * 1024
+
+
+def parse_float(x, default=None):
+    try:
+        if x is None or x == '':
+            return default
+        return float(x)
+    except Exception:
+        return default
+
+
+def _inteiro(x):
+    return int(float(x))
+
+
+Registro = namedtuple('Registro', [
+    'parcela', 'data', 'bioma', 'especie', 'lat', 'lon',
+    'vivas', 'totais', 'altura', 'diametro', 'copa', 'invasoras',
+])
+
+# Colunas de texto, na ordem dos primeiros campos do Registro
+CAMPOS_TEXTO = ('parcela', 'data', 'bioma', 'especie')
+
+# coluna do CSV -> (campo do Registro, conversor, valor para célula vazia/inválida)
+CAMPOS_NUMERICOS = (
+    ('coordenada_lat', 'lat', float, None),
+    ('coordenada_lon', 'lon', float, None),
+    ('plantadas_vivas', 'vivas', _inteiro, 0),
+    ('plantadas_totais', 'totais', _inteiro, 0),
+    ('altura_m', 'altura', float, None),
+    ('diametro_cm', 'diametro', float, None),
+    ('cobertura_copa_pct', 'copa', float, None),
+    ('cobertura_invasoras_pct', 'invasoras', float, None),
+)
+
+# Campos reais com soma e contagem próprias em `AcumuladorGrupo` (soma_<campo>, n_<campo>)
+METRICAS_REAIS = ('altura', 'diametro', 'copa', 'invasoras')
+
+
+class RelatorioValidacao:
+    """
+    Contagem de células numéricas inválidas por coluna, com alguns exemplos, e parcelas
+    cujos dados divergem de uma referência externa (ex.: bioma do IBGE no ponto).
+    """
+
+    MAX_EXEMPLOS = 5
+
+    def __init__(self):
+        self.linhas = 0
+        self.invalidas = {}
+        self.exemplos = []
+        self.divergencias = []  # (parcela, coluna, valor no CSV, referência)
+
+    def registrar(self, linha, coluna, valor):
+        self.invalidas[coluna] = self.invalidas.get(coluna, 0) + 1
+        if len(self.exemplos) < self.MAX_EXEMPLOS:
+            self.exemplos.append((linha, coluna, valor))
+
+    def divergencia(self, parcela, coluna, valor, referencia):
+        self.divergencias.append((parcela, coluna, valor, referencia))
+
+    def mesclar(self, outro, linha_inicial=0):
+        """Incorpora outro relatório (`linha_inicial` = linhas do arquivo antes das dele)."""
+        self.linhas += outro.linhas
+        for coluna, n in outro.invalidas.items():
+            self.invalidas[coluna] = self.invalidas.get(coluna, 0) + n
+        for linha, coluna, valor in outro.exemplos:
+            if len(self.exemplos) < self.MAX_EXEMPLOS:
+                self.exemplos.append((linha_inicial + linha if linha is not None else None, coluna, valor))
+        self.divergencias.extend(outro.divergencias)
+
+    def estado(self):
+        """Representação serializável (JSON) do relatório."""
+        return {'linhas': self.linhas, 'invalidas': self.invalidas, 'exemplos': self.exemplos,
+                'divergencias': self.divergencias}
+
+    @classmethod
+    def de_estado(cls, estado):
+        val = cls()
+        val.linhas = estado['linhas']
+        val.invalidas = dict(estado['invalidas'])
+        val.exemplos = [tuple(e) for e in estado['exemplos']]
+        val.divergencias = [tuple(d) for d in estado.get('divergencias', ())]
+        return val
+
+    @property
+    def total(self):
+        return sum(self.invalidas.values())
+
+    def resumo(self):
+        if not self.total:
+            partes = [f'{self.linhas} linhas lidas, nenhuma célula inválida.']
+        else:
+            partes = [f'{self.linhas} linhas lidas, {self.total} células inválidas (tratadas como vazias):']
+        for coluna, n in sorted(self.invalidas.items()):
+            partes.append(f'  - {coluna}: {n}')
+        for linha, coluna, valor in self.exemplos:
+            partes.append(f'  ex.: linha {linha}, {coluna}={valor!r}')
+        if self.divergencias:
+            partes.append(self.resumo_divergencias())
+        return '\n'.join(partes)
+
+    def resumo_divergencias(self):
+        partes = [f'{len(self.divergencias)} parcela(s) divergem da referência:']
+        for parcela, coluna, valor, referencia in self.divergencias[:self.MAX_EXEMPLOS]:
+            partes.append(f'  - parcela {parcela}: {coluna}={valor!r}, referência {referencia!r}')
+        return '\n'.join(partes)
+
+
+def ler_cabecalho(reader, obrigatorias=()):
+    cols = [c.strip() for c in next(reader, [])]
+    missing = [c for c in obrigatorias if c not in cols]
+    if missing:
+        raise ValueError(f'Colunas faltantes no CSV: {missing}')
+    return cols
+
+
+def conversor(cols, validacao=None):
+    """Função que converte uma linha (lista de células) em `Registro`, dado o cabeçalho `cols`."""
+    pos = {c: i for i, c in enumerate(cols)}
+    textos = [pos.get(coluna) for coluna in CAMPOS_TEXTO]
+    numericos = [(pos.get(coluna), coluna, conv, padrao) for coluna, _, conv, padrao in CAMPOS_NUMERICOS]
+    indices = textos + [i for i, _, _, _ in numericos]
+    completo = None not in indices
+    pegar = itemgetter(*indices) if completo else None
+    largura_minima = max(indices) + 1 if completo else 0
+
+    def converter(row, linha=None):
+        # Caminho rápido (campos na ordem de CAMPOS_TEXTO + CAMPOS_NUMERICOS): células vazias
+        # ou válidas; float/int já aceitam espaços nas bordas. Qualquer erro cai em `_celula_a_celula`.
+        if completo and len(row) >= largura_minima:
+            parcela, data, bioma, especie, lat, lon, vivas, totais, altura, diametro, copa, invasoras = pegar(row)
+            try:
+                reg = Registro(
+                    parcela.strip(), data.strip(), bioma.strip(), especie.strip(),
+                    float(lat) if lat else None, float(lon) if lon else None,
+                    int(vivas) if vivas else 0, int(totais) if totais else 0,
+                    float(altura) if altura else None, float(diametro) if diametro else None,
+                    float(copa) if copa else None, float(invasoras) if invasoras else None)
+            except (ValueError, OverflowError):
+                pass
+            else:
+                if validacao is not None:
+                    validacao.linhas += 1
+                return reg
+        return _celula_a_celula(row, linha)
+
+    def _celula_a_celula(row, linha):
+        largura = len(row)
+        valores = [row[i].strip() if i is not None and i < largura else '' for i in textos]
+        for i, coluna, conv, padrao in numericos:
+            bruto = row[i].strip() if i is not None and i < largura else ''
+            if not bruto:
+                valores.append(padrao)
+                continue
+            try:
+                valores.append(conv(bruto))
+            except (ValueError, OverflowError):
+                valores.append(padrao)
+                if validacao is not None:
+                    validacao.registrar(linha, coluna, bruto)
+        if validacao is not None:
+            validacao.linhas += 1
+        return Registro._make(valores)
+
+    return converter
+
+
+def _converter(reader, cols, validacao=None, linha_inicial=0):
+    """Converte as linhas de `reader` em `Registro`s (`linha_inicial` = linhas antes do reader)."""
+    converter = conversor(cols, validacao)
+    for row in reader:
+        if row:
+            yield converter(row, linha_inicial + reader.line_num)
+
+
+def ler_registros(path, obrigatorias=(), validacao=None):
+    """
+    Lê o CSV e produz `Registro`s, convertendo cada célula uma única vez.
+    Levanta ValueError se faltarem colunas obrigatórias.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        cols = ler_cabecalho(reader, obrigatorias)
+        yield from _converter(reader, cols, validacao)
+
+
+def media_soma(soma, n):
+    """
+    Média de uma soma em float simples. O resultado é arredondado a 12 algarismos
+    significativos, o que descarta o erro de arredondamento acumulado na soma (da
+    ordem de n·ε) e reproduz a média exata de medições decimais (ex.: 1.175, não 1.17499…).
+    """
+    return float(f'{soma / n:.12g}') if n else None
+
+
+class AcumuladorGrupo:
+    """
+    Somas e contagens correntes de um grupo de linhas do monitoramento.
+    As somas reais são floats simples acumulados na ordem das linhas; a correção
+    do erro de arredondamento é feita uma vez por grupo, em `media_soma`.
+    """
+
+    __slots__ = (
+        'linhas', 'vivas', 'totais',
+        'soma_altura', 'n_altura', 'soma_diametro', 'n_diametro',
+        'soma_copa', 'n_copa', 'soma_invasoras', 'n_invasoras',
+        'vivos_por_sp', 'biomas',
+    )
+
+    def __init__(self):
+        self.linhas = self.vivas = self.totais = 0
+        self.soma_altura = self.soma_diametro = self.soma_copa = self.soma_invasoras = 0.0
+        self.n_altura = self.n_diametro = self.n_copa = self.n_invasoras = 0
+        self.vivos_por_sp = {}
+        self.biomas = set()
+
+    def adicionar(self, reg):
+        """Acumula um `Registro` (campos ausentes chegam como None)."""
+        _, _, bioma, especie, _, _, vivas, totais, altura, diametro, copa, invasoras = reg
+        self.linhas += 1
+        self.vivas += vivas
+        self.totais += totais
+        if altura is not None:
+            self.soma_altura += altura
+            self.n_altura += 1
+        if diametro is not None:
+            self.soma_diametro += diametro
+            self.n_diametro += 1
+        if copa is not None:
+            self.soma_copa += copa
+            self.n_copa += 1
+        if invasoras is not None:
+            self.soma_invasoras += invasoras
+            self.n_invasoras += 1
+        vivos = self.vivos_por_sp
+        vivos[especie] = vivos.get(especie, 0) + vivas
+        if bioma:
+            self.biomas.add(bioma)
+
+    def mesclar(self, outro):
+        """Incorpora o acumulador do mesmo grupo vindo de outro shard."""
+        self.linhas += outro.linhas
+        self.vivas += outro.vivas
+        self.totais += outro.totais
+        self.soma_altura += outro.soma_altura
+        self.n_altura += outro.n_altura
+        self.soma_diametro += outro.soma_diametro
+        self.n_diametro += outro.n_diametro
+        self.soma_copa += outro.soma_copa
+        self.n_copa += outro.n_copa
+        self.soma_invasoras += outro.soma_invasoras
+        self.n_invasoras += outro.n_invasoras
+        for sp, v in outro.vivos_por_sp.items():
+            self.vivos_por_sp[sp] = self.vivos_por_sp.get(sp, 0) + v
+        self.biomas |= outro.biomas
+
+    def estado(self):
+        """Representação serializável (JSON) do acumulador."""
+        return {
+            'linhas': self.linhas, 'vivas': self.vivas, 'totais': self.totais,
+            'somas': [[getattr(self, 'soma_' + m), getattr(self, 'n_' + m)] for m in METRICAS_REAIS],
+            'vivos_por_sp': self.vivos_por_sp, 'biomas': sorted(self.biomas),
+        }
+
+    @classmethod
+    def de_estado(cls, estado):
+        acc = cls()
+        acc.linhas = estado['linhas']
+        acc.vivas = estado['vivas']
+        acc.totais = estado['totais']
+        for m, (soma, n) in zip(METRICAS_REAIS, estado['somas']):
+            setattr(acc, 'soma_' + m, soma)
+            setattr(acc, 'n_' + m, n)
+        acc.vivos_por_sp = dict(estado['vivos_por_sp'])
+        acc.biomas = set(estado['biomas'])
+        return acc
+
+    @property
+    def sobrevivencia(self):
+        return self.vivas / self.totais * 100.0 if self.totais > 0 else None
+
+    @property
+    def altura_media(self):
+        return media_soma(self.soma_altura, self.n_altura)
+
+    @property
+    def diametro_medio(self):
+        return media_soma(self.soma_diametro, self.n_diametro)
+
+    @property
+    def copa_media(self):
+        return media_soma(self.soma_copa, self.n_copa)
+
+    @property
+    def invasoras_media(self):
+        return media_soma(self.soma_invasoras, self.n_invasoras)
+
+    @property
+    def riqueza(self):
+        """Número de espécies registradas no grupo."""
+        return len(self.especies)
+
+    @property
+    def especies(self):
+        """Espécies registradas no grupo (com ou sem indivíduos vivos)."""
+        return {sp for sp in self.vivos_por_sp if sp}
+
+    @property
+    def riqueza_viva(self):
+        """Número de espécies com ao menos um indivíduo vivo."""
+        return sum(1 for v in self.vivos_por_sp.values() if v > 0)
+
+    @property
+    def shannon(self):
+        total = sum(self.vivos_por_sp.values())
+        if total <= 0:
+            return 0.0
+        return -sum((v / total) * math.log(v / total) for v in self.vivos_por_sp.values() if v > 0)
+
+
+def agregar(registros, chaves=(CHAVE_PARCELA_DATA,)):
+    """
+    Consome `registros` uma única vez e devolve, para cada chave de agrupamento
+    (tupla de nomes de campo do `Registro`), um dict {valores_da_chave: AcumuladorGrupo}.
+    """
+    destinos = [(attrgetter(*chave), {}) for chave in chaves]
+    for r in registros:
+        for chave_de, destino in destinos:
+            k = chave_de(r)
+            acc = destino.get(k)
+            if acc is None:
+                acc = destino[k] = AcumuladorGrupo()
+            acc.adicionar(r)
+    return {chave: destino for chave, (_, destino) in zip(chaves, destinos)}
+
+
+def _linhas_fatia(f, inicio, fim):
+    """Linhas (decodificadas) cujo primeiro byte está em [inicio, fim)."""
+    f.seek(max(inicio - 1, 0))
+    f.readline()  # cabeçalho (inicio=0) ou resto da linha que pertence ao shard anterior
+    pos = f.tell()
+    while pos < fim:
+        linha = f.readline()
+        if not linha:
+            break
+        pos += len(linha)
+        yield linha.decode('utf-8')
+
+
+def _agregar_fatia(path, cols, inicio, fim, chaves):
+    """Tarefa de um worker: agrega o intervalo de bytes [inicio, fim) do CSV."""
+    validacao = RelatorioValidacao()
+    with open(path, 'rb') as f:
+        reader = csv.reader(_linhas_fatia(f, inicio, fim))
+        grupos = agregar(_converter(reader, cols, validacao), chaves)
+        linhas_fisicas = reader.line_num
+    return grupos, validacao, linhas_fisicas
+
+
+def agregar_paralelo(path, chaves=(CHAVE_PARCELA_DATA,), workers=None, obrigatorias=(), validacao=None):
+    """
+    Igual a `agregar(ler_registros(path), chaves)`, mas divide o CSV em intervalos
+    de bytes alinhados a quebras de linha e agrega cada um em um processo
+    (`ProcessPoolExecutor`). Os parciais são mesclados na ordem do arquivo, então
+    a ordem dos grupos (primeira ocorrência) é a mesma do modo sequencial.
+    Campos entre aspas com quebra de linha não são suportados neste modo.
+    """
+    workers = workers or os.cpu_count() or 1
+    with open(path, newline='', encoding='utf-8') as f:
+        cols = ler_cabecalho(csv.reader(f), obrigatorias)
+    tamanho = os.path.getsize(path)
+    if workers <= 1 or tamanho < TAMANHO_MINIMO_SHARD:
+        return agregar(ler_registros(path, obrigatorias, validacao), chaves)
+
+    limites = [tamanho * i // workers for i in range(workers + 1)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tarefas = [pool.submit(_agregar_fatia, path, cols, a, b, chaves) for a, b in zip(limites[:-1], limites[1:])]
+        parciais = [t.result() for t in tarefas]
+
+    grupos = {chave: {} for chave in chaves}
+    linha_inicial = 1  # cabeçalho
+    for parcial, val, linhas_fisicas in parciais:
+        for chave, destino in grupos.items():
+            for k, acc in parcial[chave].items():
+                if k in destino:
+                    destino[k].mesclar(acc)
+                else:
+                    destino[k] = acc
+        if validacao is not None:
+            validacao.mesclar(val, linha_inicial)
+        linha_inicial += linhas_fisicas
+    return grupos
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Agrupamento hierárquico das parcelas por zoom, para o mapa de projetos grandes.
+
+Cada parcela vira um ponto (centróide do polígono em parcelas.geojson ou, sem
+polígono, a coordenada_lat/lon do CSV) com os indicadores da última campanha.
+Do zoom mais detalhado para o menos detalhado, os grupos do nível anterior que
+caem na mesma célula de uma grade de `RAIO_PIXELS` pixels (Web Mercator) são
+fundidos — cada nível é construído a partir do anterior, então a hierarquia é
+aninhada e o custo é O(parcelas) por zoom.
+
+Cada grupo leva o número de parcelas, a média de sobrevivência e de cobertura de
+copa e a soma dos alertas críticos/de atenção; o mapa desenha esses marcadores
+até o zoom em que os polígonos passam a ser mostrados.
+
+Uso:
+  python scripts/agrupamento.py portfolio/Simulado_PE/geo/parcelas.geojson 10 14
+      [-i CSV] (coordenadas das parcelas sem polígono)
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import json
+import sys
+
+from agregacao import ler_registros
+from tiles_vetoriais import EXTENT, projetar
+
+RAIO_PIXELS = 60
+# campos de cada grupo no JSON do mapa
+CAMPOS_GRUPO = ('lat', 'lon', 'parcelas', 'sobrevivencia_pct', 'cobertura_copa_pct', 'alertas_criticos', 'alertas_atencao')
+
+
+def centroide(geometria):
+    """(lat, lon) do centróide (por área) do maior polígono; média dos vértices se a área for nula."""
+    tipo = geometria.get('type') if geometria else None
+    if tipo == 'Polygon':
+        poligonos = [geometria['coordinates']]
+    elif tipo == 'MultiPolygon':
+        poligonos = geometria['coordinates']
+    else:
+        return None
+    melhor = None
+    for aneis in poligonos:
+        anel = aneis[0] if aneis else []
+        if not anel:
+            continue
+        a = cx = cy = 0.0
+        for (x0, y0, *_), (x1, y1, *_) in zip(anel, anel[1:] + anel[:1]):
+            f = x0 * y1 - x1 * y0
+            a += f
+            cx += (x0 + x1) * f
+            cy += (y0 + y1) * f
+        if a:
+            ponto = (abs(a), cy / (3 * a), cx / (3 * a))
+        else:
+            ponto = (0.0, sum(p[1] for p in anel) / len(anel), sum(p[0] for p in anel) / len(anel))
+        if melhor is None or ponto[0] > melhor[0]:
+            melhor = ponto
+    return melhor[1:] if melhor else None
+
+
+def coordenadas_parcelas(path):
+    """{parcela: (lat, lon)} da primeira linha com coordenadas de cada parcela no CSV."""
+    coords = {}
+    for r in ler_registros(path):
+        if r.parcela not in coords and r.lat is not None and r.lon is not None:
+            coords[r.parcela] = (r.lat, r.lon)
+    return coords
+
+
+def pontos_parcelas(colecao, indicadores=None, coordenadas=None):
+    """
+    [(lat, lon, parcela)] — um ponto por parcela: centróide da feição ou, sem ela, a
+    coordenada do CSV. `indicadores` ({parcela: {campo: valor}}) limita às parcelas avaliadas.
+    """
+    pontos = {}
+    for f in (colecao or {}).get('features', []):
+        pid = (f.get('properties') or {}).get('parcela')
+        c = centroide(f.get('geometry'))
+        if pid is not None and c and pid not in pontos:
+            pontos[pid] = c
+    for pid, c in (coordenadas or {}).items():
+        pontos.setdefault(pid, c)
+    if indicadores is not None:
+        pontos = {pid: c for pid, c in pontos.items() if pid in indicadores}
+    return [(lat, lon, pid) for pid, (lat, lon) in pontos.items()]
+
+
+def agrupar(pontos, indicadores, zoom_min, zoom_max, raio=RAIO_PIXELS):
+    """
+    {zoom: [[lat, lon, parcelas, sobrevivência média, copa média, críticos, atenção], ...]}
+    para cada zoom de `zoom_min` a `zoom_max` (campos em CAMPOS_GRUPO).
+    """
+    # grupo: [soma lat, soma lon, parcelas, soma sobrev., n sobrev., soma copa, n copa, críticos, atenção]
+    nivel = []
+    for lat, lon, pid in pontos:
+        ind = indicadores.get(pid, {})
+        sobrev, copa = ind.get('sobrevivencia_pct'), ind.get('cobertura_copa_pct')
+        nivel.append([lat, lon, 1,
+                      sobrev or 0.0, int(sobrev is not None), copa or 0.0, int(copa is not None),
+                      int(ind.get('alertas_criticos') or 0), int(ind.get('alertas_atencao') or 0)])
+    celula = raio * EXTENT / 256.0
+    niveis = {}
+    for zoom in range(zoom_max, zoom_min - 1, -1):
+        celulas = {}
+        for g in nivel:
+            x, y = projetar(g[1] / g[2], g[0] / g[2], zoom)
+            chave = (int(x // celula), int(y // celula))
+            atual = celulas.get(chave)
+            if atual is None:
+                celulas[chave] = list(g)
+            else:
+                for k in range(len(g)):
+                    atual[k] += g[k]
+        nivel = list(celulas.values())
+        niveis[zoom] = [[round(g[0] / g[2], 6), round(g[1] / g[2], 6), g[2],
+                         round(g[3] / g[4], 1) if g[4] else None, round(g[5] / g[6], 1) if g[6] else None,
+                         g[7], g[8]] for g in nivel]
+    return dict(sorted(niveis.items()))
+
+
+def main(argv):
+    args = [a for i, a in enumerate(argv) if a != '-i' and (i == 0 or argv[i - 1] != '-i')]
+    if len(args) < 3:
+        print(__doc__)
+        return 2
+    coordenadas = {}
+    for i, a in enumerate(argv):
+        if a == '-i' and i + 1 < len(argv):
+            coordenadas = coordenadas_parcelas(argv[i + 1])
+    with open(args[0], 'r', encoding='utf-8') as f:
+        colecao = json.load(f)
+    pontos = pontos_parcelas(colecao, coordenadas=coordenadas)
+    for zoom, grupos in agrupar(pontos, {}, int(args[1]), int(args[2])).items():
+        print(f'z{zoom}: {len(grupos)} grupos ({len(pontos)} parcelas)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Base local (SQLite) com os registros de todas as campanhas de monitoramento.
+
+Comandos:
+  python scripts/base_monitoramento.py import planilhas/monitoramento_exemplo.csv portfolio/Simulado_PE/monitoramento_simulado.csv
+      importa (ou reimporta) os CSVs para `saidas/monitoramento.sqlite`, já tipados,
+      com índices em (parcela, data) e (especie, data)
+  python scripts/base_monitoramento.py consulta "SELECT ... FROM registros ..."
+      executa uma consulta SQL ad hoc e imprime o resultado como CSV
+  python scripts/base_monitoramento.py sobrevivencia --especie "Inga vera" --desde 2024-01-01
+      sobrevivência da espécie por parcela e data (atalho para a pergunta mais comum)
+
+Opção comum: --db CAMINHO (padrão: saidas/monitoramento.sqlite).
+
+`indicadores_prad.py` e `gerar_visuais.py` aceitam `--db` para ler os agregados
+por SQL em vez de reler o CSV (ver `agregar_sql`).
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import csv
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import sys
+from contextlib import closing
+
+from agregacao import AcumuladorGrupo, CHAVE_PARCELA_DATA, METRICAS_REAIS, RelatorioValidacao, ler_registros
+
+DEFAULT_DB = os.path.join('saidas', 'monitoramento.sqlite')
+
+ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS arquivos (
+    arquivo TEXT PRIMARY KEY, sha256 TEXT, linhas INTEGER, validacao TEXT
+);
+CREATE TABLE IF NOT EXISTS registros (
+    arquivo TEXT NOT NULL,
+    parcela TEXT, data TEXT, bioma TEXT, especie TEXT,
+    lat REAL, lon REAL,
+    vivas INTEGER, totais INTEGER,
+    altura REAL, diametro REAL, copa REAL, invasoras REAL
+);
+CREATE INDEX IF NOT EXISTS idx_registros_parcela_data ON registros (parcela, data);
+CREATE INDEX IF NOT EXISTS idx_registros_especie_data ON registros (especie, data);
+CREATE INDEX IF NOT EXISTS idx_registros_arquivo ON registros (arquivo);
+'''
+
+# Colunas de `registros`, na ordem dos campos de `agregacao.Registro`
+COLUNAS = ('parcela', 'data', 'bioma', 'especie', 'lat', 'lon',
+           'vivas', 'totais', 'altura', 'diametro', 'copa', 'invasoras')
+
+
+class _SomaExata:
+    """Agregado SQL FSUM: soma com `math.fsum`, evitando o erro de arredondamento do SUM nativo."""
+
+    def __init__(self):
+        self.valores = []
+
+    def step(self, x):
+        if x is not None:
+            self.valores.append(x)
+
+    def finalize(self):
+        return math.fsum(self.valores)
+
+
+def conectar(path=DEFAULT_DB):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    con = sqlite3.connect(path)
+    con.executescript(ESQUEMA)
+    if 'validacao' not in [c[1] for c in con.execute('PRAGMA table_info(arquivos)')]:
+        # bases anteriores ao relatório de validação salvo: os arquivos são reimportados
+        con.execute('ALTER TABLE arquivos ADD COLUMN validacao TEXT')
+    con.create_aggregate('FSUM', 1, _SomaExata)
+    return con
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def importar(con, path, validacao=None):
+    """
+    Importa `path` (substituindo uma importação anterior do mesmo arquivo). Retorna nº de linhas.
+    O relatório de validação fica salvo com o arquivo; se ele já estava importado, é repetido em `validacao`.
+    """
+    arquivo = os.path.abspath(path)
+    sha = _sha256(path)
+    salvo = con.execute('SELECT sha256, linhas, validacao FROM arquivos WHERE arquivo = ?', (arquivo,)).fetchone()
+    if salvo and salvo[0] == sha and salvo[2] is not None:
+        if validacao is not None:
+            validacao.mesclar(RelatorioValidacao.de_estado(json.loads(salvo[2])))
+        return salvo[1]
+    val = RelatorioValidacao()
+    with con:
+        con.execute('DELETE FROM registros WHERE arquivo = ?', (arquivo,))
+        con.executemany(
+            f'INSERT INTO registros (arquivo, {", ".join(COLUNAS)}) VALUES (?{", ?" * len(COLUNAS)})',
+            ((arquivo,) + tuple(r) for r in ler_registros(path, validacao=val)),
+        )
+        linhas = con.execute('SELECT COUNT(*) FROM registros WHERE arquivo = ?', (arquivo,)).fetchone()[0]
+        con.execute('INSERT OR REPLACE INTO arquivos VALUES (?, ?, ?, ?)', (arquivo, sha, linhas, json.dumps(val.estado())))
+    if validacao is not None:
+        validacao.mesclar(val)
+    return linhas
+
+
+def validacao_importada(con, arquivo=None, validacao=None):
+    """Relatório de validação salvo na importação de `arquivo` (ou de todos os arquivos da base)."""
+    validacao = validacao if validacao is not None else RelatorioValidacao()
+    filtro, params = ('WHERE arquivo = ?', (os.path.abspath(arquivo),)) if arquivo else ('', ())
+    for (estado,) in con.execute(f'SELECT validacao FROM arquivos {filtro} ORDER BY arquivo', params):
+        if estado:
+            validacao.mesclar(RelatorioValidacao.de_estado(json.loads(estado)))
+    return validacao
+
+
+def agregar_sql(con, chaves=(CHAVE_PARCELA_DATA,), arquivo=None):
+    """
+    Agregados por grupo calculados em SQL (GROUP BY sobre os índices), na mesma
+    estrutura de `agregacao.agregar`: {chave: {valores_da_chave: AcumuladorGrupo}}.
+    `arquivo` restringe aos registros importados daquele CSV.
+    """
+    filtro, params = ('WHERE arquivo = ?', (os.path.abspath(arquivo),)) if arquivo else ('', ())
+    grupos = {}
+    for chave in chaves:
+        cols = ', '.join(chave)
+        destino = {}
+        cur = con.execute(f'''
+            SELECT {cols}, COUNT(*), SUM(vivas), SUM(totais),
+                   FSUM(altura), COUNT(altura), FSUM(diametro), COUNT(diametro),
+                   FSUM(copa), COUNT(copa), FSUM(invasoras), COUNT(invasoras)
+            FROM registros {filtro}
+            GROUP BY {cols}
+            ORDER BY MIN(rowid)
+        ''', params)
+        n = len(chave)
+        for row in cur:
+            acc = AcumuladorGrupo()
+            acc.linhas, acc.vivas, acc.totais = row[n], row[n + 1] or 0, row[n + 2] or 0
+            for m, soma, cont in zip(METRICAS_REAIS, row[n + 3:n + 11:2], row[n + 4:n + 12:2]):
+                setattr(acc, 'soma_' + m, soma if soma is not None else 0.0)
+                setattr(acc, 'n_' + m, cont)
+            destino[tuple(row[:n])] = acc
+        # biomas em consulta própria: GROUP_CONCAT(DISTINCT ...) não aceita separador e o
+        # padrão ',' quebraria nomes de bioma com vírgula
+        cur = con.execute(f'''
+            SELECT DISTINCT {cols}, bioma FROM registros {filtro}
+            {'AND' if filtro else 'WHERE'} bioma IS NOT NULL AND bioma != ''
+        ''', params)
+        for row in cur:
+            destino[tuple(row[:n])].biomas.add(row[n])
+        cur = con.execute(f'''
+            SELECT {cols}, especie, SUM(vivas) FROM registros {filtro}
+            GROUP BY {cols}, especie ORDER BY MIN(rowid)
+        ''', params)
+        for row in cur:
+            destino[tuple(row[:n])].vivos_por_sp[row[n] or ''] = row[n + 1] or 0
+        grupos[chave] = destino
+    return grupos
+
+
+def _imprimir_csv(cur):
+    w = csv.writer(sys.stdout)
+    w.writerow([d[0] for d in cur.description])
+    w.writerows(cur)
+
+
+def main(argv):
+    db = DEFAULT_DB
+    args = []
+    opcoes = {}
+    i = 0
+    while i < len(argv):
+        a = argv[i]
+        if a == '--db' and i + 1 < len(argv):
+            db = argv[i + 1]
+            i += 2
+        elif a in ('--especie', '--desde') and i + 1 < len(argv):
+            opcoes[a[2:]] = argv[i + 1]
+            i += 2
+        else:
+            args.append(a)
+            i += 1
+    if not args:
+        print(__doc__)
+        return 2
+
+    comando, resto = args[0], args[1:]
+    with closing(conectar(db)) as con:
+        return _executar(con, db, comando, resto, opcoes)
+
+
+def _executar(con, db, comando, resto, opcoes):
+    if comando == 'import':
+        for path in resto:
+            if not os.path.exists(path):
+                print(f'Arquivo de entrada não encontrado: {path}')
+                return 2
+            validacao = RelatorioValidacao()
+            n = importar(con, path, validacao)
+            print(f'- {path}: {n} linhas')
+            if validacao.total:
+                print('  Aviso (validação): ' + validacao.resumo())
+        print(f'\nBase atualizada: {db}')
+    elif comando == 'consulta' and resto:
+        _imprimir_csv(con.execute(resto[0]))
+    elif comando == 'sobrevivencia':
+        condicoes, params = [], []
+        if 'especie' in opcoes:
+            condicoes.append('especie = ?')
+            params.append(opcoes['especie'])
+        if 'desde' in opcoes:
+            condicoes.append('data >= ?')
+            params.append(opcoes['desde'])
+        where = ('WHERE ' + ' AND '.join(condicoes)) if condicoes else ''
+        _imprimir_csv(con.execute(f'''
+            SELECT especie, parcela, data, SUM(vivas) AS vivas, SUM(totais) AS totais,
+                   ROUND(100.0 * SUM(vivas) / NULLIF(SUM(totais), 0), 2) AS sobrevivencia_pct
+            FROM registros {where}
+            GROUP BY especie, parcela, data ORDER BY especie, parcela, data
+        ''', params))
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Cache incremental dos agregados por grupo (parcela+data, espécie+data).
+
+Guarda em `saidas/cache_agregados.sqlite`, para cada CSV de monitoramento, o
+estado de cada `AcumuladorGrupo` junto com um hash do conteúdo das linhas do
+grupo, além do tamanho e do SHA-256 do arquivo. Em uma nova execução:
+- arquivo idêntico: todos os grupos vêm do cache, sem ler as linhas;
+- arquivo apenas acrescido (o início é idêntico ao da última execução, caso
+  típico de uma campanha anexada): só as linhas novas são lidas e somadas aos
+  grupos correspondentes;
+- caso contrário, o CSV é percorrido uma vez:
+  * linhas de grupos novos são convertidas e agregadas normalmente;
+  * linhas de grupos já conhecidos apenas entram no hash do grupo (sem
+    conversão numérica);
+  * ao final, grupos conhecidos cujo hash mudou (linhas editadas) são
+    reagregados em uma segunda leitura restrita a eles; os demais são
+    reaproveitados do cache.
+
+O custo de reconstruir o painel passa a ser proporcional aos dados novos.
+As células inválidas de cada grupo (primeira chave) ficam salvas com ele, então
+o relatório de validação é o mesmo da leitura completa, mesmo sem reler as linhas.
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+
+from agregacao import AcumuladorGrupo, RelatorioValidacao, conversor, ler_cabecalho
+
+DEFAULT_CACHE = os.path.join('saidas', 'cache_agregados.sqlite')
+# Incrementar quando o formato de `AcumuladorGrupo.estado` ou o hash mudar
+VERSAO_CACHE = 3
+_MASCARA = (1 << 64) - 1
+
+
+def _hash_linha(row):
+    dig = hashlib.blake2b('\x1f'.join(c.strip() for c in row).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(dig, 'big')
+
+
+class CacheAgregados:
+    """Armazena e reaproveita os acumuladores por grupo de um ou mais CSVs."""
+
+    def __init__(self, path=DEFAULT_CACHE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.con = sqlite3.connect(path)
+        self.con.execute('CREATE TABLE IF NOT EXISTS meta (nome TEXT PRIMARY KEY, valor TEXT)')
+        versao = self.con.execute("SELECT valor FROM meta WHERE nome = 'versao'").fetchone()
+        if versao is None or int(versao[0]) != VERSAO_CACHE:
+            self.con.executescript('DROP TABLE IF EXISTS grupos; DROP TABLE IF EXISTS arquivos;')
+            self.con.execute("INSERT OR REPLACE INTO meta VALUES ('versao', ?)", (str(VERSAO_CACHE),))
+        self.con.executescript('''
+            CREATE TABLE IF NOT EXISTS arquivos (arquivo TEXT PRIMARY KEY, tamanho INTEGER, sha256 TEXT);
+            CREATE TABLE IF NOT EXISTS grupos (
+                arquivo TEXT, chave TEXT, grupo TEXT, ordem INTEGER, hash TEXT, estado TEXT, validacao TEXT,
+                PRIMARY KEY (arquivo, chave, grupo)
+            );
+        ''')
+        self.con.commit()
+        # estatística da última chamada a `agregar`: grupos reaproveitados / recalculados
+        self.reaproveitados = 0
+        self.recalculados = 0
+
+    def close(self):
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _carregar(self, arquivo, nome_chave):
+        cur = self.con.execute('SELECT grupo, hash, estado, validacao FROM grupos WHERE arquivo = ? AND chave = ? ORDER BY ordem',
+                               (arquivo, nome_chave))
+        return {tuple(json.loads(g)): (int(h), e, v) for g, h, e, v in cur}
+
+    def _assinatura(self, arquivo, path):
+        """
+        (tamanho e SHA-256 salvos, SHA-256 do prefixo com o tamanho salvo, linhas
+        físicas desse prefixo, tamanho e SHA-256 atuais).
+        """
+        salvo = self.con.execute('SELECT tamanho, sha256 FROM arquivos WHERE arquivo = ?', (arquivo,)).fetchone()
+        tamanho_salvo = salvo[0] if salvo else -1
+        h = hashlib.sha256()
+        prefixo = None
+        linhas_prefixo = 0
+        lido = 0
+        with open(path, 'rb') as f:
+            while True:
+                bloco = f.read(min(1 << 20, tamanho_salvo - lido) if 0 <= lido < tamanho_salvo else 1 << 20)
+                if not bloco:
+                    break
+                h.update(bloco)
+                if lido < tamanho_salvo:
+                    linhas_prefixo += bloco.count(b'\n')
+                lido += len(bloco)
+                if lido == tamanho_salvo:
+                    prefixo = h.hexdigest()
+            if tamanho_salvo > 0 and lido > tamanho_salvo:
+                f.seek(tamanho_salvo - 1)
+                if f.read(1) != b'\n':
+                    prefixo = None  # o acréscimo não começa em uma linha nova
+        return salvo, prefixo, linhas_prefixo, lido, h.hexdigest()
+
+    def agregar(self, path, chaves, obrigatorias=(), validacao=None):
+        """Mesmo resultado de `agregar(ler_registros(path), chaves)`, reaproveitando o cache."""
+        arquivo = os.path.abspath(path)
+        nomes = [','.join(chave) for chave in chaves]
+        salvos = [self._carregar(arquivo, nome) for nome in nomes]
+        salvo_arq, prefixo, linhas_prefixo, tamanho, sha = self._assinatura(arquivo, path)
+
+        with open(path, newline='', encoding='utf-8') as f:
+            cols = ler_cabecalho(csv.reader(f), obrigatorias)
+        posicoes = [[cols.index(c) for c in chave] for chave in chaves]
+
+        if salvo_arq and salvo_arq[1] == sha and all(salvos):
+            hashes = [{k: h for k, (h, _, _) in salvo.items()} for salvo in salvos]
+            novos = [{} for _ in chaves]
+            invalidas = {}
+        elif salvo_arq and prefixo == salvo_arq[1] and all(salvos):
+            hashes, novos, invalidas = self._acrescimo(path, salvo_arq[0], linhas_prefixo, cols, posicoes, salvos)
+        else:
+            hashes, novos, invalidas = self._completo(path, cols, posicoes, salvos)
+
+        grupos = {}
+        validacoes = []
+        self.reaproveitados = self.recalculados = 0
+        with self.con:
+            for i, (chave, nome, hs, salvo, destino) in enumerate(zip(chaves, nomes, hashes, salvos, novos)):
+                resultado = {}
+                ordem_salva = {k: i for i, k in enumerate(salvo)}
+                for ordem, k in enumerate(hs):  # ordem de primeira ocorrência no arquivo
+                    if k in destino:
+                        resultado[k] = destino[k]
+                        self.recalculados += 1
+                        val = invalidas.get(k) if i == 0 else None
+                        self.con.execute('INSERT OR REPLACE INTO grupos VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                         (arquivo, nome, json.dumps(k), ordem, str(hs[k]), json.dumps(destino[k].estado()),
+                                          json.dumps(val.estado()) if val else None))
+                        if val:
+                            validacoes.append(val)
+                    else:
+                        if ordem_salva[k] != ordem:
+                            self.con.execute('UPDATE grupos SET ordem = ? WHERE arquivo = ? AND chave = ? AND grupo = ?',
+                                             (ordem, arquivo, nome, json.dumps(k)))
+                        resultado[k] = AcumuladorGrupo.de_estado(json.loads(salvo[k][1]))
+                        val = invalidas.get(k) if i == 0 else None
+                        if val is not None:
+                            # revalidado: as linhas do grupo podem ter mudado de posição no arquivo
+                            self.con.execute('UPDATE grupos SET validacao = ? WHERE arquivo = ? AND chave = ? AND grupo = ?',
+                                             (json.dumps(val.estado()), arquivo, nome, json.dumps(k)))
+                            validacoes.append(val)
+                        elif salvo[k][2]:
+                            validacoes.append(RelatorioValidacao.de_estado(json.loads(salvo[k][2])))
+                        self.reaproveitados += 1
+                for k in salvo.keys() - hs.keys():  # grupos removidos do CSV
+                    self.con.execute('DELETE FROM grupos WHERE arquivo = ? AND chave = ? AND grupo = ?',
+                                     (arquivo, nome, json.dumps(k)))
+                grupos[chave] = resultado
+            self.con.execute('INSERT OR REPLACE INTO arquivos VALUES (?, ?, ?)', (arquivo, tamanho, sha))
+        if validacao is not None and chaves:
+            _repetir_validacao(validacao, grupos[chaves[0]], validacoes)
+        return grupos
+
+    def _acrescimo(self, path, inicio, linhas_antes, cols, posicoes, salvos):
+        """Só as linhas a partir do byte `inicio`: somadas aos grupos salvos ou a grupos novos."""
+        hashes = [{k: h for k, (h, _, _) in salvo.items()} for salvo in salvos]
+        novos = [{} for _ in posicoes]
+        # os grupos da primeira chave que recebem linhas partem das células inválidas já salvas
+        invalidas = {k: RelatorioValidacao.de_estado(json.loads(v)) for k, (_, _, v) in salvos[0].items() if v}
+        rascunho = RelatorioValidacao()
+        converter = conversor(cols, rascunho)
+        with open(path, 'rb') as f:
+            f.seek(inicio)
+            reader = csv.reader(linha.decode('utf-8') for linha in f)
+            for row in reader:
+                if not row:
+                    continue
+                h = _hash_linha(row)
+                reg = converter(row, linhas_antes + reader.line_num)
+                for pos, salvo, hs, destino in zip(posicoes, salvos, hashes, novos):
+                    k = _grupo(row, pos)
+                    hs[k] = (hs.get(k, 0) + h) & _MASCARA
+                    acc = destino.get(k)
+                    if acc is None:
+                        acc = destino[k] = (AcumuladorGrupo.de_estado(json.loads(salvo[k][1]))
+                                            if k in salvo else AcumuladorGrupo())
+                    acc.adicionar(reg)
+                _anotar(rascunho, invalidas, _grupo(row, posicoes[0]))
+        return hashes, novos, invalidas
+
+    def _completo(self, path, cols, posicoes, salvos):
+        """
+        Uma leitura completa; grupos salvos só são reagregados se o hash mudou. Os grupos
+        reaproveitados com células inválidas são revalidados: uma linha removida ou inserida
+        antes deles desloca os números de linha dos exemplos salvos.
+        """
+        hashes = [{} for _ in posicoes]
+        novos = [{} for _ in posicoes]
+        invalidas = {}
+        revalidar = {k for k, (_, _, v) in salvos[0].items() if v}
+        rascunho = RelatorioValidacao()
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            converter = conversor(cols, rascunho)
+            for row in reader:
+                if not row:
+                    continue
+                h = _hash_linha(row)
+                reg = None
+                for pos, salvo, hs, destino in zip(posicoes, salvos, hashes, novos):
+                    k = _grupo(row, pos)
+                    hs[k] = (hs.get(k, 0) + h) & _MASCARA
+                    if k in salvo:
+                        continue
+                    if reg is None:
+                        reg = converter(row, reader.line_num)
+                    acc = destino.get(k)
+                    if acc is None:
+                        acc = destino[k] = AcumuladorGrupo()
+                    acc.adicionar(reg)
+                # linhas de grupos alterados da primeira chave são validadas na segunda leitura
+                k = _grupo(row, posicoes[0])
+                if reg is None and k in revalidar:
+                    converter(row, reader.line_num)
+                _anotar(rascunho, invalidas, k if k not in salvos[0] or k in revalidar else None)
+
+        # Grupos conhecidos cujo conteúdo mudou: segunda leitura só para eles
+        alterados = [{k for k in hs if k in salvo and salvo[k][0] != hs[k]} for hs, salvo in zip(hashes, salvos)]
+        for k in alterados[0]:
+            invalidas.pop(k, None)
+        if any(alterados):
+            with open(path, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                converter = conversor(cols, rascunho)
+                for row in reader:
+                    if not row:
+                        continue
+                    reg = None
+                    for pos, alt, destino in zip(posicoes, alterados, novos):
+                        k = _grupo(row, pos)
+                        if k not in alt:
+                            continue
+                        if reg is None:
+                            reg = converter(row, reader.line_num)
+                        acc = destino.get(k)
+                        if acc is None:
+                            acc = destino[k] = AcumuladorGrupo()
+                        acc.adicionar(reg)
+                    k = _grupo(row, posicoes[0])
+                    _anotar(rascunho, invalidas, k if k in alterados[0] else None)
+        return hashes, novos, invalidas
+
+
+def _grupo(row, pos):
+    return tuple(row[i].strip() if i < len(row) else '' for i in pos)
+
+
+def _anotar(rascunho, invalidas, k):
+    """Passa as células inválidas da última linha convertida para o grupo `k` (None: descartar)."""
+    if rascunho.invalidas:
+        rascunho.linhas = 0
+        if k is not None:
+            val = invalidas.get(k)
+            if val is None:
+                val = invalidas[k] = RelatorioValidacao()
+            val.mesclar(rascunho)
+        rascunho.invalidas = {}
+        rascunho.exemplos = []
+
+
+def _repetir_validacao(validacao, grupos, validacoes):
+    """Soma em `validacao` as células inválidas salvas/recalculadas dos grupos, como em uma leitura completa."""
+    validacao.linhas += sum(acc.linhas for acc in grupos.values())
+    exemplos = list(validacao.exemplos)
+    for val in validacoes:
+        for coluna, n in val.invalidas.items():
+            validacao.invalidas[coluna] = validacao.invalidas.get(coluna, 0) + n
+        exemplos.extend(val.exemplos)
+    # exemplos na ordem do arquivo (cada grupo guarda os seus primeiros)
+    validacao.exemplos = sorted(exemplos, key=lambda e: e[0])[:validacao.MAX_EXEMPLOS]
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Cache em disco das malhas do IBGE usadas no mapa (municípios de PE e biomas).
+
+Cada recurso da API (caminho relativo, ex.: `api/v3/malhas/municipios/2600054?formato=...`)
+fica em `saidas/cache_ibge/` junto com os metadados ETag/Last-Modified da resposta:
+- dentro do prazo de validade (`VALIDADE`) a cópia local é usada sem acessar a rede;
+- depois dele a cópia é revalidada com If-None-Match/If-Modified-Since (304 = sem download);
+- se a rede falhar, a cópia local (mesmo vencida) continua valendo; a falha fica
+  registrada nos metadados e, por `VALIDADE_FALHA`, o recurso nem tenta a rede;
+- depois do primeiro erro de conexão, o restante da execução não acessa mais a rede.
+
+Como cada malha municipal é guardada separadamente, uma compilação interrompida
+retoma de onde parou: só as malhas que faltam são baixadas de novo.
+
+Modo offline: com um espelho local (`espelho=PASTA`) nada é baixado; o recurso
+`api/v3/malhas/municipios/2600054?...` é lido de `PASTA/api/v3/malhas/municipios/2600054.json`.
+
+Comandos:
+  python scripts/cache_ibge.py espelhar PASTA
+      grava todo o conteúdo do cache em PASTA, no formato de espelho
+  python scripts/cache_ibge.py limpar
+      apaga o cache
+
+As requisições reaproveitam uma conexão HTTP por thread (keep-alive), têm timeout
+e, em falhas transitórias (rede, 429, 5xx), são repetidas com espera exponencial.
+Respostas com gzip são descomprimidas à medida que chegam.
+
+A URL base pode ser trocada (ex.: um servidor HTTP local em testes) pelo
+parâmetro `base_url` ou pela variável de ambiente IBGE_API_URL.
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import email.utils
+import hashlib
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+
+IBGE_API = 'https://servicodados.ibge.gov.br/'
+DEFAULT_CACHE_DIR = os.path.join('saidas', 'cache_ibge')
+# segundos sem revalidar uma cópia local (malhas mudam raramente)
+VALIDADE = 7 * 24 * 3600
+# segundos sem tentar a rede de novo depois de uma falha de conexão
+VALIDADE_FALHA = 3600
+TIMEOUT = 60
+TENTATIVAS = 4
+ESPERA_INICIAL = 0.5  # segundos; dobra a cada nova tentativa
+MAX_REDIRECIONAMENTOS = 3
+_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+
+class ErroHTTP(Exception):
+    """Resposta HTTP de erro (não transitória, ou após esgotar as tentativas)."""
+
+    def __init__(self, codigo, url):
+        super().__init__(f'HTTP {codigo}: {url}')
+        self.codigo = codigo
+
+
+def gravar_atomico(path, dados):
+    """Grava `dados` (bytes) em `path` via arquivo temporário + rename (nunca deixa arquivo pela metade)."""
+    pasta = os.path.dirname(path) or '.'
+    os.makedirs(pasta, exist_ok=True)
+    # temporário com nome único: gravações simultâneas do mesmo recurso não se atropelam
+    fd, tmp = tempfile.mkstemp(dir=pasta, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(dados)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _ler_corpo(resp):
+    """Lê o corpo em blocos, descomprimindo gzip (com ou sem Content-Encoding) durante a leitura."""
+    partes = []
+    desc = None
+    for i, bloco in enumerate(iter(lambda: resp.read(1 << 16), b'')):
+        if i == 0 and bloco[:2] == b'\x1f\x8b':
+            desc = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        partes.append(desc.decompress(bloco) if desc else bloco)
+    if desc:
+        partes.append(desc.flush())
+    return b''.join(partes)
+
+
+class CacheIBGE:
+    """Busca recursos da API do IBGE passando pelo cache em disco (ou por um espelho offline)."""
+
+    def __init__(self, pasta=DEFAULT_CACHE_DIR, base_url=None, espelho=None, validade=VALIDADE, timeout=TIMEOUT,
+                 validade_falha=VALIDADE_FALHA):
+        self.pasta = pasta
+        self.base_url = (base_url or os.environ.get('IBGE_API_URL') or IBGE_API).rstrip('/') + '/'
+        self.espelho = espelho
+        self.validade = validade
+        self.validade_falha = validade_falha
+        self.timeout = timeout
+        # erro de conexão nesta execução: as próximas chamadas não tentam a rede
+        self.offline = False
+        # estatística: recursos servidos do cache / revalidados (304) / baixados
+        self.locais = self.revalidados = self.baixados = 0
+        self._trava = threading.Lock()
+        self._local = threading.local()
+
+    def _contar(self, nome):
+        with self._trava:
+            setattr(self, nome, getattr(self, nome) + 1)
+
+    def _conexao(self, esquema, host, nova=False):
+        conexoes = self._local.__dict__.setdefault('conexoes', {})
+        conn = conexoes.get((esquema, host))
+        if conn is not None and nova:
+            conn.close()
+            conn = None
+        if conn is None:
+            cls = http.client.HTTPSConnection if esquema == 'https' else http.client.HTTPConnection
+            conn = conexoes[(esquema, host)] = cls(host, timeout=self.timeout)
+        return conn
+
+    def _get(self, url, cabecalhos):
+        """(status, cabeçalhos, corpo) de um GET na conexão da thread atual; segue redirecionamentos."""
+        for _ in range(MAX_REDIRECIONAMENTOS + 1):
+            partes = urllib.parse.urlsplit(url)
+            caminho = (partes.path or '/') + ('?' + partes.query if partes.query else '')
+            conn = self._conexao(partes.scheme, partes.netloc)
+            try:
+                conn.request('GET', caminho, headers=cabecalhos)
+                resp = conn.getresponse()
+                corpo = _ler_corpo(resp)
+            except (http.client.HTTPException, OSError):
+                self._conexao(partes.scheme, partes.netloc, nova=True)  # descartar a conexão quebrada
+                raise
+            local = resp.getheader('Location')
+            if resp.status in (301, 302, 303, 307, 308) and local:
+                url = urllib.parse.urljoin(url, local)
+                continue
+            return resp.status, resp.headers, corpo
+        raise ErroHTTP(resp.status, url)
+
+    def _get_com_repeticao(self, url, cabecalhos):
+        """`_get` com novas tentativas e espera exponencial (com jitter) em falhas transitórias."""
+        for tentativa in range(TENTATIVAS):
+            ultima = tentativa == TENTATIVAS - 1
+            try:
+                status, headers, corpo = self._get(url, cabecalhos)
+            except socket.gaierror:
+                raise  # nome não resolvido: repetir não adianta
+            except (http.client.HTTPException, OSError):
+                if ultima:
+                    raise
+            else:
+                if status not in _TRANSITORIOS:
+                    return status, headers, corpo
+                if ultima:
+                    raise ErroHTTP(status, url)
+            espera = ESPERA_INICIAL * 2 ** tentativa
+            time.sleep(espera + random.uniform(0, espera / 2))
+
+    def _caminhos(self, recurso):
+        nome = hashlib.sha1(recurso.encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.pasta, nome + '.dat'), os.path.join(self.pasta, nome + '.meta.json')
+
+    def caminho_espelho(self, recurso, pasta=None):
+        return os.path.join(pasta or self.espelho, *recurso.split('?', 1)[0].strip('/').split('/')) + '.json'
+
+    def _meta(self, path_meta):
+        try:
+            with open(path_meta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def obter(self, recurso, referencia=None):
+        """
+        Conteúdo (bytes, já descomprimido) de `recurso`. `referencia` é um arquivo local
+        equivalente (ex.: a camada já gravada no projeto): sem cópia no cache, ele é
+        revalidado por data e adotado se o servidor responder 304 ou estiver inacessível.
+        Levanta exceção se não houver rede nem cópia local.
+        """
+        if self.espelho:
+            with open(self.caminho_espelho(recurso), 'rb') as f:
+                self._contar('locais')
+                return f.read()
+
+        path_dados, path_meta = self._caminhos(recurso)
+        meta = self._meta(path_meta)
+        falha = meta.get('falha', 0) if meta else 0
+        if not os.path.exists(path_dados):
+            meta = None
+        if meta is None and referencia and os.path.exists(referencia):
+            meta = {'recurso': recurso, 'last_modified': email.utils.formatdate(os.path.getmtime(referencia), usegmt=True),
+                    'verificado': 0}
+            path_dados = referencia
+        agora = time.time()
+        recente = agora - falha < self.validade_falha
+        if self.offline and not recente:
+            # rede já caiu nesta execução: o recurso conta como falho sem nova tentativa
+            self._registrar_falha(recurso, meta, path_dados)
+            recente = True
+        if meta and (agora - meta.get('verificado', 0) < self.validade or recente):
+            self._contar('locais')
+            with open(path_dados, 'rb') as f:
+                return f.read()
+        if recente:
+            raise ConnectionError(f'IBGE inacessível (falha recente); sem cópia local de {recurso}')
+
+        cabecalhos = {'Accept-Encoding': 'gzip'}
+        if meta and meta.get('etag'):
+            cabecalhos['If-None-Match'] = meta['etag']
+        if meta and meta.get('last_modified'):
+            cabecalhos['If-Modified-Since'] = meta['last_modified']
+        url = self.base_url + recurso
+        try:
+            status, headers, dados = self._get_com_repeticao(url, cabecalhos)
+        except (http.client.HTTPException, OSError, ErroHTTP) as e:
+            if not isinstance(e, ErroHTTP):
+                self.offline = True
+                self._registrar_falha(recurso, meta, path_dados)
+            if meta is None or isinstance(e, ErroHTTP) and e.codigo not in _TRANSITORIOS:
+                raise
+            print(f'Aviso: IBGE inacessível ({e}); usando cópia local de {recurso}')
+            self._contar('locais')
+            with open(path_dados, 'rb') as f:
+                return f.read()
+        if status == 304 and meta is not None:
+            with open(path_dados, 'rb') as f:
+                dados = f.read()
+            novo = dict(meta, verificado=time.time())
+            self._contar('revalidados')
+        elif status == 200:
+            novo = {'recurso': recurso, 'etag': headers.get('ETag'),
+                    'last_modified': headers.get('Last-Modified'), 'verificado': time.time()}
+            self._contar('baixados')
+        else:
+            raise ErroHTTP(status, url)
+
+        path_dados, path_meta = self._caminhos(recurso)
+        gravar_atomico(path_dados, dados)
+        gravar_atomico(path_meta, json.dumps(novo).encode('utf-8'))
+        return dados
+
+    def _registrar_falha(self, recurso, meta, path_dados):
+        """Anota a falha de conexão nos metadados (a cópia em uso, se houver, passa a ser a do cache)."""
+        cache_dados, cache_meta = self._caminhos(recurso)
+        novo = dict(meta or {'recurso': recurso}, falha=time.time())
+        if meta is not None and path_dados != cache_dados:
+            with open(path_dados, 'rb') as f:
+                gravar_atomico(cache_dados, f.read())
+        gravar_atomico(cache_meta, json.dumps(novo).encode('utf-8'))
+
+    def obter_json(self, recurso, referencia=None):
+        return json.loads(self.obter(recurso, referencia).decode('utf-8'))
+
+    def espelhar(self, destino):
+        """Copia todos os recursos em cache para `destino` no formato de espelho. Retorna quantos."""
+        n = 0
+        for nome in sorted(os.listdir(self.pasta)) if os.path.isdir(self.pasta) else ():
+            if not nome.endswith('.meta.json'):
+                continue
+            meta = self._meta(os.path.join(self.pasta, nome))
+            dados = os.path.join(self.pasta, nome[:-len('.meta.json')] + '.dat')
+            if meta and os.path.exists(dados):
+                alvo = self.caminho_espelho(meta['recurso'], destino)
+                os.makedirs(os.path.dirname(alvo), exist_ok=True)
+                shutil.copyfile(dados, alvo)
+                n += 1
+        return n
+
+    def resumo(self):
+        return f'{self.locais} do cache, {self.revalidados} revalidados, {self.baixados} baixados'
+
+
+def main(argv):
+    if argv[:1] == ['espelhar'] and len(argv) > 1:
+        n = CacheIBGE().espelhar(argv[1])
+        print(f'{n} recursos gravados em {argv[1]}')
+    elif argv[:1] == ['limpar']:
+        shutil.rmtree(DEFAULT_CACHE_DIR, ignore_errors=True)
+        print(f'Cache removido: {DEFAULT_CACHE_DIR}')
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
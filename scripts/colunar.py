@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Backend colunar opcional (NumPy) para as planilhas `monitoramento_*.csv`.
+
+O CSV é lido uma única vez, em blocos de bytes. `_campos` separa os campos
+sem laço em Python por linha: a paridade das aspas (`logical_xor.accumulate`)
+marca as vírgulas e quebras de linha que são separadores, e os bytes de cada
+coluna usada viram um array `S<largura>`. Blocos com aspas fora do início de
+um campo (que o `csv.reader` trata como texto) vão pelo próprio `csv.reader`.
+As colunas viram:
+- parcela, especie, data e bioma: códigos categóricos (int32 + rótulos),
+  decodificando apenas os valores distintos de cada bloco;
+- plantadas_vivas/plantadas_totais: int64;
+- altura, diâmetro e coberturas: float64 (NaN = célula vazia ou inválida).
+
+`indicadores` reduz os sete indicadores do resumo (sobrevivência, altura,
+diâmetro, copa, invasoras, riqueza e Shannon) com `np.bincount` sobre os
+códigos de grupo e de (grupo, espécie), sem laço em Python por linha.
+`acumuladores` devolve as mesmas somas como `AcumuladorGrupo`, para os
+consumidores de `agregacao.agregar` (gráficos por espécie, sucessão).
+
+`np.bincount` soma na ordem das linhas, então as somas são as mesmas do
+acumulador em streaming; o Shannon é somado em outra ordem e pode diferir
+dele no último bit.
+
+NumPy é opcional: sem ele, os scripts seguem pelo caminho em `agregacao.py`.
+"""
+import csv
+import math
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional
+    np = None
+
+from agregacao import CAMPOS_NUMERICOS, CHAVE_PARCELA_DATA, METRICAS_REAIS, AcumuladorGrupo, media_soma
+
+CATEGORICAS = ('parcela', 'especie', 'data', 'bioma')
+INTEIRAS = ('plantadas_vivas', 'plantadas_totais')
+REAIS = ('altura_m', 'diametro_cm', 'cobertura_copa_pct', 'cobertura_invasoras_pct')
+# lidas só para o relatório de validação (opcionais, como no caminho em streaming)
+COORDENADAS = ('coordenada_lat', 'coordenada_lon')
+TAMANHO_BLOCO = 8 * 1024 * 1024  # bytes do CSV por bloco
+# campos mais largos que isto são copiados um a um (evita a matriz registros x largura)
+LARGURA_MAX_CAMPO = 64
+ASPAS, VIRGULA, NL, CR = (ord(c) for c in '",\n\r')
+
+# coluna -> conversor do caminho em streaming (define o que é célula inválida)
+_CONVERSORES = {coluna: conv for coluna, _, conv, _ in CAMPOS_NUMERICOS}
+
+# Indicadores de um grupo, com os mesmos nomes das propriedades de `AcumuladorGrupo`
+IndicadoresGrupo = namedtuple('IndicadoresGrupo', [
+    'linhas', 'vivas', 'totais', 'sobrevivencia', 'altura_media', 'diametro_medio',
+    'copa_media', 'invasoras_media', 'riqueza', 'riqueza_viva', 'shannon', 'biomas',
+])
+
+
+class TabelaColunar:
+    """Colunas tipadas de um CSV de monitoramento."""
+
+    def __init__(self, rotulos, codigos, valores):
+        self.rotulos = rotulos    # nome -> lista de rótulos (ordem de primeira ocorrência)
+        self.codigos = codigos    # nome -> array int32 com o código de cada linha
+        self.valores = valores    # nome -> array int64/float64
+
+    def __len__(self):
+        return len(self.valores['plantadas_vivas'])
+
+
+def _coluna_numerica(brutos, conv, invalidas=None):
+    """
+    Converte um bloco de bytes em float64 (NaN = vazia ou inválida). Se `invalidas`
+    for dado, recebe (posição no bloco, valor) de cada célula inválida.
+    """
+    try:
+        col = np.where(brutos == b'', b'nan', brutos).astype(np.float64)
+        # 'nan'/'inf' escritos na célula são inválidos para colunas inteiras
+        if conv is float or np.isfinite(col[brutos != b'']).all():
+            return col
+    except ValueError:
+        pass
+    # alguma célula inválida: conversão tolerante, uma vez por valor distinto
+    distintos, inv = np.unique(brutos, return_inverse=True)
+    inv = inv.ravel()
+    textos = [v.decode('utf-8', 'replace').strip() for v in distintos.tolist()]
+    convertidos = np.full(len(textos), math.nan)
+    ruins = np.zeros(len(textos), dtype=bool)
+    for k, v in enumerate(textos):
+        if not v:
+            continue
+        try:
+            convertidos[k] = conv(v)
+        except (ValueError, OverflowError):
+            ruins[k] = True
+    if invalidas is not None:
+        for i in np.flatnonzero(ruins[inv]).tolist():
+            invalidas.append((i, textos[inv[i]]))
+    return convertidos[inv]
+
+
+def _codificar(brutos, mapa):
+    """Códigos globais (int32) para um bloco de rótulos; `mapa` cresce com rótulos novos."""
+    # hash polinomial dos bytes de cada campo (uint64, com estouro) e np.unique sobre os inteiros
+    largura = brutos.dtype.itemsize
+    matriz = brutos.view(np.uint8).reshape(len(brutos), largura)
+    h = np.zeros(len(brutos), dtype=np.uint64)
+    for k in range(largura):
+        h = h * np.uint64(0x100000001B3) + matriz[:, k]
+    _, primeira, inv = np.unique(h, return_index=True, return_inverse=True)
+    inv = inv.ravel()
+    if not (brutos[primeira][inv] == brutos).all():  # colisão de hash: np.unique sobre os bytes
+        _, primeira, inv = np.unique(brutos, return_index=True, return_inverse=True)
+        inv = inv.ravel()
+    # rótulos novos entram no `mapa` na ordem de primeira ocorrência
+    rotulos = [v.decode('utf-8').strip() for v in brutos[primeira].tolist()]
+    for j in np.argsort(primeira).tolist():
+        mapa.setdefault(rotulos[j], len(mapa))
+    return np.array([mapa[r] for r in rotulos], dtype=np.int32)[inv]
+
+
+def _sem_aspas(campo):
+    """Valor de um campo entre aspas, como o `csv.reader` o lê."""
+    return next(csv.reader([campo.decode('utf-8')]), [''])[0].encode('utf-8')
+
+
+def _campos_csv(dados, indices):
+    """`_campos` pelo `csv.reader`, para blocos com aspas fora do início dos campos."""
+    reader = csv.reader(dados.decode('utf-8').splitlines(keepends=True))
+    linhas, registros = [], []
+    for row in reader:
+        if row:
+            registros.append([row[c].encode('utf-8') if c < len(row) else b'' for c in indices])
+            linhas.append(reader.line_num)
+    colunas = [np.array(col, dtype=bytes) for col in zip(*registros)] if registros else \
+        [np.empty(0, dtype=bytes) for _ in indices]
+    return colunas, np.array(linhas, dtype=np.int64)
+
+
+def _campos(dados, indices):
+    """
+    Separa `dados` (linhas completas do CSV, em bytes) em campos sem laço em Python por linha.
+    Devolve (colunas, linhas): para cada índice de `indices`, um array de bytes com o campo
+    de cada registro (b'' em linhas curtas) e a linha física, contada a partir de 1 no
+    bloco, em que cada registro termina (como `csv.reader.line_num`).
+    """
+    # folga no fim: a matriz de bytes de um campo pode passar do último byte
+    com_folga = np.frombuffer(dados + bytes(LARGURA_MAX_CAMPO), dtype=np.uint8)
+    buf = com_folga[:len(dados)]
+    aspas = buf == ASPAS
+    if aspas.any():
+        # paridade de aspas: separadores entre aspas não contam; aspas só podem abrir no
+        # início de um campo (ou repetidas, "" dentro de aspas), senão vale o csv.reader
+        dentro = np.logical_xor.accumulate(aspas)
+        abre = np.flatnonzero(aspas & dentro)
+        antes = buf[abre - 1]
+        if dentro[-1] or ((abre > 0) & (antes != VIRGULA) & (antes != NL) & (antes != ASPAS)).any():
+            return _campos_csv(dados, indices)
+        sep = ((buf == VIRGULA) | (buf == NL)) & ~dentro
+    else:
+        sep = (buf == VIRGULA) | (buf == NL)
+    pos = np.flatnonzero(sep).astype(np.int32)
+    e_nl = buf[pos] == NL
+    inicio = np.empty_like(pos)
+    inicio[0] = 0
+    inicio[1:] = pos[:-1] + 1
+    fim = pos.copy()
+    cr = e_nl & (pos > inicio)
+    cr[cr] = buf[pos[cr] - 1] == CR
+    fim[cr] -= 1
+
+    ultimo = np.flatnonzero(e_nl)
+    primeiro = np.empty_like(ultimo)
+    primeiro[0] = 0
+    primeiro[1:] = ultimo[:-1] + 1
+    n = ultimo - primeiro + 1
+    cheio = (n > 1) | (fim[primeiro] > inicio[primeiro])  # o csv.reader pula linhas vazias
+    primeiro, n, ultimo = primeiro[cheio], n[cheio], ultimo[cheio]
+    linhas = np.searchsorted(np.flatnonzero(buf == NL), pos[ultimo]) + 1
+
+    colunas = []
+    for c in indices:
+        ok = c < n
+        i = np.where(ok, primeiro + c, 0)
+        a = np.where(ok, inicio[i], 0)
+        tam = np.where(ok, fim[i] - a, 0)
+        largura = max(int(tam.max()) if len(tam) else 0, 1)
+        if largura > LARGURA_MAX_CAMPO:
+            col = np.array([dados[x:x + t] for x, t in zip(a.tolist(), tam.tolist())], dtype=bytes)
+        else:
+            # matriz registros x largura com os bytes de cada campo, lida como S<largura>
+            k = np.arange(largura, dtype=np.int32)
+            m = com_folga[a[:, None] + k]
+            m[k >= tam[:, None]] = 0
+            col = m.view(f'S{largura}').ravel()
+        entre_aspas = np.flatnonzero((tam > 0) & (buf[a] == ASPAS))
+        if len(entre_aspas):
+            col = col.astype(object)
+            for j in entre_aspas.tolist():
+                col[j] = _sem_aspas(col[j])
+            col = col.astype(bytes)
+        colunas.append(col)
+    return colunas, linhas
+
+
+def _blocos(f, tamanho):
+    """Blocos de ~`tamanho` bytes de `f` terminados em quebra de linha fora de aspas."""
+    resto = b''
+    while True:
+        lido = f.read(tamanho)
+        if not lido:
+            break
+        dados = resto + lido
+        corte = len(dados)
+        while True:
+            corte = dados.rfind(b'\n', 0, corte)
+            # quebra com número par de aspas antes dela está fora de aspas
+            if corte < 0 or dados.count(b'"', 0, corte) % 2 == 0:
+                break
+        if corte < 0:
+            resto = dados
+            continue
+        yield dados[:corte + 1]
+        resto = dados[corte + 1:]
+    if resto:
+        yield resto if resto.endswith(b'\n') else resto + b'\n'
+
+
+def _validar_bloco(validacao, invalidas, linhas):
+    """Registra as células inválidas de um bloco em `validacao`, na ordem do arquivo."""
+    for i, _, coluna, valor in sorted(invalidas):
+        validacao.registrar(int(linhas[i]), coluna, valor)
+
+
+def carregar_colunas(path, validacao=None):
+    """
+    Lê `path` uma vez, em blocos de `TAMANHO_BLOCO` bytes, e devolve uma `TabelaColunar`.
+    Células numéricas inválidas são contadas em `validacao` (`RelatorioValidacao`), se dado.
+    """
+    if np is None:
+        raise RuntimeError('NumPy não está instalado; use o modo padrão (sem --colunar).')
+    nomes = CATEGORICAS + INTEIRAS + REAIS
+    with open(path, 'rb') as f:
+        linha = f.readline()
+        cabecalho = [c.strip() for c in next(csv.reader([linha.decode('utf-8')]), [])]
+        missing = [c for c in nomes if c not in cabecalho]
+        if missing:
+            raise ValueError(f'Colunas faltantes no CSV: {missing}')
+        extras = tuple(c for c in COORDENADAS if c in cabecalho) if validacao is not None else ()
+        indices = [cabecalho.index(c) for c in nomes + extras]
+        # ordem das colunas numéricas no `Registro`, para os exemplos saírem como no streaming
+        ordem = {c: i for i, c in enumerate(COORDENADAS + INTEIRAS + REAIS)}
+
+        mapas = {c: {} for c in CATEGORICAS}
+        partes = {c: [] for c in nomes}
+        linha_inicial = 1  # linhas físicas antes do bloco (cabeçalho)
+        for dados in _blocos(f, TAMANHO_BLOCO):
+            colunas, linhas = _campos(dados, indices)
+            invalidas = [] if validacao is not None else None
+            for c, brutos in zip(nomes + extras, colunas):
+                if c in mapas:
+                    partes[c].append(_codificar(brutos, mapas[c]))
+                    continue
+                celulas = [] if invalidas is not None else None
+                col = _coluna_numerica(brutos, _CONVERSORES[c], celulas)
+                if c in partes:
+                    partes[c].append(col)
+                if celulas:
+                    invalidas.extend((i, ordem[c], c, valor) for i, valor in celulas)
+            if validacao is not None:
+                validacao.linhas += len(linhas)
+                _validar_bloco(validacao, invalidas, linhas + linha_inicial)
+            linha_inicial += dados.count(b'\n')
+
+    rotulos, codigos, valores = {}, {}, {}
+    for c in nomes:
+        col = np.concatenate(partes[c]) if partes[c] else np.empty(0)
+        partes[c] = None
+        if c in mapas:
+            rotulos[c] = list(mapas[c])
+            codigos[c] = col.astype(np.int32)
+        elif c in INTEIRAS:
+            valores[c] = np.where(np.isnan(col), 0, col).astype(np.int64)
+        else:
+            valores[c] = col
+    return TabelaColunar(rotulos, codigos, valores)
+
+
+def _codigo_grupo(tabela, chave):
+    """Chaves dos grupos (ordem de primeira ocorrência) e o código de grupo de cada linha."""
+    codigo = np.zeros(len(tabela), dtype=np.int64)
+    for c in chave:
+        codigo = codigo * len(tabela.rotulos[c]) + tabela.codigos[c]
+    unicos, primeira, grupo = np.unique(codigo, return_index=True, return_inverse=True)
+    # Reordenar grupos pela primeira ocorrência (mesma ordem do caminho em streaming)
+    ordem = np.argsort(primeira, kind='stable')
+    posicao = np.empty_like(ordem)
+    posicao[ordem] = np.arange(len(ordem))
+    unicos = unicos[ordem]
+    grupo = posicao[grupo.ravel()]
+
+    partes = []
+    resto = unicos
+    for c in reversed(chave):
+        n = len(tabela.rotulos[c])
+        rotulos = tabela.rotulos[c]
+        partes.append([rotulos[i] for i in (resto % n).tolist()])
+        resto = resto // n
+    chaves = list(zip(*reversed(partes)))
+    return chaves, grupo
+
+
+def _reducoes(tabela, grupo, ng):
+    """Somas e contagens por grupo (arrays alinhados aos códigos de `grupo`)."""
+    r = {'linhas': np.bincount(grupo, minlength=ng)}
+    for c, nome in (('plantadas_vivas', 'vivas'), ('plantadas_totais', 'totais')):
+        r[nome] = np.bincount(grupo, weights=tabela.valores[c], minlength=ng).astype(np.int64)
+    for c in REAIS:
+        v = tabela.valores[c]
+        ok = ~np.isnan(v)
+        r['n_' + c] = np.bincount(grupo, weights=ok, minlength=ng).astype(np.int64)
+        # bincount soma na ordem das linhas: mesmo resultado do acumulador em streaming
+        r['soma_' + c] = np.bincount(grupo, weights=np.where(ok, v, 0.0), minlength=ng)
+
+    # Vivos por (grupo, espécie), em ordem de primeira ocorrência da espécie no grupo
+    nsp = len(tabela.rotulos['especie'])
+    pares, primeira, inv = np.unique(grupo.astype(np.int64) * nsp + tabela.codigos['especie'],
+                                     return_index=True, return_inverse=True)
+    vivos = np.bincount(inv.ravel(), weights=tabela.valores['plantadas_vivas'], minlength=len(pares))
+    ordem = np.argsort(primeira, kind='stable')
+    r['pares_especie'] = (pares[ordem] // nsp, pares[ordem] % nsp, vivos[ordem].astype(np.int64))
+
+    nb = len(tabela.rotulos['bioma'])
+    pares = np.unique(grupo.astype(np.int64) * nb + tabela.codigos['bioma'])
+    r['pares_bioma'] = (pares // nb, pares % nb)
+    return r
+
+
+def _biomas(tabela, r, ng):
+    biomas = [set() for _ in range(ng)]
+    rotulos = tabela.rotulos['bioma']
+    for g, b in zip(*(a.tolist() for a in r['pares_bioma'])):
+        if rotulos[b]:
+            biomas[g].add(rotulos[b])
+    return biomas
+
+
+def indicadores(tabela, chave=CHAVE_PARCELA_DATA):
+    """
+    Indicadores por grupo de `chave`, calculados sobre arrays: {chave: IndicadoresGrupo}.
+    Os valores são os das propriedades de `AcumuladorGrupo` para o mesmo grupo.
+    """
+    chaves, grupo = _codigo_grupo(tabela, chave)
+    ng = len(chaves)
+    r = _reducoes(tabela, grupo, ng)
+    vivas, totais = r['vivas'], r['totais']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sobrevivencia = np.where(totais > 0, vivas / totais * 100.0, np.nan)
+
+        # Riqueza e Shannon a partir dos vivos por (grupo, espécie)
+        g, sp, v = r['pares_especie']
+        nomeada = np.array([bool(rot) for rot in tabela.rotulos['especie']], dtype=bool)
+        riqueza = np.bincount(g, weights=nomeada[sp], minlength=ng).astype(np.int64)
+        riqueza_viva = np.bincount(g, weights=v > 0, minlength=ng).astype(np.int64)
+        total = vivas[g]
+        p = np.where((v > 0) & (total > 0), v / total, 1.0)
+        shannon = -np.bincount(g, weights=p * np.log(p), minlength=ng)
+
+    medias = [[media_soma(s, n) for s, n in zip(r['soma_' + c].tolist(), r['n_' + c].tolist())] for c in REAIS]
+    biomas = _biomas(tabela, r, ng)
+    sobrevivencia = [None if math.isnan(x) else x for x in sobrevivencia.tolist()]
+    colunas = zip(r['linhas'].tolist(), vivas.tolist(), totais.tolist(), sobrevivencia, *medias,
+                  riqueza.tolist(), riqueza_viva.tolist(), (x + 0.0 for x in shannon.tolist()), biomas)
+    return {k: IndicadoresGrupo._make(linha) for k, linha in zip(chaves, colunas)}
+
+
+def acumuladores(tabela, chave=CHAVE_PARCELA_DATA):
+    """Converte as reduções de `_reducoes` em {chave: AcumuladorGrupo}."""
+    chaves, grupo = _codigo_grupo(tabela, chave)
+    ng = len(chaves)
+    r = _reducoes(tabela, grupo, ng)
+    somas = [(m, r['soma_' + c].tolist(), r['n_' + c].tolist()) for c, m in zip(REAIS, METRICAS_REAIS)]
+    grupos = {}
+    for i, (k, linhas, vivas, totais) in enumerate(zip(chaves, r['linhas'].tolist(), r['vivas'].tolist(),
+                                                        r['totais'].tolist())):
+        acc = AcumuladorGrupo()
+        acc.linhas, acc.vivas, acc.totais = linhas, vivas, totais
+        for m, soma, n in somas:
+            setattr(acc, 'soma_' + m, soma[i])
+            setattr(acc, 'n_' + m, n[i])
+        grupos[k] = acc
+    accs = list(grupos.values())
+    especies = tabela.rotulos['especie']
+    for g, sp, v in zip(*(a.tolist() for a in r['pares_especie'])):
+        accs[g].vivos_por_sp[especies[sp]] = v
+    for acc, biomas in zip(accs, _biomas(tabela, r, ng)):
+        acc.biomas = biomas
+    return grupos
+
+
+def agregar_colunar(path, chaves=(CHAVE_PARCELA_DATA,), validacao=None):
+    """Equivalente colunar de `agregacao.agregar(ler_registros(path, validacao=validacao), chaves)`."""
+    tabela = carregar_colunas(path, validacao)
+    return {chave: acumuladores(tabela, chave) for chave in chaves}
+
+
+def indicadores_colunar(path, chave=CHAVE_PARCELA_DATA, validacao=None):
+    """`indicadores` de `path` por `chave`, sem passar por `AcumuladorGrupo`."""
+    return indicadores(carregar_colunas(path, validacao), chave)
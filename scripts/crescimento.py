@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Crescimento (altura, diâmetro) entre campanhas, a partir das datas reais.
+
+- o intervalo entre campanhas vem das datas (AAAA-MM-DD): dias / DIAS_MES, então
+  cronogramas de campo irregulares não distorcem as taxas mensais;
+- as diferenças são feitas de uma vez sobre as colunas de cada série temporal
+  (`SerieTemporal` de gerar_visuais.py: datas ordenadas e colunas alinhadas a elas),
+  sem indexar por posição listas que podem ter tamanhos diferentes;
+- as taxas são suavizadas por regressão linear (mínimos quadrados) do valor contra o
+  tempo: a inclinação na série inteira (tendência, com R²) e em janelas móveis de
+  JANELA campanhas em torno de cada intervalo (taxa suavizada).
+
+Vale para as séries por parcela e por espécie (group_by_species traz altura e diâmetro).
+Valores ausentes (NaN) ficam fora das regressões; intervalos com data inválida ou de
+duração nula têm taxa NaN (exibida como '–', ver `formatar`).
+
+Uso:
+  python scripts/crescimento.py [-i CSV] [--especies]
+      taxas por intervalo e tendência (regressão) por parcela ou por espécie
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import math
+import os
+import sys
+from datetime import date
+
+DIAS_MES = 365.2425 / 12
+# campanhas por janela da taxa suavizada (o intervalo fica no meio)
+JANELA = 4
+METRICAS_CRESCIMENTO = ('altura_media', 'diametro_medio')
+
+
+def dia(data):
+    """Dia ordinal de uma data 'AAAA-MM-DD' (hora, se houver, é ignorada); None se inválida."""
+    try:
+        return date.fromisoformat(data[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+def meses_desde(datas):
+    """Meses (fracionários) de cada data desde a primeira; NaN para datas inválidas."""
+    dias = [dia(d) for d in datas]
+    origem = next((d for d in dias if d is not None), None)
+    return [(d - origem) / DIAS_MES if d is not None else math.nan for d in dias]
+
+
+def diferencas(col):
+    """Diferenças entre elementos consecutivos."""
+    return [b - a for a, b in zip(col, col[1:])]
+
+
+def regressao(x, y):
+    """(inclinação, R²) da reta de mínimos quadrados de y em x; pares com NaN são ignorados. None se indefinida."""
+    pares = [(a, b) for a, b in zip(x, y) if not (math.isnan(a) or math.isnan(b))]
+    n = len(pares)
+    if n < 2:
+        return None
+    mx = sum(a for a, _ in pares) / n
+    my = sum(b for _, b in pares) / n
+    sxx = sum((a - mx) ** 2 for a, _ in pares)
+    if sxx == 0:
+        return None
+    sxy = sum((a - mx) * (b - my) for a, b in pares)
+    syy = sum((b - my) ** 2 for _, b in pares)
+    inclinacao = sxy / sxx
+    r2 = (sxy * sxy) / (sxx * syy) if syy > 0 else 1.0
+    return inclinacao, r2
+
+
+def regressao_movel(x, y, janela=JANELA):
+    """Inclinação local para cada intervalo (i, i+1): regressão nas `janela` campanhas em torno dele."""
+    n = len(x)
+    inclinacoes = []
+    for i in range(n - 1):
+        inicio = max(0, min(i - (janela - 2) // 2, n - janela))
+        ajuste = regressao(x[inicio:inicio + janela], y[inicio:inicio + janela])
+        inclinacoes.append(ajuste[0] if ajuste else math.nan)
+    return inclinacoes
+
+
+def taxas(serie, metrica, janela=JANELA):
+    """
+    Crescimento de `metrica` em `serie`: por intervalo entre campanhas, `meses`, `delta`,
+    `taxa` (delta/mês) e `suavizada` (regressão móvel); na série, `tendencia` (por mês) e `r2`.
+    """
+    x = meses_desde(serie['datas'])
+    y = list(serie[metrica])
+    meses = diferencas(x)
+    delta = diferencas(y)
+    ajuste = regressao(x, y)
+    return {
+        'meses': meses,
+        'delta': delta,
+        # intervalo nulo ou com data inválida (NaN): taxa indefinida (NaN), não 0
+        'taxa': [d / m if m > 0 else math.nan for d, m in zip(delta, meses)],
+        'suavizada': regressao_movel(x, y, janela),
+        'tendencia': ajuste[0] if ajuste else None,
+        'r2': ajuste[1] if ajuste else None,
+    }
+
+
+def formatar(valor, formato):
+    """`valor` no `formato` de f-string; '–' se ausente (None ou NaN)."""
+    return '–' if valor is None or math.isnan(valor) else format(valor, formato)
+
+
+def crescimento(series, metricas=METRICAS_CRESCIMENTO, janela=JANELA):
+    """{nome: {métrica: taxas(...)}} para cada série (parcela ou espécie) de `series`."""
+    return {nome: {m: taxas(s, m, janela) for m in metricas} for nome, s in series.items()}
+
+
+def main(argv):
+    from agregacao import CHAVE_ESPECIE_DATA, CHAVE_PARCELA_DATA, agregar, ler_registros
+    from gerar_visuais import DEFAULT_INPUT, group_by_species, group_metrics
+
+    input_file = DEFAULT_INPUT
+    especies = False
+    for i, a in enumerate(argv):
+        if a in ('-i', '--input') and i+1 < len(argv):
+            input_file = argv[i+1]
+        if a == '--especies':
+            especies = True
+    if not os.path.exists(input_file):
+        print(f'Arquivo de entrada não encontrado: {input_file}')
+        return 2
+    grupos = agregar(ler_registros(input_file), (CHAVE_PARCELA_DATA, CHAVE_ESPECIE_DATA))
+    if especies:
+        series, _ = group_by_species(grupos[CHAVE_ESPECIE_DATA])
+    else:
+        series, _ = group_metrics(grupos[CHAVE_PARCELA_DATA])
+    for nome, c in crescimento(series).items():
+        datas = series[nome]['datas']
+        h, d = c['altura_media'], c['diametro_medio']
+        tendencia = ', '.join(f"{rotulo} {t['tendencia']:+.3f}/mês (R² {t['r2']:.2f})"
+                              for rotulo, t in (('altura', h), ('diâmetro', d)) if t['tendencia'] is not None)
+        print(f"{nome}: {tendencia or 'sem tendência (menos de 2 campanhas)'}")
+        for k in range(len(datas) - 1):
+            print(f"  {datas[k]} → {datas[k + 1]} ({formatar(h['meses'][k], '.1f')} meses): "
+                  f"Δh {formatar(h['delta'][k], '+.2f')} m ({formatar(h['taxa'][k], '+.3f')}/mês, "
+                  f"suavizada {formatar(h['suavizada'][k], '+.3f')}), "
+                  f"Δd {formatar(d['delta'][k], '+.2f')} cm ({formatar(d['taxa'][k], '+.3f')}/mês, "
+                  f"suavizada {formatar(d['suavizada'][k], '+.3f')})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
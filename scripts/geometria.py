@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Simplificação das camadas de limites (municípios de PE, biomas) embutidas no mapa.
+
+Para cada nível de zoom de `NIVEIS_ZOOM` a camada é:
+- quantizada: coordenadas arredondadas à grade do nível (`casas` decimais);
+- simplificada com Douglas–Peucker, tolerância de `PIXELS_TOLERANCIA` pixel no zoom.
+
+A topologia é preservada: os anéis são cortados em arcos nos vértices de junção
+(onde muda o conjunto de polígonos que compartilham o vértice) e cada arco é
+simplificado uma única vez — a divisa entre dois municípios sai idêntica nos dois,
+sem frestas nem sobreposições.
+
+O mapa embute só os níveis que alcança (ver `niveis_usados`); com zoom
+mínimo 12, apenas o nível 12; com zoom mínimo 7 (mapa agrupado que se afasta
+até o estado), os três.
+
+`topologia` reúne várias camadas em um único TopoJSON (arcos compartilhados,
+coordenadas inteiras em diferenças); `DECODIFICADOR_TOPOJSON` é o decodificador
+em JavaScript embutido no mapa.
+
+O resultado fica em cache ao lado do arquivo de origem
+(`limite_municipios_pe.geojson` -> `limite_municipios_pe.simplificado.json`) e só é
+refeito quando a origem ou os parâmetros mudam. O cache guarda só os níveis já
+pedidos por algum mapa: com o nível 12 apenas, fica menor que a origem; com os três
+(~1 MB para os 780 KB dos municípios de PE), ainda evita ~1 s de simplificação por execução.
+
+Uso:
+  python scripts/geometria.py dados/geo/limite_municipios_pe.geojson
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import hashlib
+import json
+import math
+import os
+import sys
+from collections import defaultdict
+
+# zoom mínimo de cada nível; acima do último nível vale o último
+NIVEIS_ZOOM = (8, 10, 12)
+PIXELS_TOLERANCIA = 1.0
+# pontos da grade inteira da topologia, por eixo
+QUANTIZACAO = 1_000_000
+VERSAO = 2
+
+
+def tolerancia_zoom(zoom, pixels=PIXELS_TOLERANCIA):
+    """Tamanho (graus) de `pixels` pixels de um tile de 256 px no `zoom` (Web Mercator, no equador)."""
+    return pixels * 360.0 / (256 * 2 ** zoom)
+
+
+def casas_decimais(tolerancia):
+    """Menor número de casas decimais cuja grade não passa da metade da tolerância."""
+    return max(0, math.ceil(-math.log10(tolerancia / 2)))
+
+
+def _distancia2(p, a, b):
+    """Quadrado da distância do ponto p ao segmento ab."""
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    if dx == 0 and dy == 0:
+        return (p[0] - a[0]) ** 2 + (p[1] - a[1]) ** 2
+    t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / (dx * dx + dy * dy)))
+    x, y = a[0] + t * dx, a[1] + t * dy
+    return (p[0] - x) ** 2 + (p[1] - y) ** 2
+
+
+def douglas_peucker(pontos, tolerancia, manter_meio=False):
+    """
+    Douglas–Peucker iterativo; sempre mantém o primeiro e o último ponto
+    (e, com `manter_meio`, ao menos um ponto intermediário).
+    """
+    if len(pontos) < 3:
+        return list(pontos)
+    tol2 = tolerancia * tolerancia
+    manter = [False] * len(pontos)
+    manter[0] = manter[-1] = True
+    pilha = [(0, len(pontos) - 1)]
+    while pilha:
+        i, j = pilha.pop()
+        maior, k = -1.0, -1
+        for m in range(i + 1, j):
+            d = _distancia2(pontos[m], pontos[i], pontos[j])
+            if d > maior:
+                maior, k = d, m
+        if k >= 0 and (maior > tol2 or manter_meio and (i, j) == (0, len(pontos) - 1)):
+            manter[k] = True
+            pilha.append((i, k))
+            pilha.append((k, j))
+    return [p for p, ok in zip(pontos, manter) if ok]
+
+
+def _aneis(geometria):
+    """Listas de anéis (coordenadas) de um Polygon/MultiPolygon, para edição no lugar."""
+    if not geometria:
+        return []
+    if geometria.get('type') == 'Polygon':
+        return [geometria['coordinates']]
+    if geometria.get('type') == 'MultiPolygon':
+        return geometria['coordinates']
+    return []
+
+
+def _arcos_dos_aneis(aneis):
+    """
+    Corta cada anel (pontos sem o de fechamento) em arcos entre junções — vértices onde
+    muda o conjunto de anéis que os compartilham. Uma divisa comum a dois anéis vira o
+    mesmo arco nos dois (em sentidos opostos). Anéis com menos de 3 pontos dão None.
+    """
+    donos = defaultdict(set)
+    repetidos = set()
+    for rid, anel in enumerate(aneis):
+        vistos = set()
+        for p in anel:
+            if p in vistos:
+                repetidos.add(p)
+            vistos.add(p)
+            donos[p].add(rid)
+    # Junções: vértices onde muda o conjunto de anéis que os compartilham
+    fixos = set(repetidos)
+    for anel in aneis:
+        n = len(anel)
+        for i, p in enumerate(anel):
+            if donos[p] != donos[anel[i - 1]] or donos[p] != donos[anel[(i + 1) % n]]:
+                fixos.add(p)
+
+    # Cada anel vira uma sequência de arcos entre junções
+    arcos_aneis = []
+    for anel in aneis:
+        if len(anel) < 3:
+            arcos_aneis.append(None)
+            continue
+        cortes = [i for i, p in enumerate(anel) if p in fixos]
+        if not cortes:
+            # anel isolado (ou idêntico a outro): começar no menor ponto
+            cortes = [anel.index(min(anel))]
+        if len(cortes) == 1:
+            # arco fechado: cortar também no ponto mais distante (mesma escolha para anéis idênticos)
+            a = anel[cortes[0]]
+            cortes.append(max(range(len(anel)), key=lambda i: ((anel[i][0] - a[0]) ** 2 + (anel[i][1] - a[1]) ** 2, anel[i])))
+            cortes.sort()
+        rodado = anel[cortes[0]:] + anel[:cortes[0]] + [anel[cortes[0]]]
+        cortes = [c - cortes[0] for c in cortes] + [len(anel)]
+        arcos_aneis.append([tuple(rodado[a:b + 1]) for a, b in zip(cortes, cortes[1:])])
+    return arcos_aneis
+
+
+def _anel_quantizado(anel, quantizar):
+    """Pontos quantizados do anel, sem o ponto de fechamento nem pontos repetidos em sequência."""
+    pontos = []
+    for x, y, *_ in anel:
+        p = quantizar(x, y)
+        if not pontos or pontos[-1] != p:
+            pontos.append(p)
+    if len(pontos) > 1 and pontos[0] == pontos[-1]:
+        pontos.pop()
+    return pontos
+
+
+def simplificar_colecao(colecao, tolerancia, casas):
+    """Nova FeatureCollection quantizada e simplificada, preservando as divisas compartilhadas."""
+    features = json.loads(json.dumps(colecao.get('features', [])))
+    poligonos = [poligono for f in features for poligono in _aneis(f.get('geometry'))]
+
+    aneis = [_anel_quantizado(anel, lambda x, y: (round(x, casas), round(y, casas)))
+             for poligono in poligonos for anel in poligono]
+    arcos_aneis = _arcos_dos_aneis(aneis)
+
+    # Arcos distintos com as mesmas pontas virariam o mesmo segmento: manter um ponto do meio
+    canonicos = {arco if arco <= arco[::-1] else arco[::-1] for arcos in arcos_aneis if arcos for arco in arcos}
+    pontas = defaultdict(int)
+    for arco in canonicos:
+        pontas[frozenset((arco[0], arco[-1]))] += 1
+
+    simplificados = {}
+
+    def simplificar_arco(arco):
+        # mesmo arco percorrido nos dois sentidos -> mesma simplificação
+        canonico = arco if arco <= arco[::-1] else arco[::-1]
+        simples = simplificados.get(canonico)
+        if simples is None:
+            simples = simplificados[canonico] = douglas_peucker(
+                canonico, tolerancia, pontas[frozenset((canonico[0], canonico[-1]))] > 1)
+        return simples if canonico is arco else simples[::-1]
+
+    resultado = []
+    for anel, arcos in zip(aneis, arcos_aneis):
+        if arcos is None:
+            resultado.append(anel + anel[:1])
+            continue
+        novo = [arcos[0][0]]
+        for arco in arcos:
+            novo.extend(simplificar_arco(arco)[1:])
+        # anel degenerado: manter os pontos quantizados
+        resultado.append(novo if len(novo) >= 4 else [p for arco in arcos for p in arco[:-1]] + [arcos[0][0]])
+
+    saida = iter(resultado)
+    for poligono in poligonos:
+        for k in range(len(poligono)):
+            poligono[k] = [list(p) for p in next(saida)]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _coordenadas(geometria):
+    tipo = geometria.get('type') if geometria else None
+    if tipo == 'Point':
+        yield geometria['coordinates']
+    elif tipo in ('MultiPoint', 'LineString'):
+        yield from geometria['coordinates']
+    elif tipo in ('MultiLineString', 'Polygon'):
+        for parte in geometria['coordinates']:
+            yield from parte
+    elif tipo == 'MultiPolygon':
+        for poligono in geometria['coordinates']:
+            for anel in poligono:
+                yield from anel
+
+
+def topologia(objetos, quantizacao=QUANTIZACAO):
+    """
+    TopoJSON único para várias camadas ({nome: FeatureCollection}): divisas comuns
+    (entre feições e entre camadas) viram um só arco, e as coordenadas são inteiras
+    (grade de `quantizacao` pontos por eixo) e codificadas em diferenças.
+    """
+    pontos = [c for colecao in objetos.values() for f in colecao.get('features', [])
+              for c in _coordenadas(f.get('geometry'))]
+    x0 = min((c[0] for c in pontos), default=0.0)
+    y0 = min((c[1] for c in pontos), default=0.0)
+    kx = (max((c[0] for c in pontos), default=0.0) - x0) / (quantizacao - 1) or 1.0
+    ky = (max((c[1] for c in pontos), default=0.0) - y0) / (quantizacao - 1) or 1.0
+
+    def quantizar(x, y):
+        return (round((x - x0) / kx), round((y - y0) / ky))
+
+    # Anéis de todas as camadas juntos, para que divisas entre camadas também sejam compartilhadas
+    poligonos = [(nome, i, poligono) for nome, colecao in objetos.items()
+                 for i, f in enumerate(colecao.get('features', [])) for poligono in _aneis(f.get('geometry'))]
+    aneis = [_anel_quantizado(anel, quantizar) for _, _, poligono in poligonos for anel in poligono]
+    arcos_aneis = _arcos_dos_aneis(aneis)
+
+    arcos = []
+    indice = {}
+
+    def indice_arco(arco):
+        # arco percorrido no sentido oposto ao guardado: ~i (convenção TopoJSON)
+        i = indice.get(arco)
+        if i is not None:
+            return i
+        i = indice.get(arco[::-1])
+        if i is not None:
+            return ~i
+        indice[arco] = len(arcos)
+        arcos.append(arco)
+        return len(arcos) - 1
+
+    refs_aneis = []
+    for anel, arcos_anel in zip(aneis, arcos_aneis):
+        if arcos_anel is None:
+            arcos_anel = [tuple(anel + anel[:1])] if anel else []
+        refs_aneis.append([indice_arco(arco) for arco in arcos_anel])
+
+    refs = iter(refs_aneis)
+    arcos_poligono = {}
+    for nome, i, poligono in poligonos:
+        arcos_poligono.setdefault((nome, i), []).append([next(refs) for _ in poligono])
+
+    topo_objetos = {}
+    for nome, colecao in objetos.items():
+        geometrias = []
+        for i, f in enumerate(colecao.get('features', [])):
+            geom = f.get('geometry') or {}
+            tipo = geom.get('type')
+            saida = {'type': tipo}
+            if tipo == 'Polygon':
+                saida['arcs'] = arcos_poligono[(nome, i)][0]
+            elif tipo == 'MultiPolygon':
+                saida['arcs'] = arcos_poligono.get((nome, i), [])
+            elif tipo == 'Point':
+                saida['coordinates'] = list(quantizar(*geom['coordinates'][:2]))
+            elif tipo in ('MultiPoint', 'LineString'):
+                pts = [list(quantizar(*c[:2])) for c in geom['coordinates']]
+                if tipo == 'MultiPoint':
+                    saida['coordinates'] = pts
+                else:
+                    saida['arcs'] = [indice_arco(tuple(map(tuple, pts)))]
+            elif tipo == 'MultiLineString':
+                saida['arcs'] = [[indice_arco(tuple(quantizar(*c[:2]) for c in linha))] for linha in geom['coordinates']]
+            else:
+                saida['type'] = None
+            if f.get('properties') is not None:
+                saida['properties'] = f['properties']
+            geometrias.append(saida)
+        topo_objetos[nome] = {'type': 'GeometryCollection', 'geometries': geometrias}
+
+    # Arcos em diferenças: primeiro ponto absoluto, os demais relativos ao anterior
+    delta = []
+    for arco in arcos:
+        px = py = 0
+        codificado = []
+        for x, y in arco:
+            codificado.append([x - px, y - py])
+            px, py = x, y
+        delta.append(codificado)
+    return {'type': 'Topology', 'transform': {'scale': [kx, ky], 'translate': [x0, y0]},
+            'objects': topo_objetos, 'arcs': delta}
+
+
+# Decodificador TopoJSON -> GeoJSON embutido no mapa (par de `topologia`)
+DECODIFICADOR_TOPOJSON = """function topoFeatures(topo, nome) {
+    var obj = topo.objects[nome];
+    if (!obj) return null;
+    if (!topo.decodificados) {
+        var t = topo.transform;
+        topo.decodificados = topo.arcs.map(function(arco) {
+            var x = 0, y = 0;
+            return arco.map(function(d) {
+                x += d[0]; y += d[1];
+                return [x * t.scale[0] + t.translate[0], y * t.scale[1] + t.translate[1]];
+            });
+        });
+    }
+    var arcos = topo.decodificados, t = topo.transform;
+    function ponto(p) { return [p[0] * t.scale[0] + t.translate[0], p[1] * t.scale[1] + t.translate[1]]; }
+    function linha(ids) {
+        var pts = [];
+        ids.forEach(function(i, k) {
+            var a = i < 0 ? arcos[~i].slice().reverse() : arcos[i];
+            pts.push.apply(pts, k ? a.slice(1) : a);
+        });
+        return pts;
+    }
+    function aneis(lista) { return lista.map(linha); }
+    function geometria(g) {
+        switch (g.type) {
+            case 'Polygon': return {type: g.type, coordinates: aneis(g.arcs)};
+            case 'MultiPolygon': return {type: g.type, coordinates: g.arcs.map(aneis)};
+            case 'LineString': return {type: g.type, coordinates: linha(g.arcs)};
+            case 'MultiLineString': return {type: g.type, coordinates: aneis(g.arcs)};
+            case 'Point': return {type: g.type, coordinates: ponto(g.coordinates)};
+            case 'MultiPoint': return {type: g.type, coordinates: g.coordinates.map(ponto)};
+        }
+        return null;
+    }
+    return {type: 'FeatureCollection', features: obj.geometries.map(function(g) {
+        return {type: 'Feature', properties: g.properties || {}, geometry: geometria(g)};
+    })};
+}"""
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def caminho_cache(path):
+    return os.path.splitext(path)[0] + '.simplificado.json'
+
+
+def niveis_simplificados(path, niveis=NIVEIS_ZOOM, pixels=PIXELS_TOLERANCIA):
+    """
+    {zoom (str): FeatureCollection} com uma versão da camada para cada nível de `niveis`.
+    Os níveis já calculados vêm do cache ao lado de `path` (válido enquanto a origem e os
+    parâmetros não mudam); os que faltam são calculados e acrescentados a ele.
+    """
+    cache = caminho_cache(path)
+    assinatura = {'fonte': _sha256(path), 'pixels': pixels, 'versao': VERSAO}
+    salvos = {}
+    if os.path.exists(cache):
+        with open(cache, 'r', encoding='utf-8') as f:
+            salvo = json.load(f)
+        if salvo.get('assinatura') == assinatura:
+            salvos = salvo['niveis']
+
+    faltam = [zoom for zoom in niveis if str(zoom) not in salvos]
+    if faltam:
+        with open(path, 'r', encoding='utf-8') as f:
+            colecao = json.load(f)
+        for zoom in faltam:
+            tol = tolerancia_zoom(zoom, pixels)
+            salvos[str(zoom)] = simplificar_colecao(colecao, tol, casas_decimais(tol))
+        salvos = {str(z): salvos[str(z)] for z in sorted(int(z) for z in salvos)}
+        tmp = cache + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'assinatura': assinatura, 'niveis': salvos}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, cache)
+    return {str(zoom): salvos[str(zoom)] for zoom in niveis}
+
+
+def zooms_usados(zooms, zoom_min=0, zoom_max=24):
+    """Os níveis de `zooms` usados entre `zoom_min` e `zoom_max`: o vigente em `zoom_min` e os mais detalhados."""
+    zooms = sorted(int(z) for z in zooms)
+    base = max([z for z in zooms if z <= zoom_min] or zooms[:1])
+    return [z for z in zooms if base <= z <= zoom_max]
+
+
+def niveis_usados(versoes, zoom_min=0, zoom_max=24):
+    """As `versoes` ({zoom (str): FeatureCollection}) dos `zooms_usados` entre `zoom_min` e `zoom_max`."""
+    return {str(z): versoes[str(z)] for z in zooms_usados(versoes, zoom_min, zoom_max)}
+
+
+def camada_simplificada(path, zoom_min=0, zoom_max=24):
+    """Texto JSON compacto {zoom: FeatureCollection} com os níveis usados entre `zoom_min` e `zoom_max`."""
+    versoes = niveis_simplificados(path, zooms_usados(NIVEIS_ZOOM, zoom_min, zoom_max))
+    return json.dumps(versoes, ensure_ascii=False, separators=(',', ':'))
+
+
+def main(argv):
+    if not argv:
+        print(__doc__)
+        return 2
+    for path in argv:
+        versoes = niveis_simplificados(path)
+        tamanhos = ', '.join(f'z{z}: {len(json.dumps(v, separators=(",", ":"))) / 1024:.0f} KB' for z, v in versoes.items())
+        print(f'{path} ({os.path.getsize(path) / 1024:.0f} KB) -> {tamanhos} em {caminho_cache(path)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -7,23 +7,91 @@ Gera três arquivos HTML para o portfólio do PRAD Simulado:
 Uso:
   python scripts/gerar_visuais.py --input portfolio/Simulado_PE/monitoramento_simulado.csv --out portfolio/Simulado_PE/visuais --geojson portfolio/Simulado_PE/geo/parcelas.geojson
 
+Opção `--colunar`: usa o backend NumPy opcional (scripts/colunar.py) para arquivos grandes.
+Opção `--workers N`: agrega shards do CSV em N processos (ignorada com `--colunar`, `--incremental` e `--db`).
+Opção `--db CAMINHO`: lê os agregados por SQL da base criada com `base_monitoramento.py import`.
+Opção `--incremental`: reaproveita os agregados por grupo salvos em saidas/cache_agregados.sqlite
+e recalcula só as campanhas novas ou alteradas.
+Opção `--lote [RAIZ]`: gera os visuais de cada projeto RAIZ/*/monitoramento_*.csv (padrão: portfolio)
+em RAIZ/<projeto>/visuais, com `--workers N` projetos em paralelo; catálogo de espécies e limites
+IBGE são carregados uma única vez. Ao final imprime os tempos por projeto e etapa. Com
+`--incremental`, cada projeto usa o seu cache em saidas/cache_agregados/<projeto>.sqlite.
+Opção `--espelho PASTA`: modo offline; as malhas do IBGE vêm de um espelho local
+(criado com `python scripts/cache_ibge.py espelhar PASTA`) em vez da rede.
+Opção `--topojson`: o mapa embute todas as camadas em um único TopoJSON (divisas
+compartilhadas uma só vez, coordenadas inteiras em diferenças) com um decodificador em JS.
+Opção `--camadas-externas`: municípios de PE e biomas vão para visuais/camadas/*.json
+(+ .gz/.br pré-comprimidos) e só são baixados quando ativados no controle de camadas.
+Opção `--tiles`: parcelas, municípios de PE e biomas viram uma pirâmide de tiles vetoriais
+em visuais/tiles/<camada>/z/x/y.json (scripts/tiles_vetoriais.py), do zoom do estado ao 15 e
+recortada na área navegável do mapa; o mapa baixa e desenha só os tiles visíveis. Tem
+precedência sobre `--topojson`/`--camadas-externas` para essas camadas.
+Opção `--forcar`: regera tudo. Sem ela, só roda o que estiver desatualizado: um projeto é um grafo
+de etapas (carregar, agregar, limites, relatorio, sintese, localizar, mapa; scripts/grafo.py) que declaram
+entradas e saídas, com estado em <saída>/.etapas.json; etapas independentes (ex.: download dos
+limites e relatório) rodam em paralelo. O `--lote` roda o mesmo grafo em cada projeto, com
+estado em <projeto>/visuais/.etapas.json. Arquivos só são regravados (de forma atômica) quando
+o conteúdo muda.
+Opção `--max-series N`: gráficos com mais de N parcelas (padrão 12) mostram a mediana e a
+faixa p10–p90 em vez de uma linha por parcela; séries longas são reduzidas a ~1 ponto por
+pixel (LTTB) e os rótulos de data do eixo X são espaçados.
+Opção `--graficos-canvas`: no relatorio.html os gráficos viram marcadores <canvas>; as séries
+alinhadas vão uma única vez em um bloco JSON e um renderizador JS embutido desenha os gráficos
+(mesmo layout do SVG) — página bem menor e geração mais rápida em projetos grandes.
+Opção `--projeto NOME`: nome exibido no mapa e no dashboard (padrão: a pasta do CSV; no `--lote`,
+a pasta de cada projeto). O enquadramento e a área navegável do mapa saem das parcelas do projeto.
+Opção `--publicar`: acrescenta a etapa que copia os produtos alterados para docs/ (publish_docs.py);
+no `--lote`, a cópia roda uma vez ao final, só se nenhum projeto falhou.
+
 Sem bibliotecas externas (somente stdlib); gráficos renderizados via simples SVG inline.
 """
 import csv
+import filecmp
+import glob
+import gzip
+import io
 import os
 import math
+import re
 import sys
 import json
-import urllib.request
-from collections import defaultdict
+import time
+from array import array
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import closing
 from statistics import mean
 
+try:
+    import brotli
+except ImportError:  # dependência opcional: sem ela só a versão .gz é gravada
+    brotli = None
+
+from agregacao import (CHAVE_ESPECIE_DATA, CHAVE_PARCELA_DATA, RelatorioValidacao, agregar, agregar_paralelo,
+                       ler_registros, parse_float)
+from agrupamento import CAMPOS_GRUPO, agrupar, coordenadas_parcelas, pontos_parcelas
+from cache_ibge import CacheIBGE
+from geometria import DECODIFICADOR_TOPOJSON, camada_simplificada, niveis_usados, topologia
+from grafo import Etapa, Grafo
+from indice_espacial import CAMPOS_LOCALIZACAO, Localizador, biomas_parcelas, conferir_parcelas
+from manifesto import gravar_se_mudou, hash_arquivo, versao_scripts
+from modelos import DEFAULT_CACHE_SECOES, CacheSecoes, Modelo
+from crescimento import METRICAS_CRESCIMENTO, crescimento, formatar
+from regras import avaliar, indice_alertas
+from tiles_vetoriais import EXTENT, gerar_tiles
+
 DEFAULT_INPUT = os.path.join('portfolio','Simulado_PE','monitoramento_simulado.csv')
 DEFAULT_OUT = os.path.join('portfolio','Simulado_PE','visuais')
 DEFAULT_GEOJSON = os.path.join('portfolio','Simulado_PE','geo','parcelas.geojson')
 DEFAULT_SINTESE = os.path.join('portfolio','Simulado_PE','visuais','sintese_ultima_campanha.csv')
-DEFAULT_MUNICIPIOS = os.path.join('portfolio','Simulado_PE','geo','limite_municipios_pe.geojson')
-DEFAULT_BIOMAS = os.path.join('portfolio','Simulado_PE','geo','limite_biomas.geojson')
+# limites do IBGE compartilhados por todos os projetos (fora da pasta de qualquer um deles)
+DIR_GEO_COMPARTILHADO = os.path.join('dados','geo')
+DEFAULT_MUNICIPIOS = os.path.join(DIR_GEO_COMPARTILHADO,'limite_municipios_pe.geojson')
+DEFAULT_BIOMAS = os.path.join(DIR_GEO_COMPARTILHADO,'limite_biomas.geojson')
+DEFAULT_ESPECIES = os.path.join('dados','especies_PE_mata_atlantica.csv')
+DEFAULT_PORTFOLIO = 'portfolio'
+# downloads simultâneos de malhas municipais/biomas
+DOWNLOADS_SIMULTANEOS = 8
 
 FIELDS = ['parcela','data','especie','plantadas_vivas','plantadas_totais','cobertura_copa_pct','cobertura_invasoras_pct']
 
@@ -31,115 +99,124 @@ FIELDS = ['parcela','data','especie','plantadas_vivas','plantadas_totais','cober
 COLOR_ALERTA_CRITICO = '#d73027'  # Vermelho
 COLOR_ALERTA_ATENCAO = '#fee08b'  # Amarelo
 COLOR_ALERTA_OK = '#1a9850'       # Verde
+CORES_ALERTA = {'CRÍTICO': COLOR_ALERTA_CRITICO, 'ATENÇÃO': COLOR_ALERTA_ATENCAO}
+# estágio sucessional -> cor (RdYlGn)
+CORES_ESTAGIO = {'Inicial': '#fee08b', 'Intermediário': '#91cf60', 'Avançado': '#1a9850'}
+
+# Gráficos SVG: área útil de PIXELS_GRAFICO px (orçamento de pontos por série), um rótulo de data
+# a cada PIXELS_ROTULO_X px no máximo e, acima de MAX_SERIES_LINHAS séries, mediana + faixa p10–p90
+PIXELS_GRAFICO = 440
+PIXELS_ROTULO_X = 60
+MAX_SERIES_LINHAS = 12
 
 # Paleta ColorBrewer BuGn (3 classes) - usada para visualizações principais
 CB_BUGN = ['#e5f5f9', '#99d8c9', '#2ca25f']
 
-def read_rows(path):
-    with open(path, newline='', encoding='utf-8') as f:
-        r = csv.DictReader(f)
-        for row in r:
-            yield row
-
-
-def group_metrics(rows):
-    # Agrupar por parcela+data
-    grupos = defaultdict(list)
-    datas_ordem = set()
-    for r in rows:
-        key = (r['parcela'], r['data'])
-        grupos[key].append(r)
-        datas_ordem.add(r['data'])
-
-    datas = sorted(datas_ordem)
-    series = defaultdict(lambda: {
-        'datas': [],
-        'sobrevivencia': [],
-        'cobertura_copa': [],
-        'cobertura_invasoras': [],
-        'riqueza': [],
-        'shannon': [],
-        'altura_media': [],
-        'diametro_medio': [],
-        'razao_copa_invasoras': [],
-    })
-
-    # Calcular por parcela e data
-    for (parcela, data), itens in grupos.items():
-        plantadas_vivas = sum(int(i['plantadas_vivas']) for i in itens if i['plantadas_vivas'])
-        plantadas_totais = sum(int(i['plantadas_totais']) for i in itens if i['plantadas_totais'])
-        cobertura_copa = [float(i['cobertura_copa_pct']) for i in itens if i['cobertura_copa_pct']]
-        cobertura_invas = [float(i['cobertura_invasoras_pct']) for i in itens if i['cobertura_invasoras_pct']]
-        alturas = [float(i['altura_m']) for i in itens if i.get('altura_m')]
-        diametros = [float(i['diametro_cm']) for i in itens if i.get('diametro_cm')]
-        sobrevivencia = plantadas_vivas/plantadas_totais*100 if plantadas_totais>0 else 0
-        copa_mean = mean(cobertura_copa) if cobertura_copa else 0
-        invas_mean = mean(cobertura_invas) if cobertura_invas else 0
-        altura_mean = mean(alturas) if alturas else 0
-        diametro_mean = mean(diametros) if diametros else 0
+def read_rows(path, validacao=None):
+    """Registros tipados (`agregacao.Registro`), convertidos uma única vez por linha."""
+    return ler_registros(path, validacao=validacao)
+
+
+METRICAS_PARCELA = (
+    'sobrevivencia', 'cobertura_copa', 'cobertura_invasoras', 'riqueza', 'shannon',
+    'altura_media', 'diametro_medio', 'razao_copa_invasoras',
+)
+
+
+class SerieTemporal:
+    """
+    Série por parcela (ou por espécie): datas ordenadas, índice data→posição e
+    uma coluna `array('d')` por métrica, todas alinhadas às datas.
+    Mantém o acesso de dict usado no script (`s['datas']`, `s.get('shannon', [])`).
+    """
+
+    def __init__(self, metricas):
+        self.datas = []
+        self.colunas = {m: array('d') for m in metricas}
+        self._indice = {}
+
+    def adicionar(self, data, **valores):
+        """Acrescenta uma campanha; datas fora de ordem reordenam todas as colunas juntas."""
+        fora_de_ordem = bool(self.datas) and data < self.datas[-1]
+        self._indice[data] = len(self.datas)
+        self.datas.append(data)
+        for m, col in self.colunas.items():
+            col.append(valores[m])
+        if fora_de_ordem:
+            ordem = sorted(range(len(self.datas)), key=self.datas.__getitem__)
+            self.datas = [self.datas[i] for i in ordem]
+            self.colunas = {m: array('d', (col[i] for i in ordem)) for m, col in self.colunas.items()}
+            self._indice = {d: i for i, d in enumerate(self.datas)}
+
+    def indice(self, data):
+        """Posição de `data` na série (None se a parcela não foi medida nessa data)."""
+        return self._indice.get(data)
+
+    def valor(self, metrica, data, padrao=None):
+        i = self._indice.get(data)
+        return self.colunas[metrica][i] if i is not None else padrao
+
+    def alinhado(self, metrica, datas):
+        """Valores de `metrica` para cada data de `datas` (None onde não houve medição)."""
+        col = self.colunas[metrica]
+        idx = self._indice
+        return [col[idx[d]] if d in idx else None for d in datas]
+
+    def __len__(self):
+        return len(self.datas)
+
+    def __contains__(self, chave):
+        return chave == 'datas' or chave in self.colunas
+
+    def __getitem__(self, chave):
+        if chave == 'datas':
+            return self.datas
+        return self.colunas[chave]
+
+    def get(self, chave, padrao=None):
+        return self[chave] if chave in self else padrao
+
+
+def group_metrics(grupos):
+    """Monta as séries por parcela a partir dos acumuladores (parcela, data) de `agregar`."""
+    datas = sorted({data for (_, data) in grupos})
+    series = defaultdict(lambda: SerieTemporal(METRICAS_PARCELA))
+
+    for (parcela, data), g in sorted(grupos.items()):
+        copa_mean = g.copa_media or 0
+        invas_mean = g.invasoras_media or 0
         razao_ci = (copa_mean / (invas_mean if invas_mean > 0 else 1e-6)) if (copa_mean > 0 or invas_mean > 0) else 0
-        # riqueza e Shannon por parcela/data
-        vivos_por_sp = defaultdict(int)
-        for i in itens:
-            try:
-                vivos = int(i['plantadas_vivas']) if i['plantadas_vivas'] else 0
-            except ValueError:
-                vivos = 0
-            vivos_por_sp[i['especie']] += vivos
-        riqueza = sum(1 for v in vivos_por_sp.values() if v > 0)
-        total_vivos = sum(vivos_por_sp.values())
-        if total_vivos > 0:
-            from math import log
-            p_list = [v/total_vivos for v in vivos_por_sp.values() if v > 0]
-            shannon = -sum(p*log(p) for p in p_list)
-        else:
-            shannon = 0.0
-        series[parcela]['datas'].append(data)
-        series[parcela]['sobrevivencia'].append(sobrevivencia)
-        series[parcela]['cobertura_copa'].append(copa_mean)
-        series[parcela]['cobertura_invasoras'].append(invas_mean)
-        series[parcela]['riqueza'].append(riqueza)
-        series[parcela]['shannon'].append(shannon)
-        series[parcela]['altura_media'].append(altura_mean)
-        series[parcela]['diametro_medio'].append(diametro_mean)
-        series[parcela]['razao_copa_invasoras'].append(razao_ci)
-
-    # Ordenar cada série por datas globais
-    for parcela, s in series.items():
-        ordenados = sorted(zip(s['datas'], s['sobrevivencia'], s['cobertura_copa'], s['cobertura_invasoras']))
-        s['datas'] = [d for d,_,__,___ in ordenados]
-        s['sobrevivencia'] = [v for _,v,__,___ in ordenados]
-        s['cobertura_copa'] = [v for _,__,v,___ in ordenados]
-        s['cobertura_invasoras'] = [v for _,__,__,v in ordenados]
+        series[parcela].adicionar(
+            data,
+            sobrevivencia=g.sobrevivencia or 0,
+            cobertura_copa=copa_mean,
+            cobertura_invasoras=invas_mean,
+            riqueza=g.riqueza_viva,
+            shannon=g.shannon,
+            altura_media=g.altura_media or 0,
+            diametro_medio=g.diametro_medio or 0,
+            razao_copa_invasoras=razao_ci,
+        )
 
     return series, datas
 
 
-def group_by_species(rows):
-    """Agrupar por espécie + data para gerar séries temporais por espécie."""
-    grupos = defaultdict(list)
-    datas_ordem = set()
-    for r in rows:
-        key = (r['especie'], r['data'])
-        grupos[key].append(r)
-        datas_ordem.add(r['data'])
-    
-    datas = sorted(datas_ordem)
-    series_sp = defaultdict(lambda: {'datas':[], 'sobrevivencia':[]})
-    
-    for (especie, data), itens in grupos.items():
-        plantadas_vivas = sum(int(i['plantadas_vivas']) for i in itens if i['plantadas_vivas'])
-        plantadas_totais = sum(int(i['plantadas_totais']) for i in itens if i['plantadas_totais'])
-        sobrevivencia = plantadas_vivas/plantadas_totais*100 if plantadas_totais>0 else 0
-        series_sp[especie]['datas'].append(data)
-        series_sp[especie]['sobrevivencia'].append(sobrevivencia)
-    
-    # Ordenar
-    for sp, s in series_sp.items():
-        ordenados = sorted(zip(s['datas'], s['sobrevivencia']))
-        s['datas'] = [d for d,_ in ordenados]
-        s['sobrevivencia'] = [v for _,v in ordenados]
-    
+def group_by_species(grupos):
+    """
+    Séries temporais por espécie a partir dos acumuladores (espécie, data): sobrevivência
+    e, para as taxas de crescimento, altura e diâmetro médios (NaN sem medição).
+    """
+    datas = sorted({data for (_, data) in grupos})
+    series_sp = defaultdict(lambda: SerieTemporal(('sobrevivencia',) + METRICAS_CRESCIMENTO))
+
+    for (especie, data), g in sorted(grupos.items()):
+        series_sp[especie].adicionar(
+            data,
+            sobrevivencia=g.sobrevivencia or 0,
+            altura_media=g.altura_media if g.altura_media is not None else math.nan,
+            diametro_medio=g.diametro_medio if g.diametro_medio is not None else math.nan,
+        )
+
     return series_sp, datas
 
 
@@ -166,180 +243,71 @@ def polyline(points, color):
 
 
 def calcular_incrementos(series):
-    """Calcula taxa de incremento (Δ altura e Δ diâmetro) entre campanhas consecutivas."""
+    """
+    Incremento (Δ altura e Δ diâmetro) entre campanhas consecutivas, com os meses reais
+    entre as datas, e taxas suavizadas por regressão (scripts/crescimento.py).
+    """
     incrementos = {}
-    
-    for parcela, s in series.items():
+    for parcela, c in crescimento(series).items():
+        datas = series[parcela]['datas']
+        h, d = c['altura_media'], c['diametro_medio']
         incrementos[parcela] = {
-            'datas_intervalo': [],
-            'delta_altura': [],
-            'delta_diametro': [],
-            'taxa_altura_mes': [],
-            'taxa_diametro_mes': []
+            'datas_intervalo': [f"{a} → {b}" for a, b in zip(datas, datas[1:])],
+            'meses': h['meses'],
+            'delta_altura': h['delta'],
+            'delta_diametro': d['delta'],
+            'taxa_altura_mes': h['taxa'],
+            'taxa_diametro_mes': d['taxa'],
+            'taxa_altura_suavizada': h['suavizada'],
+            'taxa_diametro_suavizada': d['suavizada'],
+            'tendencia_altura_mes': h['tendencia'],
+            'r2_altura': h['r2'],
+            'tendencia_diametro_mes': d['tendencia'],
+            'r2_diametro': d['r2'],
         }
-        
-        alturas = s.get('altura_media', [])
-        diametros = s.get('diametro_medio', [])
-        datas = s.get('datas', [])
-        
-        for i in range(1, len(datas)):
-            # Calcular diferença absoluta
-            delta_h = alturas[i] - alturas[i-1] if i < len(alturas) else 0
-            delta_d = diametros[i] - diametros[i-1] if i < len(diametros) else 0
-            
-            # Calcular meses entre campanhas (aproximado: 6 meses)
-            # Simplificado: assumir 6 meses entre campanhas
-            meses = 6
-            taxa_h = delta_h / meses if meses > 0 else 0
-            taxa_d = delta_d / meses if meses > 0 else 0
-            
-            intervalo = f"{datas[i-1]} → {datas[i]}"
-            incrementos[parcela]['datas_intervalo'].append(intervalo)
-            incrementos[parcela]['delta_altura'].append(delta_h)
-            incrementos[parcela]['delta_diametro'].append(delta_d)
-            incrementos[parcela]['taxa_altura_mes'].append(taxa_h)
-            incrementos[parcela]['taxa_diametro_mes'].append(taxa_d)
-    
     return incrementos
 
 
-def classificar_estagio_sucessional(series, ultima_data):
+def classificar_estagio_sucessional(series, ultima_data, avaliacao=None):
     """
     Classifica estágio sucessional de cada parcela com base em múltiplos indicadores.
-    Score: 0-100
+    Score: 0-100 (pesos e faixas em scripts/regras.py)
     - Inicial (0-33): Baixa diversidade, alta invasoras
     - Intermediário (34-66): Diversidade média, invasoras controladas
     - Avançado (67-100): Alta diversidade, copa dominante
+    `avaliacao` (regras.avaliar) já traz todas as campanhas; sem ela, avalia `series`.
     """
-    classificacao = {}
-    
-    for parcela, s in series.items():
-        if ultima_data not in s['datas']:
-            continue
-        
-        idx = s['datas'].index(ultima_data)
-        sobrev = s['sobrevivencia'][idx]
-        shannon = s['shannon'][idx]
-        riqueza = s['riqueza'][idx]
-        copa = s['cobertura_copa'][idx]
-        invasoras = s['cobertura_invasoras'][idx]
-        razao = s['razao_copa_invasoras'][idx]
-        
-        # Pontuação por critério (0-100)
-        score_sobrev = min(sobrev, 100)  # Sobrevivência já é %
-        score_shannon = min((shannon / 2.0) * 100, 100)  # Shannon max ~2.0 para 8 espécies
-        score_riqueza = min((riqueza / 8) * 100, 100)  # 8 espécies = máximo
-        score_copa = min(copa, 100)  # Copa já é %
-        score_invasoras = max(100 - invasoras, 0)  # Inverter (menos invasoras = melhor)
-        score_razao = min((razao / 5) * 100, 100)  # Razão 5:1 = excelente
-        
-        # Média ponderada
-        score_total = (
-            score_sobrev * 0.25 +
-            score_shannon * 0.15 +
-            score_riqueza * 0.10 +
-            score_copa * 0.20 +
-            score_invasoras * 0.20 +
-            score_razao * 0.10
-        )
-        
-        # Classificar
-        if score_total < 34:
-            estagio = 'Inicial'
-            cor = '#fee08b'
-        elif score_total < 67:
-            estagio = 'Intermediário'
-            cor = '#91cf60'
-        else:
-            estagio = 'Avançado'
-            cor = '#1a9850'
-        
-        classificacao[parcela] = {
-            'score': score_total,
-            'estagio': estagio,
-            'cor': cor,
-            'sobrevivencia': sobrev,
-            'shannon': shannon,
-            'riqueza': riqueza,
-            'copa': copa,
-            'invasoras': invasoras,
-            'razao': razao
-        }
-    
+    classificacao = (avaliacao or avaliar(series)).classificacao(ultima_data)
+    for c in classificacao.values():
+        c['cor'] = CORES_ESTAGIO[c['estagio']]
     return classificacao
 
 
-def gerar_alertas(series, ultima_data):
-    """Gera alertas automáticos com base em critérios técnicos."""
-    alertas = []
-    
-    for parcela, s in series.items():
-        if ultima_data not in s['datas']:
-            continue
-        
-        idx = s['datas'].index(ultima_data)
-        sobrev = s['sobrevivencia'][idx]
-        invasoras = s['cobertura_invasoras'][idx]
-        copa = s['cobertura_copa'][idx]
-        altura = s['altura_media'][idx]
-        
-        # Critérios de alerta
-        if sobrev < 70:
-            alertas.append({
-                'parcela': parcela,
-                'tipo': 'CRÍTICO',
-                'categoria': 'Sobrevivência',
-                'mensagem': f'Taxa de sobrevivência baixa ({sobrev:.1f}%) - Meta: ≥70%',
-                'valor': sobrev,
-                'cor': COLOR_ALERTA_CRITICO
-            })
-        
-        if invasoras > 25:
-            alertas.append({
-                'parcela': parcela,
-                'tipo': 'ATENÇÃO',
-                'categoria': 'Invasoras',
-                'mensagem': f'Cobertura de invasoras elevada ({invasoras:.1f}%) - Meta: ≤25%',
-                'valor': invasoras,
-                'cor': COLOR_ALERTA_ATENCAO
-            })
-        
-        if copa < 40 and len(s['datas']) >= 3:  # Após 3+ campanhas
-            alertas.append({
-                'parcela': parcela,
-                'tipo': 'ATENÇÃO',
-                'categoria': 'Copa',
-                'mensagem': f'Cobertura de copa insuficiente ({copa:.1f}%) - Meta: ≥40% após 18 meses',
-                'valor': copa,
-                'cor': COLOR_ALERTA_ATENCAO
-            })
-        
-        if altura < 2.0 and len(s['datas']) >= 4:  # Após 4+ campanhas
-            alertas.append({
-                'parcela': parcela,
-                'tipo': 'ATENÇÃO',
-                'categoria': 'Crescimento',
-                'mensagem': f'Crescimento lento - Altura média {altura:.2f}m após 2+ anos',
-                'valor': altura,
-                'cor': COLOR_ALERTA_ATENCAO
-            })
-    
+def gerar_alertas(series, ultima_data, avaliacao=None):
+    """
+    Gera alertas automáticos com base em critérios técnicos e tendências (REGRAS_ALERTA e
+    REGRAS_TENDENCIA em scripts/regras.py); cada alerta traz `desde`, a campanha em que começou.
+    """
+    alertas = (avaliacao or avaliar(series)).alertas(ultima_data)
+    for a in alertas:
+        a['cor'] = CORES_ALERTA[a['tipo']]
     return alertas
 
 
 def exportar_sintese_csv(series, classificacao, alertas, ultima_data, path_out):
-    """Exporta CSV de síntese agregada da última campanha."""
+    """Exporta CSV de síntese agregada da última campanha (path_out=None: só devolve as linhas)."""
     rows_out = []
+    indice = indice_alertas(alertas)
     
     for parcela, s in series.items():
-        if ultima_data not in s['datas']:
+        idx = s.indice(ultima_data)
+        if idx is None:
             continue
         
-        idx = s['datas'].index(ultima_data)
         classif = classificacao.get(parcela, {})
         
-        # Alertas para esta parcela
-        alertas_parcela = [a for a in alertas if a['parcela'] == parcela]
+        # Alertas para esta parcela (índice por parcela/categoria montado uma vez)
+        alertas_parcela = [a for por_categoria in indice.get(parcela, {}).values() for a in por_categoria]
         n_criticos = sum(1 for a in alertas_parcela if a['tipo'] == 'CRÍTICO')
         n_atencao = sum(1 for a in alertas_parcela if a['tipo'] == 'ATENÇÃO')
         
@@ -362,18 +330,145 @@ def exportar_sintese_csv(series, classificacao, alertas, ultima_data, path_out):
         rows_out.append(row)
     
     # Escrever CSV
-    if rows_out:
+    if rows_out and path_out:
         fieldnames = list(rows_out[0].keys())
-        with open(path_out, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows_out)
+        buf = io.StringIO(newline='')
+        writer = csv.DictWriter(buf, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows_out)
+        gravar_se_mudou(path_out, buf.getvalue().encode('utf-8'))
         print(f" - {path_out}")
     
     return rows_out
 
 
-def make_chart(title, datas, series_dict, metric_key, colors):
+def lttb(pontos, limite):
+    """
+    Largest-Triangle-Three-Buckets: índices de `limite` pontos de `pontos` ((x, y), x crescente)
+    que preservam a forma da série — em cada balde fica o ponto que forma o maior triângulo
+    com o ponto escolhido antes e a média do balde seguinte.
+    """
+    n = len(pontos)
+    if limite >= n or limite < 3:
+        return list(range(n))
+    passo = (n - 2) / (limite - 2)
+    indices = [0]
+    a = 0
+    for i in range(limite - 2):
+        inicio, fim = int(i * passo) + 1, int((i + 1) * passo) + 1
+        prox = pontos[fim:min(int((i + 2) * passo) + 1, n)] or pontos[-1:]
+        mx = sum(p[0] for p in prox) / len(prox)
+        my = sum(p[1] for p in prox) / len(prox)
+        ax, ay = pontos[a]
+        a = max(range(inicio, fim),
+                key=lambda j: abs((ax - mx) * (pontos[j][1] - ay) - (ax - pontos[j][0]) * (my - ay)))
+        indices.append(a)
+    indices.append(n - 1)
+    return indices
+
+
+def minmax(pontos, baldes):
+    """Índices do menor e do maior y de cada um de `baldes` intervalos (mais as pontas), em ordem."""
+    n = len(pontos)
+    if 2 * baldes + 2 >= n:
+        return list(range(n))
+    escolhidos = {0, n - 1}
+    passo = n / baldes
+    for b in range(baldes):
+        faixa = range(int(b * passo), max(int((b + 1) * passo), int(b * passo) + 1))
+        escolhidos.add(min(faixa, key=lambda j: pontos[j][1]))
+        escolhidos.add(max(faixa, key=lambda j: pontos[j][1]))
+    return sorted(escolhidos)
+
+
+def decimar(pontos, orcamento=PIXELS_GRAFICO):
+    """Índices dos pontos a desenhar: no máximo `orcamento` (≈ 1 por pixel), via min-max e depois LTTB."""
+    if len(pontos) <= orcamento:
+        return list(range(len(pontos)))
+    indices = list(range(len(pontos)))
+    if len(pontos) > 4 * orcamento:
+        # pré-seleção barata para séries muito longas (MinMaxLTTB)
+        indices = minmax(pontos, 2 * orcamento)
+    sub = [pontos[i] for i in indices]
+    return [indices[i] for i in lttb(sub, orcamento)]
+
+
+def percentil(ordenados, q):
+    """Percentil `q` (0–100) por interpolação linear de uma lista ordenada."""
+    pos = (len(ordenados) - 1) * q / 100
+    i = int(pos)
+    if i + 1 >= len(ordenados):
+        return ordenados[-1]
+    return ordenados[i] + (ordenados[i + 1] - ordenados[i]) * (pos - i)
+
+
+def rotulos_x(datas, width):
+    """Índices das datas rotuladas no eixo X: no máximo um rótulo a cada PIXELS_ROTULO_X pixels."""
+    maximo = max(1, (width - 80) // PIXELS_ROTULO_X + 1)
+    passo = math.ceil(len(datas) / maximo) if len(datas) > maximo else 1
+    return range(0, len(datas), passo)
+
+
+def faixa_percentis(alinhadas, vazio):
+    """
+    (p10, p50, p90) por data entre as séries `alinhadas` (listas alinhadas às datas, None =
+    sem medição); datas sem nenhuma medição repetem a anterior (`vazio` na primeira).
+    """
+    p10, p50, p90 = [], [], []
+    for i in range(len(alinhadas[0]) if alinhadas else 0):
+        vals = sorted(v[i] for v in alinhadas if v[i] is not None)
+        if vals:
+            p10.append(percentil(vals, 10)); p50.append(percentil(vals, 50)); p90.append(percentil(vals, 90))
+        else:
+            for col in (p10, p50, p90):
+                col.append(col[-1] if col else vazio)
+    return p10, p50, p90
+
+
+def _pontos_svg(pts):
+    return " ".join(f"{x:.1f},{y:.1f}" for x, y in pts)
+
+
+def _series_svg(datas, series_dict, metrica, colors, vmin, escala, rotulo, max_series):
+    """
+    (elementos SVG, itens de legenda): uma polyline decimada por série ou, acima de
+    `max_series` séries, a mediana com a faixa p10–p90 entre elas.
+    """
+    lines = []
+    legend_items = []
+    if len(series_dict) > max_series:
+        p10, p50, p90 = faixa_percentis([s.alinhado(metrica, datas) for s in series_dict.values()], vmin)
+        mediana = escala(p50)
+        idx = decimar(mediana)
+        baixo, alto = escala(p10), escala(p90)
+        envelope = [alto[i] for i in idx] + [baixo[i] for i in reversed(idx)]
+        col = colors[-1] if colors else '#000000'
+        lines.append(f'<polygon fill="{col}" fill-opacity="0.25" stroke="none" points="{_pontos_svg(envelope)}" />')
+        lines.append(f'<polyline fill="none" stroke="{col}" stroke-width="2" points="{_pontos_svg(mediana[i] for i in idx)}" />')
+        legend_items.append(f'<span style="color:{col}">■ Mediana de {len(series_dict)} séries (faixa p10–p90)</span>')
+        return lines, legend_items
+
+    palette_iter = iter(colors)
+    for nome, s in sorted(series_dict.items()):
+        col = next(palette_iter, '#000000')
+        # alinhar às datas globais para manter consistência
+        vals_seq = s.alinhado(metrica, datas)
+        # filler para faltantes (usa último valor)
+        clean = []
+        last = None
+        for v in vals_seq:
+            if v is None:
+                v = last if last is not None else vmin
+            clean.append(v)
+            last = v
+        pts = escala(clean)
+        pts = [pts[i] for i in decimar(pts)]
+        lines.append(f'<polyline fill="none" stroke="{col}" stroke-width="2" points="{_pontos_svg(pts)}" />')
+        legend_items.append(f'<span style="color:{col}">■ {rotulo(nome)}</span>')
+    return lines, legend_items
+
+
+def make_chart(title, datas, series_dict, metric_key, colors, max_series=MAX_SERIES_LINHAS):
     width, height = 520, 220
     # construir valores max/min globais para normalizar
     all_vals = []
@@ -394,27 +489,7 @@ def make_chart(title, datas, series_dict, metric_key, colors):
             scaled.append((x,y))
         return scaled
 
-    lines = []
-    legend_items = []
-    palette_iter = iter(colors)
-    for parcela, s in sorted(series_dict.items()):
-        col = next(palette_iter, '#000000')
-        vals_seq = []
-        # alinhar às datas globais para manter consistência
-        data_to_val = dict(zip(s['datas'], s[metric_key]))
-        for d in datas:
-            vals_seq.append(data_to_val.get(d, None))
-        # filler para faltantes (usa último valor)
-        clean = []
-        last = None
-        for v in vals_seq:
-            if v is None:
-                v = last if last is not None else (vmin)
-            clean.append(v)
-            last = v
-        pts = scale_specific(clean)
-        lines.append(f'<polyline fill="none" stroke="{col}" stroke-width="2" points="{" ".join(f"{x:.1f},{y:.1f}" for x,y in pts)}" />')
-        legend_items.append(f'<span style="color:{col}">■ {parcela}</span>')
+    lines, legend_items = _series_svg(datas, series_dict, metric_key, colors, vmin, scale_specific, str, max_series)
 
     # Eixos simples
     svg = [f'<h3>{title}</h3>', f'<svg width="{width}" height="{height}" style="background:#fafafa;border:1px solid #e0e0e0;border-radius:8px;font-family:Arial,sans-serif;">']
@@ -422,10 +497,10 @@ def make_chart(title, datas, series_dict, metric_key, colors):
     svg.append('<line x1="40" y1="180" x2="480" y2="180" stroke="#333" stroke-width="1" />')
     # eixo Y
     svg.append('<line x1="40" y1="40" x2="40" y2="180" stroke="#333" stroke-width="1" />')
-    # labels X
-    for i,d in enumerate(datas):
+    # labels X (espaçados para não se sobreporem em séries longas)
+    for i in rotulos_x(datas, width):
         x = 40 + i*(width-80)/(len(datas)-1 if len(datas)>1 else 1)
-        svg.append(f'<text x="{x:.1f}" y="195" font-size="10" text-anchor="middle">{d}</text>')
+        svg.append(f'<text x="{x:.1f}" y="195" font-size="10" text-anchor="middle">{datas[i]}</text>')
     # labels Y (5 divisões)
     # Y labels adapt to metric scale (0-1 for Shannon)
     y_ticks = 5
@@ -446,147 +521,569 @@ def make_chart(title, datas, series_dict, metric_key, colors):
     return '\n'.join(svg)
 
 
-# Helper: baixa GeoJSONs oficiais quando ausentes (IBGE)
-def download_geojson_if_missing(url, out_path):
-    """Baixa a URL para out_path se o arquivo não existir. Retorna True em sucesso."""
-    if not url or not out_path:
+# Helper: baixa GeoJSONs oficiais do IBGE (via cache em disco, ver scripts/cache_ibge.py)
+def download_geojson_if_missing(recurso, out_path, cache=None):
+    """
+    Atualiza out_path com o recurso da API do IBGE (ex.: 'api/v3/malhas/biomas?formato=...').
+    O cache revalida por ETag/Last-Modified; sem rede, a cópia local continua valendo.
+    Retorna True em sucesso.
+    """
+    if not recurso or not out_path:
         return False
-    if os.path.exists(out_path):
-        return True
+    cache = cache or CacheIBGE()
     try:
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        print(f'Baixando {url} → {out_path}')
-        urllib.request.urlretrieve(url, out_path)
+        dados = cache.obter(recurso, referencia=out_path)
+        if json.loads(dados.decode('utf-8')).get('type') not in ('FeatureCollection', 'Feature'):
+            raise ValueError('resposta não é GeoJSON')
+        if gravar_se_mudou(out_path, dados):
+            print('Arquivo atualizado:', out_path)
         return True
     except Exception as e:
-        print('Falha ao baixar', url, '->', e)
+        print('Falha ao baixar', recurso, '->', e)
         return False
 
 
-def download_all_municipios_pe(out_path):
+def _malhas_em_ordem(cache, recursos, paralelo):
+    """(recurso, GeoJSON ou exceção) na ordem de `recursos`, com no máximo `paralelo` downloads simultâneos."""
+    with ThreadPoolExecutor(max_workers=paralelo) as pool:
+        pendentes = deque()
+        for recurso in recursos:
+            pendentes.append((recurso, pool.submit(cache.obter_json, recurso)))
+            # janela limitada: só as respostas em voo ficam em memória
+            while len(pendentes) >= 2 * paralelo:
+                yield _resultado(*pendentes.popleft())
+        while pendentes:
+            yield _resultado(*pendentes.popleft())
+
+
+def _resultado(recurso, futuro):
+    try:
+        return recurso, futuro.result()
+    except Exception as e:
+        return recurso, e
+
+
+def _compilar_malhas(cache, recurso_lista, recurso_malha, out_path, rotulo, paralelo=DOWNLOADS_SIMULTANEOS):
+    """
+    Agrega em out_path as malhas de cada item da lista; malhas já em cache não são baixadas de novo.
+    As features são gravadas no arquivo combinado à medida que cada malha chega.
+    """
+    ids = [item.get('id') for item in cache.obter_json(recurso_lista) if item.get('id')]
+    faltantes = []
+    n = 0
+    tmp = out_path + '.parcial'
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    with open(tmp, 'w', encoding='utf-8') as out:
+        # mesmo texto de json.dump({'type': 'FeatureCollection', 'features': [...]})
+        out.write('{"type": "FeatureCollection", "features": [')
+        recursos = [recurso_malha.format(id=iid) for iid in ids]
+        for iid, (_, js) in zip(ids, _malhas_em_ordem(cache, recursos, paralelo)):
+            if isinstance(js, Exception):
+                print(f'Aviso: falha ao baixar malha {rotulo}', iid, '-', js)
+                faltantes.append(iid)
+                continue
+            if isinstance(js, dict) and js.get('type') == 'FeatureCollection' and 'features' in js:
+                features = js['features']
+            elif isinstance(js, dict) and js.get('type') == 'Feature':
+                features = [js]
+            else:
+                continue
+            for feat in features:
+                out.write((', ' if n else '') + json.dumps(feat, ensure_ascii=False))
+                n += 1
+        out.write(']}')
+
+    if n or not os.path.exists(out_path):
+        if os.path.exists(out_path) and filecmp.cmp(tmp, out_path, shallow=False):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, out_path)
+            print('Arquivo atualizado:', out_path)
+    else:
+        os.remove(tmp)
+    if faltantes:
+        print(f'{len(faltantes)} malhas ({rotulo}) pendentes; a próxima execução baixa só essas.')
+    return not faltantes
+
+
+def download_all_municipios_pe(out_path, cache=None):
     """Baixa as malhas de todos os municípios de PE e agrega em um único GeoJSON."""
-    if os.path.exists(out_path):
-        return True
     try:
-        url_list = 'https://servicodados.ibge.gov.br/api/v1/localidades/estados/26/municipios'
         print('Consultando lista de municípios de PE...')
-        with urllib.request.urlopen(url_list) as resp:
-            data_bytes = resp.read()
-            try:
-                municipios = json.loads(data_bytes.decode('utf-8'))
-            except UnicodeDecodeError:
-                import gzip
-                municipios = json.loads(gzip.decompress(data_bytes).decode('utf-8'))
-
-        features = []
-        for m in municipios:
-            mid = m.get('id')
-            if not mid:
-                continue
-            try:
-                malha_url = f'https://servicodados.ibge.gov.br/api/v3/malhas/municipios/{mid}?formato=application/vnd.geo+json'
-                with urllib.request.urlopen(malha_url) as r:
-                    data_bytes = r.read()
-                    try:
-                        js = json.loads(data_bytes.decode('utf-8'))
-                    except UnicodeDecodeError:
-                        import gzip
-                        try:
-                            js = json.loads(gzip.decompress(data_bytes).decode('utf-8'))
-                        except Exception:
-                            js = None
-                    if isinstance(js, dict) and js.get('type') == 'FeatureCollection' and 'features' in js:
-                        features.extend(js['features'])
-                    elif isinstance(js, dict) and js.get('type') == 'Feature':
-                        features.append(js)
-            except Exception as e:
-                print('Aviso: falha ao baixar malha municipio', mid, '-', e)
-
-        combined = {'type': 'FeatureCollection', 'features': features}
-        with open(out_path, 'w', encoding='utf-8') as f:
-            json.dump(combined, f, ensure_ascii=False)
-        print('Arquivo combinado de municípios salvo em', out_path)
-        return True
+        return _compilar_malhas(cache or CacheIBGE(), 'api/v1/localidades/estados/26/municipios',
+                                'api/v3/malhas/municipios/{id}?formato=application/vnd.geo+json', out_path, 'municipio')
     except Exception as e:
         print('Falha ao compilar municipios PE:', e)
         return False
 
 
-def download_all_biomas(out_path):
+def download_all_biomas(out_path, cache=None):
     """Baixa malhas de biomas (tenta baixar por lista /api/v1/localidades/biomas e agrega)."""
-    if os.path.exists(out_path):
-        return True
     try:
-        url_list = 'https://servicodados.ibge.gov.br/api/v1/localidades/biomas'
         print('Consultando lista de biomas (IBGE)...')
-        with urllib.request.urlopen(url_list) as resp:
-            data_bytes = resp.read()
-            try:
-                biomas = json.loads(data_bytes.decode('utf-8'))
-            except UnicodeDecodeError:
-                import gzip
-                biomas = json.loads(gzip.decompress(data_bytes).decode('utf-8'))
-
-        features = []
-        for b in biomas:
-            bid = b.get('id')
-            if not bid:
-                continue
-            try:
-                malha_url = f'https://servicodados.ibge.gov.br/api/v3/malhas/biomas/{bid}?formato=application/vnd.geo+json'
-                with urllib.request.urlopen(malha_url) as r:
-                    data_bytes = r.read()
-                    try:
-                        js = json.loads(data_bytes.decode('utf-8'))
-                    except UnicodeDecodeError:
-                        import gzip
-                        try:
-                            js = json.loads(gzip.decompress(data_bytes).decode('utf-8'))
-                        except Exception:
-                            js = None
-                    if isinstance(js, dict) and js.get('type') == 'FeatureCollection' and 'features' in js:
-                        features.extend(js['features'])
-                    elif isinstance(js, dict) and js.get('type') == 'Feature':
-                        features.append(js)
-            except Exception as e:
-                print('Aviso: falha ao baixar malha bioma', bid, '-', e)
-
-        combined = {'type': 'FeatureCollection', 'features': features}
-        with open(out_path, 'w', encoding='utf-8') as f:
-            json.dump(combined, f, ensure_ascii=False)
-        print('Arquivo combinado de biomas salvo em', out_path)
-        return True
+        return _compilar_malhas(cache or CacheIBGE(), 'api/v1/localidades/biomas',
+                                'api/v3/malhas/biomas/{id}?formato=application/vnd.geo+json', out_path, 'bioma')
     except Exception as e:
         print('Falha ao compilar biomas:', e)
         return False
 
 
-def write_relatorio(path_out, series, datas, series_sp, rows):
+def carregar_catalogo_especies(path=DEFAULT_ESPECIES):
+    """(nome científico → grupo funcional, nome científico → nome popular) do catálogo regional."""
+    sp_to_group = {}
+    sp_to_pop = {}
+    if os.path.exists(path):
+        with open(path, newline='', encoding='utf-8') as f:
+            r = csv.DictReader(f)
+            for row in r:
+                sp_to_group[row['nome_cientifico']] = row['grupo_funcional']
+                sp_to_pop[row['nome_cientifico']] = row.get('nome_popular','')
+    return sp_to_group, sp_to_pop
+
+
+# Modelos do relatório (compilados uma vez; ver scripts/modelos.py)
+MODELO_RELATORIO = Modelo('''<!DOCTYPE html><html lang="pt-br"><head><meta charset="utf-8" />
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Dashboard PRAD – Monitoramento e Indicadores</title>
+<style>
+:root {
+  --bg: #f7fcfb;
+  --card: #ffffff;
+  --muted: #61707a;
+  --accent: #2ca25f;
+  --bugn-1: #e5f5f9;
+  --bugn-2: #99d8c9;
+  --bugn-3: #2ca25f;
+}
+* { margin: 0; padding: 0; box-sizing: border-box; }
+body { font-family: "Inter", "Segoe UI", Tahoma, Geneva, Verdana, sans-serif; background: var(--bg); color: #17323b; padding: 18px; -webkit-font-smoothing:antialiased; }
+.dashboard { max-width: 1200px; margin: 0 auto; }
+.skip-link { position: absolute; left: -999px; top: auto; width:1px; height:1px; overflow:hidden; }
+.skip-link:focus { left: 18px; top: 18px; width:auto; height:auto; padding:8px 12px; background:var(--card); border-radius:6px; box-shadow:0 6px 18px rgba(0,0,0,0.12); z-index:2000; }
+.header { background: var(--card); padding: 20px; border-radius: 10px; margin-bottom: 16px; box-shadow: 0 6px 18px rgba(0,0,0,0.06); }
+.header h1 { color: #0f3b2d; font-size: 26px; margin-bottom: 6px; }
+.header p { color: var(--muted); font-size: 14px; }
+.metrics { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 14px; margin-bottom: 18px; }
+.metric-card { background: var(--card); padding: 18px; border-radius: 10px; box-shadow: 0 6px 18px rgba(3,19,16,0.04); transition: transform 0.18s ease-in-out; }
+.metric-card:hover { transform: translateY(-6px); }
+.metric-label { font-size: 12px; color: var(--muted); text-transform: uppercase; letter-spacing: 0.6px; margin-bottom: 6px; }
+.metric-value { font-size: 30px; font-weight: 700; color: #082a20; margin-bottom: 4px; }
+.metric-unit { font-size: 14px; color: var(--muted); margin-left: 6px; }
+.metric-trend { font-size: 12px; color: var(--accent); margin-top: 6px; }
+.metric-trend.negative { color: #bf2b2b; }
+.metric-icon { float: right; font-size: 28px; opacity: 0.25; }
+.section-title { background: transparent; padding: 8px 0; margin: 18px 0 8px 0; }
+.section-title h2 { color: #0f3b2d; font-size: 20px; margin: 0; border-left: 4px solid var(--bugn-3); padding-left: 12px; }
+.charts-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(360px, 1fr)); gap: 16px; margin-bottom: 18px; }
+.charts-grid-single { display: grid; grid-template-columns: 1fr; gap: 16px; margin-bottom: 18px; }
+.chart-card { background: var(--card); padding: 18px; border-radius: 10px; box-shadow: 0 6px 18px rgba(3,19,16,0.04); }
+.chart-card h3 { color: #082a20; font-size: 16px; margin-bottom: 12px; }
+.footer { background: transparent; padding: 12px 0; text-align: center; color: var(--muted); font-size: 13px; }
+.legend { margin-top: 12px; font-size: 13px; color: var(--muted); }
+.legend span { margin-right: 12px; display:inline-block; }
+@media (max-width: 900px) { .charts-grid, .charts-grid-single { grid-template-columns: 1fr; } .metrics { grid-template-columns: repeat(auto-fit,minmax(180px,1fr)); } }
+@media print { body { background: white; } .header, .metric-card, .chart-card { box-shadow: none !important; } }
+@media (prefers-reduced-motion: reduce) { * { transition: none !important; animation: none !important; } }
+</style>
+</head><body>
+<a class="skip-link" href="#main">Pular para o conteúdo</a>
+<div class="dashboard" id="main" role="main">
+<div class="header">
+<h1>📊 Dashboard PRAD – Monitoramento e Indicadores</h1>
+<p>Programa de Recuperação de Áreas Degradadas | {{ projeto }} | Última atualização: {{ atualizacao }}</p>
+</div>
+<div style="text-align:right;margin-bottom:12px;">
+<button onclick="window.print()" style="background:#2c3e50;color:#fff;border:none;padding:10px 14px;border-radius:8px;cursor:pointer;">Salvar PDF</button>
+</div>
+{{ secoes }}
+<div class="footer">Dashboard gerado automaticamente por gerar_visuais.py | Autor: Ronan Armando Caetano — Graduando em Ciências Biológicas (UFSC) • Técnico em Geoprocessamento (IFSC) • Técnico em Saneamento (IFSC) | PRAD {{ projeto }}</div>
+</div></body></html>''')
+
+MODELO_KPIS = Modelo('''<div class="metrics">
+<div class="metric-card">
+<div class="metric-icon">🌱</div>
+<div class="metric-label">Sobrevivência Média</div>
+<div class="metric-value">{{ sobrevivencia }}<span class="metric-unit">%</span></div>
+<div class="metric-trend">↗ Tendência positiva</div>
+</div>
+<div class="metric-card">
+<div class="metric-icon">🌳</div>
+<div class="metric-label">Cobertura de Copa</div>
+<div class="metric-value">{{ copa }}<span class="metric-unit">%</span></div>
+<div class="metric-trend">↗ Em expansão</div>
+</div>
+<div class="metric-card">
+<div class="metric-icon">⚠️</div>
+<div class="metric-label">Invasoras</div>
+<div class="metric-value">{{ invasoras }}<span class="metric-unit">%</span></div>
+<div class="metric-trend negative">↘ Em declínio</div>
+</div>
+<div class="metric-card">
+<div class="metric-icon">🔬</div>
+<div class="metric-label">Riqueza de Espécies</div>
+<div class="metric-value">{{ riqueza }}<span class="metric-unit"> spp</span></div>
+<div class="metric-trend">Última campanha</div>
+</div>
+<div class="metric-card">
+<div class="metric-icon">📈</div>
+<div class="metric-label">Diversidade (Shannon)</div>
+<div class="metric-value">{{ shannon }}</div>
+<div class="metric-trend">Última campanha</div>
+</div>
+</div>''')
+
+# seção com título e grade de cartões; `cartoes` já vem com uma quebra de linha antes de cada cartão
+MODELO_SECAO = Modelo('''<div class="section-title"><h2>{{ titulo }}</h2></div>
+<div class="{{ grade }}">{{ cartoes }}
+</div>''')
+MODELO_CARTAO = Modelo('''<div class="chart-card">
+{{ conteudo }}
+</div>''')
+
+MODELO_ESPECIES_PRESENTES = Modelo('''<h3>Espécies presentes na última campanha ({{ data }})</h3>
+<div style="display:grid;grid-template-columns:repeat(auto-fit,minmax(220px,1fr));gap:12px;">{{ grupos }}
+</div>''')
+MODELO_GRUPO_FUNCIONAL = Modelo('<div><strong>{{ grupo }}</strong><ul style="margin-top:6px;line-height:1.5">{{ itens }}</ul></div>')
+
+MODELO_COMPARATIVO = Modelo('''<h3>Comparativo por parcela – Última campanha ({{ data }})</h3>
+<table style="width:100%;border-collapse:collapse;margin-top:8px;">
+<thead><tr><th style="text-align:left;border-bottom:2px solid #ecf0f1;">Parcela</th><th style="text-align:right;border-bottom:2px solid #ecf0f1;">Sobrevivência</th><th style="text-align:right;border-bottom:2px solid #ecf0f1;">Copa</th><th style="text-align:right;border-bottom:2px solid #ecf0f1;">Invasoras</th></tr></thead>
+<tbody>
+{{ linhas }}
+</tbody></table>''')
+
+MODELO_ALERTAS_PARCELA = Modelo('''<div style="border-left:4px solid #e74c3c;padding-left:12px;margin-bottom:12px;">
+<strong style="color:#2c3e50;">Parcela {{ parcela }}</strong>
+<ul style="margin-top:8px;line-height:1.8;">{{ itens }}
+</ul>
+</div>''')
+MODELO_ALERTA = Modelo('<li style="color:#555;"><strong style="color:{{ cor }}">{{ icone }} [{{ categoria }}]</strong> {{ mensagem }}{{ desde }}</li>')
+MODELO_ALERTA_DESDE = Modelo(' <span style="color:#999;font-size:12px;">(desde {{ data }})</span>')
+
+MODELO_ESTAGIO = Modelo('''<h3>Parcela {{ parcela }}</h3>
+<div style="text-align:center;margin:20px 0;">
+<div style="display:inline-block;background:{{ cor }};color:#fff;padding:12px 24px;border-radius:8px;font-size:18px;font-weight:bold;margin-bottom:12px;">
+{{ estagio }}</div>
+<div style="color:#7f8c8d;font-size:14px;">Score: {{ score }}/100</div>
+</div>
+<table style="width:100%;margin-top:16px;border-collapse:collapse;">
+<tr style="border-bottom:1px solid #ecf0f1;"><td style="padding:8px;color:#7f8c8d;">Sobrevivência</td><td style="text-align:right;padding:8px;font-weight:bold;">{{ sobrevivencia }}%</td></tr>
+<tr style="border-bottom:1px solid #ecf0f1;"><td style="padding:8px;color:#7f8c8d;">Diversidade (Shannon)</td><td style="text-align:right;padding:8px;font-weight:bold;">{{ shannon }}</td></tr>
+<tr style="border-bottom:1px solid #ecf0f1;"><td style="padding:8px;color:#7f8c8d;">Riqueza</td><td style="text-align:right;padding:8px;font-weight:bold;">{{ riqueza }} spp</td></tr>
+<tr style="border-bottom:1px solid #ecf0f1;"><td style="padding:8px;color:#7f8c8d;">Cobertura Copa</td><td style="text-align:right;padding:8px;font-weight:bold;">{{ copa }}%</td></tr>
+<tr style="border-bottom:1px solid #ecf0f1;"><td style="padding:8px;color:#7f8c8d;">Invasoras</td><td style="text-align:right;padding:8px;font-weight:bold;">{{ invasoras }}%</td></tr>
+<tr><td style="padding:8px;color:#7f8c8d;">Razão Copa/Invasoras</td><td style="text-align:right;padding:8px;font-weight:bold;">{{ razao }}</td></tr>
+</table>''')
+
+MODELO_INCREMENTOS = Modelo('''<h3>Parcela {{ parcela }} - Incrementos por Período</h3>
+<table style="width:100%;border-collapse:collapse;margin-top:8px;font-size:13px;">
+<thead><tr>
+<th style="text-align:left;border-bottom:2px solid #ecf0f1;padding:8px;">Período</th>
+<th style="text-align:right;border-bottom:2px solid #ecf0f1;padding:8px;">Δ Altura (m)</th>
+<th style="text-align:right;border-bottom:2px solid #ecf0f1;padding:8px;">Taxa/mês (m)</th>
+<th style="text-align:right;border-bottom:2px solid #ecf0f1;padding:8px;">Δ Diâmetro (cm)</th>
+<th style="text-align:right;border-bottom:2px solid #ecf0f1;padding:8px;">Taxa/mês (cm)</th>
+</tr></thead>
+<tbody>{{ linhas }}
+</tbody></table>{{ tendencia }}''')
+MODELO_TENDENCIA = Modelo('<p style="margin-top:8px;font-size:12px;color:#7f8c8d;">Tendência (regressão linear): {{ texto }}</p>')
+MODELO_CRESCIMENTO_ESPECIES = Modelo('''<h3>Crescimento por Espécie (regressão linear)</h3>
+<table style="width:100%;border-collapse:collapse;margin-top:8px;font-size:13px;">
+<thead><tr>
+<th style="text-align:left;border-bottom:2px solid #ecf0f1;padding:8px;">Espécie</th>
+<th style="text-align:right;border-bottom:2px solid #ecf0f1;padding:8px;">Altura (m/mês)</th>
+<th style="text-align:right;border-bottom:2px solid #ecf0f1;padding:8px;">R²</th>
+<th style="text-align:right;border-bottom:2px solid #ecf0f1;padding:8px;">Diâmetro (cm/mês)</th>
+<th style="text-align:right;border-bottom:2px solid #ecf0f1;padding:8px;">R²</th>
+</tr></thead>
+<tbody>{{ linhas }}
+</tbody></table>''')
+MODELO_CRESCIMENTO_ESPECIE = Modelo('''<tr style="border-bottom:1px solid #ecf0f1;">
+<td style="padding:8px;color:#7f8c8d;">{{ especie }}</td>
+<td style="text-align:right;padding:8px;font-weight:bold;">{{ th }}</td>
+<td style="text-align:right;padding:8px;color:#95a5a6;">{{ r2h }}</td>
+<td style="text-align:right;padding:8px;font-weight:bold;">{{ td }}</td>
+<td style="text-align:right;padding:8px;color:#95a5a6;">{{ r2d }}</td>
+</tr>''')
+MODELO_INCREMENTO = Modelo('''<tr style="border-bottom:1px solid #ecf0f1;">
+<td style="padding:8px;color:#7f8c8d;">{{ periodo }}</td>
+<td style="text-align:right;padding:8px;color:{{ cor_h }};font-weight:bold;">{{ dh }}</td>
+<td style="text-align:right;padding:8px;color:#95a5a6;">{{ th }}</td>
+<td style="text-align:right;padding:8px;color:{{ cor_d }};font-weight:bold;">{{ dd }}</td>
+<td style="text-align:right;padding:8px;color:#95a5a6;">{{ td }}</td>
+</tr>''')
+
+# seções de gráficos: (nome no cache, título, [(título do gráfico, métrica)])
+GRAFICOS_RELATORIO = (
+    ('estruturais', '📊 Indicadores Estruturais da Vegetação', [
+        ('Taxa de Sobrevivência (%)', 'sobrevivencia'), ('Altura Média (m)', 'altura_media'),
+        ('Diâmetro Médio (cm)', 'diametro_medio'), ('Cobertura de Copa (%)', 'cobertura_copa')]),
+    ('invasoras', '⚠️ Controle de Espécies Invasoras', [
+        ('Cobertura de Invasoras (%)', 'cobertura_invasoras'), ('Razão Copa/Invasoras', 'razao_copa_invasoras')]),
+    ('diversidade', '🌿 Diversidade Biológica', [
+        ('Riqueza de Espécies (spp)', 'riqueza'), ("Índice de Shannon (H')", 'shannon')]),
+)
+
+# Modo canvas (--graficos-canvas): as séries alinhadas vão uma única vez em JSON e um
+# renderizador mínimo desenha cada gráfico em <canvas> com o mesmo layout do SVG
+MODELO_GRAFICO_CANVAS = Modelo('''<h3>{{ titulo }}</h3>
+<canvas class="grafico" width="520" height="220" data-fonte="{{ fonte }}" data-metrica="{{ metrica }}" data-casas="{{ casas }}" style="background:#fafafa;border:1px solid #e0e0e0;border-radius:8px;"></canvas>
+<div class="legend"></div>''')
+
+MODELO_DADOS_GRAFICOS = Modelo('''<script type="application/json" id="dados-graficos">{{ dados }}</script>
+<script>
+(function(){
+var D = JSON.parse(document.getElementById('dados-graficos').textContent);
+var CORES = {{ cores }}, N = D.datas.length;
+document.querySelectorAll('canvas.grafico').forEach(function(c){
+  var f = D.fontes[c.dataset.fonte], m = c.dataset.metrica, casas = +c.dataset.casas;
+  var faixa = f.faixa ? f.faixa[m] : null;
+  // null -> NaN em vetores tipados; com faixa: [p10, mediana, p90]
+  var series = (faixa ? faixa.valores : f.metricas[m]).map(function(v){ return Float64Array.from(v, function(a){ return a === null ? NaN : a; }); });
+  var vmin = Infinity, vmax = -Infinity;
+  if (faixa) { if (faixa.min !== null) { vmin = faixa.min; vmax = faixa.max; } }
+  else series.forEach(function(s){ s.forEach(function(v){ if (v === v) { vmin = Math.min(vmin, v); vmax = Math.max(vmax, v); } }); });
+  if (vmin === Infinity) { c.nextElementSibling.remove(); c.outerHTML = '<p>Sem dados.</p>'; return; }
+  if (Math.abs(vmax - vmin) < 1e-9) vmax = vmin + 1;
+  var ctx = c.getContext('2d'), W = c.width, H = c.height;
+  function x(i){ return 40 + i * (W - 80) / (N > 1 ? N - 1 : 1); }
+  function y(v){ return H - 40 - (v - vmin) / (vmax - vmin) * (H - 80); }
+  function reta(x1, y1, x2, y2, cor){ ctx.strokeStyle = cor; ctx.lineWidth = 1; ctx.beginPath(); ctx.moveTo(x1, y1); ctx.lineTo(x2, y2); ctx.stroke(); }
+  function tracar(v, cor){ ctx.strokeStyle = cor; ctx.lineWidth = 2; ctx.beginPath(); for (var i = 0; i < N; i++) ctx.lineTo(x(i), y(v[i])); ctx.stroke(); }
+  ctx.font = '10px Arial, sans-serif'; ctx.fillStyle = '#000';
+  var lo = m === 'shannon' ? 0 : vmin, hi = m === 'shannon' ? Math.max(vmax, 2) : vmax;
+  ctx.textAlign = 'end';
+  for (var j = 0; j <= 5; j++) {
+    var yy = 180 - j * 140 / 5;
+    reta(40, yy, 480, yy, '#f0f0f0');
+    ctx.fillText((lo + j * (hi - lo) / 5).toFixed(casas), 35, yy + 3);
+  }
+  reta(40, 180, 480, 180, '#333'); reta(40, 40, 40, 180, '#333');
+  // rótulos de data espaçados
+  ctx.textAlign = 'center';
+  var maxRot = Math.max(1, Math.floor((W - 80) / {{ pixels_rotulo }}) + 1), passo = N > maxRot ? Math.ceil(N / maxRot) : 1;
+  for (var i = 0; i < N; i += passo) ctx.fillText(D.datas[i], x(i), 195);
+  var legenda = [];
+  if (faixa) {
+    var cor = CORES[CORES.length - 1];
+    ctx.fillStyle = cor; ctx.globalAlpha = 0.25; ctx.beginPath();
+    for (i = 0; i < N; i++) ctx.lineTo(x(i), y(series[2][i]));
+    for (i = N - 1; i >= 0; i--) ctx.lineTo(x(i), y(series[0][i]));
+    ctx.fill(); ctx.globalAlpha = 1;
+    tracar(series[1], cor);
+    legenda.push([cor, 'Mediana de ' + f.n + ' séries (faixa p10–p90)']);
+  } else {
+    series.forEach(function(s, k){
+      // faltantes repetem o último valor
+      var ult = vmin, cor = CORES[k] || '#000000';
+      tracar(s.map(function(a){ return a === a ? (ult = a) : ult; }), cor);
+      legenda.push([cor, f.rotulos[k]]);
+    });
+  }
+  c.nextElementSibling.innerHTML = legenda.map(function(l){ return '<span style="color:' + l[0] + '">■ ' + l[1] + '</span>'; }).join(' ');
+});
+})();
+</script>''')
+
+
+def rotulo_especie(sp):
+    return sp.split()[-1] if len(sp.split())>1 else sp  # nome popular
+
+
+def make_chart_canvas(title, metric_key, fonte='parcelas', casas=1):
+    """Marcador de um gráfico do modo canvas; os valores vêm do bloco de dados_graficos()."""
+    return MODELO_GRAFICO_CANVAS.renderizar(titulo=title, fonte=fonte, metrica=metric_key, casas=casas)
+
+
+def _compacto(v):
+    """Valor para o JSON do modo canvas: 2 casas, inteiros sem '.0', None -> null."""
+    if v is None:
+        return None
+    v = round(v, 2)
+    return int(v) if v == int(v) else v
+
+
+def dados_graficos(datas, fontes, colors, max_series=MAX_SERIES_LINHAS):
+    """
+    Bloco <script> com as séries do modo canvas e o renderizador. `fontes`:
+    {nome: (series_dict, métricas, rótulo)}; cada métrica vira uma lista de valores
+    alinhados a `datas` por série (null = sem medição), gravada uma única vez. Fontes
+    com mais de `max_series` séries levam só a faixa já calculada (p10, mediana, p90).
+    """
+    dados = {'datas': list(datas), 'fontes': {}}
+    for fonte, (series_dict, metricas, rotulo) in fontes.items():
+        nomes = sorted(series_dict)
+        alinhadas = {m: [series_dict[n].alinhado(m, datas) for n in nomes] for m in metricas}
+        if len(nomes) > max_series:
+            faixas = {}
+            for m, vals in alinhadas.items():
+                medidos = [v for serie in vals for v in serie if v is not None]
+                # min/max reais: a faixa p10–p90 não cobre a escala do eixo
+                faixas[m] = {'min': _compacto(min(medidos, default=None)), 'max': _compacto(max(medidos, default=None)),
+                             'valores': [[_compacto(v) for v in col]
+                                         for col in faixa_percentis(vals, min(medidos, default=0))]}
+            dados['fontes'][fonte] = {'n': len(nomes), 'faixa': faixas}
+            continue
+        dados['fontes'][fonte] = {'rotulos': [rotulo(n) for n in nomes], 'metricas': {
+            m: [[_compacto(v) for v in serie] for serie in vals] for m, vals in alinhadas.items()}}
+    texto = json.dumps(dados, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    return MODELO_DADOS_GRAFICOS.renderizar(dados=texto, cores=json.dumps(colors), pixels_rotulo=PIXELS_ROTULO_X)
+
+
+_CACHES_SECOES = {}
+
+
+def cache_secoes(projeto=''):
+    """
+    Cache de seções do processo para `projeto`, em uma subpasta própria de `saidas/cache_secoes/`
+    (a poda por seção não descarta as entradas dos outros projetos do lote). A versão é o hash
+    dos scripts que geram as seções.
+    """
+    cache = _CACHES_SECOES.get(projeto)
+    if cache is None:
+        pasta = os.path.join(DEFAULT_CACHE_SECOES, re.sub(r'[^\w.-]+', '_', projeto)) if projeto else DEFAULT_CACHE_SECOES
+        cache = _CACHES_SECOES[projeto] = CacheSecoes(pasta=pasta, versao=versao_scripts())
+    return cache
+
+
+def _secao(titulo, grade, conteudos):
+    return MODELO_SECAO.renderizar(titulo=titulo, grade=grade, cartoes=''.join(
+        '\n' + MODELO_CARTAO.renderizar(conteudo=c) for c in conteudos))
+
+
+def _secao_graficos(titulo, graficos, datas, series, colors, extra=(), max_series=MAX_SERIES_LINHAS, canvas=False):
+    if canvas:
+        return _secao(titulo, 'charts-grid', [make_chart_canvas(t, metrica) for t, metrica in graficos] + list(extra))
+    return _secao(titulo, 'charts-grid',
+                  [make_chart(t, datas, series, metrica, colors, max_series) for t, metrica in graficos] + list(extra))
+
+
+def _secao_sucessao(latest, grupos_presentes, agg):
+    itens = ''.join('\n' + MODELO_GRUPO_FUNCIONAL.renderizar(
+        grupo=grupo, itens=''.join(f'<li>{x}</li>' for x in grupos_presentes[grupo]))
+        for grupo in sorted(grupos_presentes.keys()))
+    table_rows = []
+    for sa in sorted(agg):
+        a = agg[sa]
+        if a['linhas']:
+            surv = (a['vivas']/a['totais']*100) if a['totais']>0 else 0
+            copa_sa = a['copa']/a['linhas'] if a['linhas'] else 0
+            invas_sa = a['invas']/a['linhas'] if a['linhas'] else 0
+            table_rows.append(f'<tr><td>{sa}</td><td>{surv:.1f}%</td><td>{copa_sa:.1f}%</td><td>{invas_sa:.1f}%</td></tr>')
+    return _secao('🌳 Sucessão Ecológica e Composição Florística', 'charts-grid-single', [
+        MODELO_ESPECIES_PRESENTES.renderizar(data=latest, grupos=itens),
+        MODELO_COMPARATIVO.renderizar(data=latest, linhas=''.join(table_rows) if table_rows else '<tr><td colspan="4">Sem dados.</td></tr>'),
+    ])
+
+
+def _secao_alertas(alertas, ultima_data):
+    # Agrupar por parcela (na ordem das regras)
+    alertas_por_parcela = defaultdict(list)
+    for a in alertas:
+        alertas_por_parcela[a['parcela']].append(a)
+    blocos = ''.join('\n' + MODELO_ALERTAS_PARCELA.renderizar(parcela=parcela, itens=''.join(
+        '\n' + MODELO_ALERTA.renderizar(cor=a['cor'], icone='🔴' if a['tipo'] == 'CRÍTICO' else '⚠️',
+                                        categoria=a['categoria'], mensagem=a['mensagem'],
+                                        desde=MODELO_ALERTA_DESDE.renderizar(data=a['desde'])
+                                        if a.get('desde') and a['desde'] != ultima_data else '')
+        for a in alertas_por_parcela[parcela]))
+        for parcela in sorted(alertas_por_parcela.keys()))
+    return _secao('🚨 Alertas e Recomendações Técnicas', 'charts-grid-single',
+                  ['<div style="display:grid;gap:12px;">' + blocos + '\n</div>'])
+
+
+def _secao_classificacao(classificacao):
+    return _secao('🌲 Classificação de Estágio Sucessional', 'charts-grid', [
+        MODELO_ESTAGIO.renderizar(parcela=parcela, cor=c['cor'], estagio=c['estagio'], score=f"{c['score']:.1f}",
+                                  sobrevivencia=f"{c['sobrevivencia']:.1f}", shannon=f"{c['shannon']:.2f}",
+                                  riqueza=f"{c['riqueza']:.0f}", copa=f"{c['copa']:.1f}",
+                                  invasoras=f"{c['invasoras']:.1f}", razao=f"{c['razao']:.2f}")
+        for parcela, c in sorted(classificacao.items())])
+
+
+def _taxa_regressao(tendencia, r2, unidade):
+    return f'{tendencia:+.3f} {unidade}/mês (R² {r2:.2f})' if tendencia is not None else '–'
+
+
+def _cor_incremento(delta):
+    if math.isnan(delta):
+        return '#95a5a6'
+    return '#27ae60' if delta > 0 else '#e74c3c'
+
+
+def _secao_incrementos(incrementos, crescimento_especies, nomes_populares):
+    cartoes = []
+    for parcela in sorted(incrementos.keys()):
+        inc = incrementos[parcela]
+        if not inc['datas_intervalo']:
+            continue
+        linhas = []
+        for i, periodo in enumerate(inc['datas_intervalo']):
+            dh = inc['delta_altura'][i]
+            dd = inc['delta_diametro'][i]
+            # Cor baseada em taxa positiva/negativa (cinza se a medida falta)
+            linhas.append('\n' + MODELO_INCREMENTO.renderizar(
+                periodo=f"{periodo} ({formatar(inc['meses'][i], '.1f')} meses)",
+                dh=formatar(dh, '+.2f'), dd=formatar(dd, '+.2f'),
+                th=formatar(inc['taxa_altura_mes'][i], '.3f'), td=formatar(inc['taxa_diametro_mes'][i], '.3f'),
+                cor_h=_cor_incremento(dh), cor_d=_cor_incremento(dd)))
+        tendencia = ''
+        if inc['tendencia_altura_mes'] is not None:
+            tendencia = MODELO_TENDENCIA.renderizar(texto='altura ' + _taxa_regressao(
+                inc['tendencia_altura_mes'], inc['r2_altura'], 'm') + ' · diâmetro ' + _taxa_regressao(
+                inc['tendencia_diametro_mes'], inc['r2_diametro'], 'cm'))
+        cartoes.append(MODELO_INCREMENTOS.renderizar(parcela=parcela, linhas=''.join(linhas), tendencia=tendencia))
+    # espécies com pelo menos duas campanhas com altura ou diâmetro
+    linhas = []
+    for sp in sorted(crescimento_especies):
+        h, d = crescimento_especies[sp]['altura_media'], crescimento_especies[sp]['diametro_medio']
+        if h['tendencia'] is None and d['tendencia'] is None:
+            continue
+        nome_pop = nomes_populares.get(sp, '')
+        linhas.append('\n' + MODELO_CRESCIMENTO_ESPECIE.renderizar(
+            especie=f'{nome_pop} ({sp})' if nome_pop else sp,
+            th=f"{h['tendencia']:+.3f}" if h['tendencia'] is not None else '–',
+            r2h=f"{h['r2']:.2f}" if h['r2'] is not None else '–',
+            td=f"{d['tendencia']:+.3f}" if d['tendencia'] is not None else '–',
+            r2d=f"{d['r2']:.2f}" if d['r2'] is not None else '–'))
+    if linhas:
+        cartoes.append(MODELO_CRESCIMENTO_ESPECIES.renderizar(linhas=''.join(linhas)))
+    return _secao('📈 Taxa de Incremento (Δ Altura e Δ Diâmetro)', 'charts-grid', cartoes)
+
+
+def write_relatorio(path_out, series, datas, series_sp, grupos, catalogo=None, cache=None,
+                    max_series=MAX_SERIES_LINHAS, canvas=False, avaliacao=None, projeto=''):
+    """
+    Dashboard do projeto. Cada seção (KPIs, gráficos, sucessão, alertas, classificação,
+    incrementos) é renderizada à parte pelos modelos acima e guardada em `cache`
+    (padrão: cache_secoes(projeto)) pela assinatura das suas entradas. Gráficos com mais de
+    `max_series` parcelas mostram a mediana e a faixa p10–p90 em vez de uma linha por parcela.
+    `avaliacao` (regras.avaliar) evita reavaliar as regras. Com `canvas`, os gráficos são só
+    marcadores: as séries vão uma vez em JSON no fim da página e são desenhadas no navegador
+    (dados_graficos()). `projeto` é o nome exibido no cabeçalho e no rodapé.
+    """
+    cache = cache or cache_secoes(projeto)
     # Paleta principal para gráficos (BuGn 3 - sequencial acessível)
     colors = CB_BUGN
     
     # Calcular última data
     ultima_data = max(datas) if datas else ''
     
-    # Calcular incrementos, classificação e alertas
+    # Calcular incrementos, classificação e alertas (uma avaliação para todas as campanhas)
     incrementos = calcular_incrementos(series)
-    classificacao = classificar_estagio_sucessional(series, ultima_data)
-    alertas = gerar_alertas(series, ultima_data)
-    
-    # Calcular métricas-chave (última campanha)
-    sobrev_p01 = series.get('P01', {}).get('sobrevivencia', [0])[-1] if 'P01' in series else 0
-    sobrev_p02 = series.get('P02', {}).get('sobrevivencia', [0])[-1] if 'P02' in series else 0
-    sobrev_media = (sobrev_p01 + sobrev_p02) / 2
-    
-    copa_p01 = series.get('P01', {}).get('cobertura_copa', [0])[-1] if 'P01' in series else 0
-    copa_p02 = series.get('P02', {}).get('cobertura_copa', [0])[-1] if 'P02' in series else 0
-    copa_media = (copa_p01 + copa_p02) / 2
+    avaliacao = avaliacao or avaliar(series)
+    classificacao = classificar_estagio_sucessional(series, ultima_data, avaliacao)
+    alertas = gerar_alertas(series, ultima_data, avaliacao)
     
-    invas_p01 = series.get('P01', {}).get('cobertura_invasoras', [0])[-1] if 'P01' in series else 0
-    invas_p02 = series.get('P02', {}).get('cobertura_invasoras', [0])[-1] if 'P02' in series else 0
-    invas_media = (invas_p01 + invas_p02) / 2
+    # Calcular métricas-chave: média, entre as parcelas do projeto, do valor da última campanha de cada uma
+    def media_ultimas(metrica):
+        ultimos = [s[metrica][-1] for s in series.values() if s.get(metrica)]
+        return mean(ultimos) if ultimos else 0
+
+    sobrev_media = media_ultimas('sobrevivencia')
+    copa_media = media_ultimas('cobertura_copa')
+    invas_media = media_ultimas('cobertura_invasoras')
     
-    num_especies = len(series_sp)
     # Riqueza e Shannon (média últimas por parcela)
     riqueza_vals = []
     shannon_vals = []
@@ -599,327 +1096,76 @@ def write_relatorio(path_out, series, datas, series_sp, rows):
     shannon_medio = mean(shannon_vals) if shannon_vals else 0
 
     # Painel de sucessão: espécies presentes na última campanha e seus grupos funcionais
-    especies_csv = os.path.join('dados','especies_PE_mata_atlantica.csv')
-    sp_to_group = {}
-    sp_to_pop = {}
-    if os.path.exists(especies_csv):
-        with open(especies_csv, newline='', encoding='utf-8') as f:
-            r = csv.DictReader(f)
-            for row in r:
-                sp_to_group[row['nome_cientifico']] = row['grupo_funcional']
-                sp_to_pop[row['nome_cientifico']] = row.get('nome_popular','')
+    sp_to_group, sp_to_pop = catalogo if catalogo is not None else carregar_catalogo_especies()
     latest = max(datas) if datas else ''
     presentes = defaultdict(int)
-    for r in rows:
-        if r['data'] == latest:
-            try:
-                vivos = int(r['plantadas_vivas']) if r['plantadas_vivas'] else 0
-            except ValueError:
-                vivos = 0
-            if vivos > 0:
-                presentes[r['especie']] += vivos
+    for (especie, data), g in grupos[CHAVE_ESPECIE_DATA].items():
+        if data == latest and g.vivas > 0:
+            presentes[especie] += g.vivas
     grupos_presentes = defaultdict(list)
     for sp in sorted(presentes.keys()):
         grupo = sp_to_group.get(sp, 'Outros')
         nome_pop = sp_to_pop.get(sp, '')
         label = f"{nome_pop} ({sp})" if nome_pop else sp
         grupos_presentes[grupo].append(label)
-    
-    parts = [
-        '<!DOCTYPE html><html lang="pt-br"><head><meta charset="utf-8" />',
-        '<meta name="viewport" content="width=device-width, initial-scale=1">',
-        '<title>Dashboard PRAD – Monitoramento e Indicadores</title>',
-        '<style>',
-        ':root {',
-        "  --bg: #f7fcfb;",
-        "  --card: #ffffff;",
-        "  --muted: #61707a;",
-        "  --accent: #2ca25f;",
-        "  --bugn-1: #e5f5f9;",
-        "  --bugn-2: #99d8c9;",
-        "  --bugn-3: #2ca25f;",
-        '}',
-        '* { margin: 0; padding: 0; box-sizing: border-box; }',
-        'body { font-family: "Inter", "Segoe UI", Tahoma, Geneva, Verdana, sans-serif; background: var(--bg); color: #17323b; padding: 18px; -webkit-font-smoothing:antialiased; }',
-        '.dashboard { max-width: 1200px; margin: 0 auto; }',
-        '.skip-link { position: absolute; left: -999px; top: auto; width:1px; height:1px; overflow:hidden; }',
-        '.skip-link:focus { left: 18px; top: 18px; width:auto; height:auto; padding:8px 12px; background:var(--card); border-radius:6px; box-shadow:0 6px 18px rgba(0,0,0,0.12); z-index:2000; }',
-        '.header { background: var(--card); padding: 20px; border-radius: 10px; margin-bottom: 16px; box-shadow: 0 6px 18px rgba(0,0,0,0.06); }',
-        '.header h1 { color: #0f3b2d; font-size: 26px; margin-bottom: 6px; }',
-        '.header p { color: var(--muted); font-size: 14px; }',
-        '.metrics { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 14px; margin-bottom: 18px; }',
-        '.metric-card { background: var(--card); padding: 18px; border-radius: 10px; box-shadow: 0 6px 18px rgba(3,19,16,0.04); transition: transform 0.18s ease-in-out; }',
-        '.metric-card:hover { transform: translateY(-6px); }',
-        '.metric-label { font-size: 12px; color: var(--muted); text-transform: uppercase; letter-spacing: 0.6px; margin-bottom: 6px; }',
-        '.metric-value { font-size: 30px; font-weight: 700; color: #082a20; margin-bottom: 4px; }',
-        '.metric-unit { font-size: 14px; color: var(--muted); margin-left: 6px; }',
-        '.metric-trend { font-size: 12px; color: var(--accent); margin-top: 6px; }',
-        '.metric-trend.negative { color: #bf2b2b; }',
-        '.metric-icon { float: right; font-size: 28px; opacity: 0.25; }',
-        '.section-title { background: transparent; padding: 8px 0; margin: 18px 0 8px 0; }',
-        '.section-title h2 { color: #0f3b2d; font-size: 20px; margin: 0; border-left: 4px solid var(--bugn-3); padding-left: 12px; }',
-        '.charts-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(360px, 1fr)); gap: 16px; margin-bottom: 18px; }',
-        '.charts-grid-single { display: grid; grid-template-columns: 1fr; gap: 16px; margin-bottom: 18px; }',
-        '.chart-card { background: var(--card); padding: 18px; border-radius: 10px; box-shadow: 0 6px 18px rgba(3,19,16,0.04); }',
-        '.chart-card h3 { color: #082a20; font-size: 16px; margin-bottom: 12px; }',
-        '.footer { background: transparent; padding: 12px 0; text-align: center; color: var(--muted); font-size: 13px; }',
-        '.legend { margin-top: 12px; font-size: 13px; color: var(--muted); }',
-        '.legend span { margin-right: 12px; display:inline-block; }',
-        '@media (max-width: 900px) { .charts-grid, .charts-grid-single { grid-template-columns: 1fr; } .metrics { grid-template-columns: repeat(auto-fit,minmax(180px,1fr)); } }',
-        '@media print { body { background: white; } .header, .metric-card, .chart-card { box-shadow: none !important; } }',
-        '@media (prefers-reduced-motion: reduce) { * { transition: none !important; animation: none !important; } }',
-        '</style>',
-        '</head><body>',
-        '<a class="skip-link" href="#main">Pular para o conteúdo</a>',
-        '<div class="dashboard" id="main" role="main">',
-        '<div class="header">',
-        '<h1>📊 Dashboard PRAD – Monitoramento e Indicadores</h1>',
-        '<p>Programa de Recuperação de Áreas Degradadas | Igarassu/PE | Última atualização: ' + datas[-1] + '</p>',
-    '</div>',
-    '<div style="text-align:right;margin-bottom:12px;">',
-    '<button onclick="window.print()" style="background:#2c3e50;color:#fff;border:none;padding:10px 14px;border-radius:8px;cursor:pointer;">Salvar PDF</button>',
-    '</div>',
-        
-        # Cards de métricas
-    '<div class="metrics">',
-        '<div class="metric-card">',
-        '<div class="metric-icon">🌱</div>',
-        '<div class="metric-label">Sobrevivência Média</div>',
-        f'<div class="metric-value">{sobrev_media:.1f}<span class="metric-unit">%</span></div>',
-        '<div class="metric-trend">↗ Tendência positiva</div>',
-        '</div>',
-        
-        '<div class="metric-card">',
-        '<div class="metric-icon">🌳</div>',
-        '<div class="metric-label">Cobertura de Copa</div>',
-        f'<div class="metric-value">{copa_media:.1f}<span class="metric-unit">%</span></div>',
-        '<div class="metric-trend">↗ Em expansão</div>',
-        '</div>',
-        
-        '<div class="metric-card">',
-        '<div class="metric-icon">⚠️</div>',
-        '<div class="metric-label">Invasoras</div>',
-        f'<div class="metric-value">{invas_media:.1f}<span class="metric-unit">%</span></div>',
-        '<div class="metric-trend negative">↘ Em declínio</div>',
-        '</div>',
-        
-        '<div class="metric-card">',
-        '<div class="metric-icon">🔬</div>',
-        '<div class="metric-label">Riqueza de Espécies</div>',
-    f'<div class="metric-value">{riqueza_media:.1f}<span class="metric-unit"> spp</span></div>',
-    '<div class="metric-trend">Última campanha</div>',
-    '</div>',
-
-    '<div class="metric-card">',
-    '<div class="metric-icon">📈</div>',
-    '<div class="metric-label">Diversidade (Shannon)</div>',
-    f'<div class="metric-value">{shannon_medio:.2f}</div>',
-    '<div class="metric-trend">Última campanha</div>',
-        '</div>',
-        '</div>',
-        
-        # SEÇÃO 1: Indicadores Estruturais
-        '<div class="section-title"><h2>📊 Indicadores Estruturais da Vegetação</h2></div>',
-        '<div class="charts-grid">',
-        '<div class="chart-card">',
-        make_chart('Taxa de Sobrevivência (%)', datas, series, 'sobrevivencia', colors),
-        '</div>',
-        '<div class="chart-card">',
-        make_chart('Altura Média (m)', datas, series, 'altura_media', colors),
-        '</div>',
-        '<div class="chart-card">',
-        make_chart('Diâmetro Médio (cm)', datas, series, 'diametro_medio', colors),
-        '</div>',
-        '<div class="chart-card">',
-        make_chart('Cobertura de Copa (%)', datas, series, 'cobertura_copa', colors),
-        '</div>',
-        '</div>',
-        
-        # SEÇÃO 2: Controle de Invasoras
-        '<div class="section-title"><h2>⚠️ Controle de Espécies Invasoras</h2></div>',
-        '<div class="charts-grid">',
-        '<div class="chart-card">',
-        make_chart('Cobertura de Invasoras (%)', datas, series, 'cobertura_invasoras', colors),
-        '</div>',
-        '<div class="chart-card">',
-        make_chart('Razão Copa/Invasoras', datas, series, 'razao_copa_invasoras', colors),
-        '</div>',
-        '</div>',
-        
-        # SEÇÃO 3: Diversidade Biológica
-        '<div class="section-title"><h2>🌿 Diversidade Biológica</h2></div>',
-        '<div class="charts-grid">',
-        '<div class="chart-card">',
-        make_chart('Riqueza de Espécies (spp)', datas, series, 'riqueza', colors),
-        '</div>',
-        '<div class="chart-card">',
-        make_chart('Índice de Shannon (H\')', datas, series, 'shannon', colors),
-        '</div>',
-        
-        # Gráfico por espécie
-        '<div class="chart-card">',
-    ]
-    
-    top_species = sorted(series_sp.items(), key=lambda x: x[0])[:4]
-    parts.append(make_chart_species('Sobrevivência por Espécie - Top 4', datas, dict(top_species), colors))
-    parts.append('</div>')
-    parts.append('</div>')
-
-    # SEÇÃO 4: Sucessão Ecológica e Comparações
-    parts.append('<div class="section-title"><h2>🌳 Sucessão Ecológica e Composição Florística</h2></div>')
-    parts.append('<div class="charts-grid-single">')
-    # Painel de sucessão ecológica
-    parts.append('<div class="chart-card">')
-    parts.append('<h3>Espécies presentes na última campanha (' + latest + ')</h3>')
-    parts.append('<div style="display:grid;grid-template-columns:repeat(auto-fit,minmax(220px,1fr));gap:12px;">')
-    for grupo in sorted(grupos_presentes.keys()):
-        lista = grupos_presentes[grupo]
-        items = ''.join(f'<li>{x}</li>' for x in lista)
-        parts.append(f'<div><strong>{grupo}</strong><ul style="margin-top:6px;line-height:1.5">{items}</ul></div>')
-    parts.append('</div>')
-    parts.append('</div>')
-    
-    # Comparativo APP vs RL (assumindo P01=APP, P02=RL)
-    parts.append('<div class="chart-card">')
-    parts.append('<h3>Comparativo APP vs RL – Última campanha (' + latest + ')</h3>')
-    subarea_map = {'P01': 'APP', 'P02': 'RL'}
-    agg = defaultdict(lambda: {'vivas':0,'totais':0,'copa':[],'invas':[]})
-    for r in rows:
-        if r['data'] == latest:
-            sa = subarea_map.get(r['parcela'], 'Outros')
-            try:
-                viv = int(r['plantadas_vivas']) if r['plantadas_vivas'] else 0
-                tot = int(r['plantadas_totais']) if r['plantadas_totais'] else 0
-                cc = float(r['cobertura_copa_pct']) if r['cobertura_copa_pct'] else 0
-                ci = float(r['cobertura_invasoras_pct']) if r['cobertura_invasoras_pct'] else 0
-            except ValueError:
-                viv, tot, cc, ci = 0, 0, 0.0, 0.0
-            agg[sa]['vivas'] += viv
-            agg[sa]['totais'] += tot
-            agg[sa]['copa'].append(cc)
-            agg[sa]['invas'].append(ci)
-    table_rows = []
-    for sa in ['APP','RL']:
-        a = agg.get(sa)
-        if a:
-            surv = (a['vivas']/a['totais']*100) if a['totais']>0 else 0
-            copa_sa = mean(a['copa']) if a['copa'] else 0
-            invas_sa = mean(a['invas']) if a['invas'] else 0
-            table_rows.append(f'<tr><td>{sa}</td><td>{surv:.1f}%</td><td>{copa_sa:.1f}%</td><td>{invas_sa:.1f}%</td></tr>')
-    parts.append('<table style="width:100%;border-collapse:collapse;margin-top:8px;">')
-    parts.append('<thead><tr><th style="text-align:left;border-bottom:2px solid #ecf0f1;">Subárea</th><th style="text-align:right;border-bottom:2px solid #ecf0f1;">Sobrevivência</th><th style="text-align:right;border-bottom:2px solid #ecf0f1;">Copa</th><th style="text-align:right;border-bottom:2px solid #ecf0f1;">Invasoras</th></tr></thead>')
-    parts.append('<tbody>')
-    parts.append(''.join(table_rows) if table_rows else '<tr><td colspan="4">Sem dados.</td></tr>')
-    parts.append('</tbody></table>')
-    parts.append('</div>')
-    parts.append('</div>')
-    
-    # SEÇÃO 5: Alertas Automáticos
-    if alertas:
-        parts.append('<div class="section-title"><h2>🚨 Alertas e Recomendações Técnicas</h2></div>')
-        parts.append('<div class="charts-grid-single">')
-        parts.append('<div class="chart-card">')
-        parts.append('<div style="display:grid;gap:12px;">')
-        
-        # Agrupar por parcela
-        alertas_por_parcela = defaultdict(list)
-        for a in alertas:
-            alertas_por_parcela[a['parcela']].append(a)
-        
-        for parcela in sorted(alertas_por_parcela.keys()):
-            parts.append(f'<div style="border-left:4px solid #e74c3c;padding-left:12px;margin-bottom:12px;">')
-            parts.append(f'<strong style="color:#2c3e50;">Parcela {parcela}</strong>')
-            parts.append('<ul style="margin-top:8px;line-height:1.8;">')
-            for a in alertas_por_parcela[parcela]:
-                icon = '🔴' if a['tipo'] == 'CRÍTICO' else '⚠️'
-                parts.append(f'<li style="color:#555;"><strong style="color:{a["cor"]}">{icon} [{a["categoria"]}]</strong> {a["mensagem"]}</li>')
-            parts.append('</ul>')
-            parts.append('</div>')
-        
-        parts.append('</div>')
-        parts.append('</div>')
-        parts.append('</div>')
-    
-    # SEÇÃO 6: Classificação Sucessional
-    parts.append('<div class="section-title"><h2>🌲 Classificação de Estágio Sucessional</h2></div>')
-    parts.append('<div class="charts-grid">')
-    
-    for parcela in sorted(classificacao.keys()):
-        c = classificacao[parcela]
-        parts.append('<div class="chart-card">')
-        parts.append(f'<h3>Parcela {parcela}</h3>')
-        parts.append(f'<div style="text-align:center;margin:20px 0;">')
-        parts.append(f'<div style="display:inline-block;background:{c["cor"]};color:#fff;padding:12px 24px;border-radius:8px;font-size:18px;font-weight:bold;margin-bottom:12px;">')
-        parts.append(f'{c["estagio"]}</div>')
-        parts.append(f'<div style="color:#7f8c8d;font-size:14px;">Score: {c["score"]:.1f}/100</div>')
-        parts.append('</div>')
-        
-        # Indicadores detalhados
-        parts.append('<table style="width:100%;margin-top:16px;border-collapse:collapse;">')
-        parts.append('<tr style="border-bottom:1px solid #ecf0f1;"><td style="padding:8px;color:#7f8c8d;">Sobrevivência</td><td style="text-align:right;padding:8px;font-weight:bold;">{:.1f}%</td></tr>'.format(c['sobrevivencia']))
-        parts.append('<tr style="border-bottom:1px solid #ecf0f1;"><td style="padding:8px;color:#7f8c8d;">Diversidade (Shannon)</td><td style="text-align:right;padding:8px;font-weight:bold;">{:.2f}</td></tr>'.format(c['shannon']))
-        parts.append('<tr style="border-bottom:1px solid #ecf0f1;"><td style="padding:8px;color:#7f8c8d;">Riqueza</td><td style="text-align:right;padding:8px;font-weight:bold;">{:.0f} spp</td></tr>'.format(c['riqueza']))
-        parts.append('<tr style="border-bottom:1px solid #ecf0f1;"><td style="padding:8px;color:#7f8c8d;">Cobertura Copa</td><td style="text-align:right;padding:8px;font-weight:bold;">{:.1f}%</td></tr>'.format(c['copa']))
-        parts.append('<tr style="border-bottom:1px solid #ecf0f1;"><td style="padding:8px;color:#7f8c8d;">Invasoras</td><td style="text-align:right;padding:8px;font-weight:bold;">{:.1f}%</td></tr>'.format(c['invasoras']))
-        parts.append('<tr><td style="padding:8px;color:#7f8c8d;">Razão Copa/Invasoras</td><td style="text-align:right;padding:8px;font-weight:bold;">{:.2f}</td></tr>'.format(c['razao']))
-        parts.append('</table>')
-        parts.append('</div>')
-    
-    parts.append('</div>')
-    
-    # SEÇÃO 7: Incrementos de Crescimento
-    parts.append('<div class="section-title"><h2>📈 Taxa de Incremento (Δ Altura e Δ Diâmetro)</h2></div>')
-    parts.append('<div class="charts-grid">')
-    
-    for parcela in sorted(incrementos.keys()):
-        inc = incrementos[parcela]
-        if not inc['datas_intervalo']:
+
+    # Comparativo entre as parcelas do projeto na última campanha
+    # Médias por linha (células vazias contam como 0), somando os acumuladores das parcelas
+    agg = defaultdict(lambda: {'vivas':0,'totais':0,'copa':0.0,'invas':0.0,'linhas':0})
+    for (parcela, data), g in grupos[CHAVE_PARCELA_DATA].items():
+        if data == latest:
+            a = agg[parcela]
+            a['vivas'] += g.vivas
+            a['totais'] += g.totais
+            a['copa'] += g.soma_copa
+            a['invas'] += g.soma_invasoras
+            a['linhas'] += g.linhas
+
+    secoes = [cache.secao('kpis', [sobrev_media, copa_media, invas_media, riqueza_media, shannon_medio],
+                          lambda: MODELO_KPIS.renderizar(
+                              sobrevivencia=f'{sobrev_media:.1f}', copa=f'{copa_media:.1f}',
+                              invasoras=f'{invas_media:.1f}', riqueza=f'{riqueza_media:.1f}',
+                              shannon=f'{shannon_medio:.2f}'))]
+    top_species = dict(sorted(series_sp.items(), key=lambda x: x[0])[:4])
+    for nome, titulo, graficos in GRAFICOS_RELATORIO:
+        metricas = [m for _, m in graficos]
+        if canvas:
+            # marcadores não dependem dos dados
+            extra = (make_chart_canvas('Sobrevivência por Espécie - Top 4', 'sobrevivencia', 'especies', 0),) \
+                if nome == 'diversidade' else ()
+            secoes.append(cache.secao(nome, ['canvas', graficos],
+                                      lambda t=titulo, g=graficos, e=extra: _secao_graficos(
+                                          t, g, datas, series, colors, e, canvas=True)))
             continue
-        
-        parts.append('<div class="chart-card">')
-        parts.append(f'<h3>Parcela {parcela} - Incrementos por Período</h3>')
-        parts.append('<table style="width:100%;border-collapse:collapse;margin-top:8px;font-size:13px;">')
-        parts.append('<thead><tr>')
-        parts.append('<th style="text-align:left;border-bottom:2px solid #ecf0f1;padding:8px;">Período</th>')
-        parts.append('<th style="text-align:right;border-bottom:2px solid #ecf0f1;padding:8px;">Δ Altura (m)</th>')
-        parts.append('<th style="text-align:right;border-bottom:2px solid #ecf0f1;padding:8px;">Taxa/mês (m)</th>')
-        parts.append('<th style="text-align:right;border-bottom:2px solid #ecf0f1;padding:8px;">Δ Diâmetro (cm)</th>')
-        parts.append('<th style="text-align:right;border-bottom:2px solid #ecf0f1;padding:8px;">Taxa/mês (cm)</th>')
-        parts.append('</tr></thead>')
-        parts.append('<tbody>')
-        
-        for i in range(len(inc['datas_intervalo'])):
-            periodo = inc['datas_intervalo'][i]
-            dh = inc['delta_altura'][i]
-            dd = inc['delta_diametro'][i]
-            th = inc['taxa_altura_mes'][i]
-            td = inc['taxa_diametro_mes'][i]
-            
-            # Cor baseada em taxa positiva/negativa
-            cor_h = '#27ae60' if dh > 0 else '#e74c3c'
-            cor_d = '#27ae60' if dd > 0 else '#e74c3c'
-            
-            parts.append('<tr style="border-bottom:1px solid #ecf0f1;">')
-            parts.append(f'<td style="padding:8px;color:#7f8c8d;">{periodo}</td>')
-            parts.append(f'<td style="text-align:right;padding:8px;color:{cor_h};font-weight:bold;">{dh:+.2f}</td>')
-            parts.append(f'<td style="text-align:right;padding:8px;color:#95a5a6;">{th:.3f}</td>')
-            parts.append(f'<td style="text-align:right;padding:8px;color:{cor_d};font-weight:bold;">{dd:+.2f}</td>')
-            parts.append(f'<td style="text-align:right;padding:8px;color:#95a5a6;">{td:.3f}</td>')
-            parts.append('</tr>')
-        
-        parts.append('</tbody></table>')
-        parts.append('</div>')
-    
-    parts.append('</div>')
-    
-    parts.append('<div class="footer">Dashboard gerado automaticamente por gerar_visuais.py | Autor: Ronan Armando Caetano — Graduando em Ciências Biológicas (UFSC) • Técnico em Geoprocessamento (IFSC) • Técnico em Saneamento (IFSC) | PRAD Simulado PE</div>')
-    parts.append('</div></body></html>')
-    
-    with open(path_out, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(parts))
+        entradas = [datas, colors, max_series, {p: {m: s.get(m, []) for m in metricas} for p, s in series.items()}]
+        if nome == 'diversidade':
+            # Gráfico por espécie
+            entradas.append({sp: [s['datas'], list(s['sobrevivencia'])] for sp, s in top_species.items()})
+            gerar = lambda t=titulo, g=graficos: _secao_graficos(
+                t, g, datas, series, colors,
+                (make_chart_species('Sobrevivência por Espécie - Top 4', datas, top_species, colors, max_series),),
+                max_series)
+        else:
+            gerar = lambda t=titulo, g=graficos: _secao_graficos(t, g, datas, series, colors, max_series=max_series)
+        secoes.append(cache.secao(nome, entradas, gerar))
+    secoes.append(cache.secao('sucessao', [latest, grupos_presentes, agg],
+                              lambda: _secao_sucessao(latest, grupos_presentes, agg)))
+    if alertas:
+        secoes.append(cache.secao('alertas', [ultima_data, alertas], lambda: _secao_alertas(alertas, ultima_data)))
+    secoes.append(cache.secao('classificacao', classificacao, lambda: _secao_classificacao(classificacao)))
+    crescimento_especies = crescimento(series_sp)
+    secoes.append(cache.secao('incrementos', [incrementos, crescimento_especies, sp_to_pop],
+                              lambda: _secao_incrementos(incrementos, crescimento_especies, sp_to_pop)))
+    if canvas:
+        secoes.append(dados_graficos(datas, {
+            'parcelas': (series, [m for _, _, g in GRAFICOS_RELATORIO for _, m in g], str),
+            'especies': (top_species, ['sobrevivencia'], rotulo_especie)}, colors, max_series))
+
+    html = MODELO_RELATORIO.renderizar(atualizacao=datas[-1], projeto=projeto, secoes='\n'.join(secoes))
+    gravar_se_mudou(path_out, html.encode('utf-8'))
 
 
-def make_chart_species(title, datas, series_dict, colors):
+def make_chart_species(title, datas, series_dict, colors, max_series=MAX_SERIES_LINHAS):
     """Gráfico de linha para séries de espécies (sobrevivência)."""
     width, height = 520, 220
     all_vals = []
@@ -940,33 +1186,15 @@ def make_chart_species(title, datas, series_dict, colors):
             scaled.append((x,y))
         return scaled
 
-    lines = []
-    legend_items = []
-    palette_iter = iter(colors)
-    for sp, s in sorted(series_dict.items()):
-        col = next(palette_iter, '#000000')
-        vals_seq = []
-        data_to_val = dict(zip(s['datas'], s['sobrevivencia']))
-        for d in datas:
-            vals_seq.append(data_to_val.get(d, None))
-        clean = []
-        last = None
-        for v in vals_seq:
-            if v is None:
-                v = last if last is not None else vmin
-            clean.append(v)
-            last = v
-        pts = scale_specific(clean)
-        lines.append(f'<polyline fill="none" stroke="{col}" stroke-width="2" points="{" ".join(f"{x:.1f},{y:.1f}" for x,y in pts)}" />')
-        sp_short = sp.split()[-1] if len(sp.split())>1 else sp  # nome popular
-        legend_items.append(f'<span style="color:{col}">■ {sp_short}</span>')
+    lines, legend_items = _series_svg(datas, series_dict, 'sobrevivencia', colors, vmin, scale_specific,
+                                      rotulo_especie, max_series)
 
     svg = [f'<h3>{title}</h3>', f'<svg width="{width}" height="{height}" style="background:#fafafa;border:1px solid #e0e0e0;border-radius:8px;font-family:Arial,sans-serif;">']
     svg.append('<line x1="40" y1="180" x2="480" y2="180" stroke="#333" stroke-width="1" />')
     svg.append('<line x1="40" y1="40" x2="40" y2="180" stroke="#333" stroke-width="1" />')
-    for i,d in enumerate(datas):
+    for i in rotulos_x(datas, width):
         x = 40 + i*(width-80)/(len(datas)-1 if len(datas)>1 else 1)
-        svg.append(f'<text x="{x:.1f}" y="195" font-size="10" text-anchor="middle">{d}</text>')
+        svg.append(f'<text x="{x:.1f}" y="195" font-size="10" text-anchor="middle">{datas[i]}</text>')
     for j in range(6):
         val = vmin + j*(vmax-vmin)/5
         y = 180 - j*(140)/5
@@ -979,49 +1207,198 @@ def make_chart_species(title, datas, series_dict, colors):
     return '\n'.join(svg)
 
 
-def write_mapa(path_out, geojson_path):
-    # Mapa com pol�gonos GeoJSON carregados
-    leaflet_css = "https://unpkg.com/leaflet@1.9.4/dist/leaflet.css"
-    leaflet_js = "https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"
-    
-    # Carregar GeoJSON principal (parcelas) se existir
-    geojson_data = "{}"
-    if geojson_path and os.path.exists(geojson_path):
-        with open(geojson_path, 'r', encoding='utf-8') as f:
-            geojson_data = f.read()
+# nome da camada -> arquivo na pasta geo do projeto
+CAMADAS_MAPA = {
+    'estadual': 'limite_estadual.geojson',
+    'municipal': 'limite_municipal.geojson',
+    'municipios_pe': 'limite_municipios_pe.geojson',
+    'biomas': 'limite_biomas.geojson',
+}
+# camadas grandes embutidas já simplificadas: {zoom: FeatureCollection} (ver scripts/geometria.py)
+CAMADAS_SIMPLIFICADAS = ('municipios_pe', 'biomas')
+# subpasta (ao lado do mapa.html) das camadas externas
+PASTA_CAMADAS = 'camadas'
+ZOOM_MIN_MAPA = 12
+ZOOM_MAX_MAPA = 18
+# zoom em que Pernambuco inteiro cabe na tela
+ZOOM_ESTADO = 7
+# zoom máximo do enquadramento inicial nas parcelas do projeto
+ZOOM_INICIAL_MAPA = 14
+# área navegável = caixa das parcelas do projeto + MARGEM_MAPA graus; sem coordenadas, o estado
+MARGEM_MAPA = 0.1
+LIMITES_PE = [[-9.48, -41.36], [-7.27, -34.79]]
+# tiles vetoriais (--tiles): gerados de ZOOM_ESTADO a ZOOM_MAX_TILES; acima disso o mapa amplia os do último nível
+PASTA_TILES = 'tiles'
+ZOOM_MAX_TILES = 15
+# projetos com pelo menos MIN_PARCELAS_AGRUPAR parcelas: abaixo de ZOOM_PARCELAS o mapa mostra
+# grupos de parcelas pré-calculados (scripts/agrupamento.py) em vez dos polígonos
+MIN_PARCELAS_AGRUPAR = 50
+ZOOM_PARCELAS = 15
+# build de um projeto em grafo de etapas (scripts/grafo.py): estado na pasta de saída
+ESTADO_ETAPAS = '.etapas.json'
+ETAPAS_SIMULTANEAS = 4
+# colunas da síntese levadas ao mapa (tabela de indicadores por parcela)
+CAMPOS_INDICADORES_MAPA = ('sobrevivencia_pct', 'cobertura_copa_pct', 'cobertura_invasoras_pct',
+                           'score_sucessional', 'estagio_sucessional', 'alertas_criticos', 'alertas_atencao')
+
+
+def carregar_camadas(geo_dir, base=None, zoom_min=ZOOM_ESTADO):
+    """
+    Texto JSON de cada camada de limites em `geo_dir`; as ausentes vêm de `base` (camadas
+    já carregadas) ou, sem ele, de DIR_GEO_COMPARTILHADO (None se não houver). As camadas
+    simplificadas trazem os níveis usados a partir de `zoom_min` (padrão: o do mapa que se
+    afasta até o estado; `recortar_camadas` descarta os que um mapa não alcança).
+    """
+    camadas = {}
+    for nome, arquivo in CAMADAS_MAPA.items():
+        path = os.path.join(geo_dir, arquivo)
+        if not os.path.exists(path) and base is None:
+            path = os.path.join(DIR_GEO_COMPARTILHADO, arquivo)
+        if os.path.exists(path) and nome in CAMADAS_SIMPLIFICADAS:
+            camadas[nome] = camada_simplificada(path, zoom_min, ZOOM_MAX_MAPA)
+        elif os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                camadas[nome] = f.read()
+        else:
+            camadas[nome] = (base or {}).get(nome)
+    return camadas
+
+
+def recortar_camadas(camadas, zoom_min):
+    """`camadas` só com os níveis simplificados que um mapa com zoom mínimo `zoom_min` usa."""
+    recortadas = dict(camadas)
+    for nome in CAMADAS_SIMPLIFICADAS:
+        if camadas.get(nome):
+            niveis = niveis_usados(json.loads(camadas[nome]), zoom_min, ZOOM_MAX_MAPA)
+            recortadas[nome] = json.dumps(niveis, ensure_ascii=False, separators=(',', ':'))
+    return recortadas
+
+
+def _dados_topojson(geojson_data, camadas):
+    """Declarações JS das camadas a partir de um único TopoJSON (níveis de zoom como objetos 'nome@zoom')."""
+    objetos = {}
+    parcelas = json.loads(geojson_data)
+    if parcelas.get('features') is not None:
+        objetos['parcelas'] = parcelas
+    for nome in ('estadual', 'municipal'):
+        if camadas.get(nome):
+            objetos[nome] = json.loads(camadas[nome])
+    externas = {}
+    for nome in CAMADAS_SIMPLIFICADAS:
+        if camadas.get(nome):
+            niveis = json.loads(camadas[nome])
+            if 'externa' in niveis:
+                externas[nome] = camadas[nome]
+                continue
+            for zoom, colecao in niveis.items():
+                objetos[f'{nome}@{zoom}'] = colecao
+    topo = json.dumps(topologia(objetos), ensure_ascii=False, separators=(',', ':'))
+    return f"""// todas as camadas em um único TopoJSON (arcos compartilhados, coordenadas inteiras em diferenças)
+var topologia = {topo};
+{DECODIFICADOR_TOPOJSON}
+function topoNiveis(topo, nome) {{
+    var niveis = null;
+    Object.keys(topo.objects).forEach(function(k) {{
+        if (k.indexOf(nome + '@') === 0) (niveis = niveis || {{}})[k.slice(nome.length + 1)] = topoFeatures(topo, k);
+    }});
+    return niveis;
+}}
+var geojsonData = topoFeatures(topologia, 'parcelas') || {{}};
+var geojsonEstadual = topoFeatures(topologia, 'estadual');
+var geojsonMunicipal = topoFeatures(topologia, 'municipal');
+// camadas simplificadas: uma versão por nível de zoom {{zoom: FeatureCollection}}
+var geojsonMunicipiosPE = {externas.get('municipios_pe', "topoNiveis(topologia, 'municipios_pe')")};
+var geojsonBiomas = {externas.get('biomas', "topoNiveis(topologia, 'biomas')")};"""
 
-    # Procurar limites opcionais (limite estadual e municipal) na mesma pasta do GeoJSON
-    geojson_estadual = None
-    geojson_municipal = None
-    try:
-        geo_dir = os.path.dirname(geojson_path) if geojson_path else os.path.join('portfolio','Simulado_PE','geo')
-    except Exception:
-        geo_dir = os.path.join('portfolio','Simulado_PE','geo')
-
-    est_path = os.path.join(geo_dir, 'limite_estadual.geojson')
-    mun_path = os.path.join(geo_dir, 'limite_municipal.geojson')
-    if os.path.exists(est_path):
-        with open(est_path, 'r', encoding='utf-8') as f:
-            geojson_estadual = f.read()
-    if os.path.exists(mun_path):
-        with open(mun_path, 'r', encoding='utf-8') as f:
-            geojson_municipal = f.read()
-    # Ler camada com todos os municípios de PE e os biomas (se existirem)
-    municipios_pe_path = os.path.join(geo_dir, 'limite_municipios_pe.geojson')
-    biomas_path = os.path.join(geo_dir, 'limite_biomas.geojson')
-    geojson_municipios_pe = None
-    geojson_biomas = None
-    if os.path.exists(municipios_pe_path):
-        with open(municipios_pe_path, 'r', encoding='utf-8') as f:
-            geojson_municipios_pe = f.read()
-    if os.path.exists(biomas_path):
-        with open(biomas_path, 'r', encoding='utf-8') as f:
-            geojson_biomas = f.read()
-    
-    html = f"""<!DOCTYPE html><html lang='pt-br'><head><meta charset='utf-8'/><title>Mapa – PRAD Simulado Pernambuco</title>
-<link rel='stylesheet' href='{leaflet_css}'/>
+
+def gravar_camadas_externas(out_dir, camadas):
+    """
+    Grava as camadas pesadas como arquivos ao lado do mapa (camadas/<nome>.json, com
+    versões .gz e, se o módulo brotli estiver instalado, .br) e devolve `camadas` com
+    essas entradas trocadas por {"externa": url}, baixadas só quando ativadas no mapa.
+    """
+    pasta = os.path.join(out_dir, PASTA_CAMADAS)
+    os.makedirs(pasta, exist_ok=True)
+    referencias = dict(camadas)
+    for nome in CAMADAS_SIMPLIFICADAS:
+        if not camadas.get(nome):
+            continue
+        dados = camadas[nome].encode('utf-8')
+        path = os.path.join(pasta, nome + '.json')
+        gravar_se_mudou(path, dados)
+        gravar_se_mudou(path + '.gz', gzip.compress(dados, compresslevel=9, mtime=0))
+        if brotli is not None:
+            gravar_se_mudou(path + '.br', brotli.compress(dados))
+        referencias[nome] = json.dumps({'externa': f'{PASTA_CAMADAS}/{nome}.json'})
+    return referencias
+
+
+def gerar_camadas_tiles(out_dir, geojson_data, camadas, limites, limites_visao=None):
+    """
+    Corta parcelas, municípios de PE e biomas em tiles vetoriais z/x/y (visuais/tiles/<camada>/),
+    de ZOOM_ESTADO a ZOOM_MAX_TILES e só dentro de `limites` (área do projeto); abaixo de
+    ZOOM_MIN_MAPA, dentro de `limites_visao` se houver (mapa que se afasta até o estado).
+    Devolve (parcelas, camadas) com essas entradas trocadas pela definição da pirâmide.
+    """
+    fontes = {'parcelas': json.loads(geojson_data)}
+    for nome in CAMADAS_SIMPLIFICADAS:
+        if camadas.get(nome):
+            niveis = json.loads(camadas[nome])
+            fontes[nome] = niveis[max(niveis, key=int)]  # nível mais detalhado
+    definicoes = {}
+    for nome, colecao in fontes.items():
+        if not colecao.get('features'):
+            continue
+        indice = gerar_tiles(colecao, os.path.join(out_dir, PASTA_TILES, nome), ZOOM_ESTADO, ZOOM_MAX_TILES, limites,
+                             {z: limites_visao for z in range(ZOOM_ESTADO, ZOOM_MIN_MAPA)} if limites_visao else None)
+        definicoes[nome] = json.dumps({'tiles': f'{PASTA_TILES}/{nome}', 'extent': EXTENT, 'zoomMax': ZOOM_MAX_TILES,
+                                       'limites': indice['limites'], 'zooms': indice['zooms']}, separators=(',', ':'))
+    referencias = dict(camadas)
+    for nome in CAMADAS_SIMPLIFICADAS:
+        if nome in definicoes:
+            referencias[nome] = definicoes[nome]
+    return definicoes.get('parcelas', geojson_data), referencias
+
+
+def indicadores_parcelas(geojson_data, sintese):
+    """
+    Junta as linhas da síntese (exportar_sintese_csv) às parcelas do GeoJSON pelo id `parcela`.
+    Devolve a tabela compacta {'campos': [...], 'estagios': [[nome, cor], ...], 'parcelas': {id: [valores]}},
+    com o estágio como índice em `estagios`; None se não houver síntese ou parcelas.
+    """
+    if not sintese or not geojson_data:
+        return None
+    por_parcela = {row['parcela']: row for row in sintese}
+    estagios = list(CORES_ESTAGIO)
+    parcelas = {}
+    for f in json.loads(geojson_data).get('features', []):
+        pid = (f.get('properties') or {}).get('parcela')
+        row = por_parcela.get(pid)
+        if row is None or pid in parcelas:
+            continue
+        valores = []
+        for campo in CAMPOS_INDICADORES_MAPA:
+            if campo == 'estagio_sucessional':
+                estagio = row[campo]
+                if estagio not in estagios:
+                    estagios.append(estagio)
+                valores.append(estagios.index(estagio))
+            else:
+                v = row[campo]
+                valores.append(v if isinstance(v, (int, float)) else parse_float(v, 0.0))
+        parcelas[pid] = valores
+    if not parcelas:
+        return None
+    return {'campos': list(CAMPOS_INDICADORES_MAPA),
+            'estagios': [[e, CORES_ESTAGIO.get(e, '#999999')] for e in estagios],
+            'parcelas': parcelas}
+
+
+# Modelo do mapa.html (Leaflet); campos {{ nome }} preenchidos por write_mapa
+MODELO_MAPA = Modelo('''<!DOCTYPE html><html lang='pt-br'><head><meta charset='utf-8'/><title>Mapa – {{ titulo }}</title>
+<link rel='stylesheet' href='{{ leaflet_css }}'/>
 <style>
-:root {{
+:root {
     --bg: #f7fcfb;
     --card: #ffffff;
     --muted: #425b55;
@@ -1029,177 +1406,738 @@ def write_mapa(path_out, geojson_path):
     --bugn-1: #e5f5f9;
     --bugn-2: #99d8c9;
     --bugn-3: #2ca25f;
-}}
-body,html{{height:100%;margin:0;padding:0;font-family:Arial,sans-serif;background:var(--bg);color:#0b2e24}}
-#map{{height:calc(100% - 64px);width:100%;}}
-.header{{background:var(--card);color:var(--muted);padding:12px 20px;font-size:18px;font-weight:700;text-align:center;border-bottom:4px solid var(--bugn-2);}}
-.info{{background:var(--card);padding:12px 14px;border:1px solid rgba(6,33,24,0.08);position:absolute;top:120px;left:12px;z-index:900;font-size:14px;line-height:1.5;max-width:360px;box-shadow:0 8px 20px rgba(6,33,24,0.06);border-radius:8px;overflow:auto;max-height:60vh;transition:transform 180ms ease,opacity 180ms ease;}}
-.info h3{{margin:0 0 8px 0;font-size:15px;border-bottom:2px solid var(--bugn-1);padding-bottom:6px;color:#073826}}
-.legend-item{{margin:6px 0;display:flex;align-items:center;gap:8px}}
-.legend-item .swatch{{display:inline-block;width:22px;height:14px;border-radius:3px;border:1px solid rgba(0,0,0,0.06)}}
-.footer{{position:absolute;bottom:12px;left:12px;background:rgba(255,255,255,0.95);padding:8px 12px;font-size:12px;border-radius:8px;z-index:900;text-align:left;max-width:calc(100% - 40px);box-shadow:0 6px 14px rgba(6,33,24,0.06)}}
+}
+body,html{height:100%;margin:0;padding:0;font-family:Arial,sans-serif;background:var(--bg);color:#0b2e24}
+#map{height:calc(100% - 64px);width:100%;}
+.header{background:var(--card);color:var(--muted);padding:12px 20px;font-size:18px;font-weight:700;text-align:center;border-bottom:4px solid var(--bugn-2);}
+.info{background:var(--card);padding:12px 14px;border:1px solid rgba(6,33,24,0.08);position:absolute;top:120px;left:12px;z-index:900;font-size:14px;line-height:1.5;max-width:360px;box-shadow:0 8px 20px rgba(6,33,24,0.06);border-radius:8px;overflow:auto;max-height:60vh;transition:transform 180ms ease,opacity 180ms ease;}
+.info h3{margin:0 0 8px 0;font-size:15px;border-bottom:2px solid var(--bugn-1);padding-bottom:6px;color:#073826}
+.legend-item{margin:6px 0;display:flex;align-items:center;gap:8px}
+.legend-item .swatch{display:inline-block;width:22px;height:14px;border-radius:3px;border:1px solid rgba(0,0,0,0.06)}
+.footer{position:absolute;bottom:12px;left:12px;background:rgba(255,255,255,0.95);padding:8px 12px;font-size:12px;border-radius:8px;z-index:900;text-align:left;max-width:calc(100% - 40px);box-shadow:0 6px 14px rgba(6,33,24,0.06)}
 /* Garantir controles do Leaflet por cima dos elementos informativos */
-.leaflet-control-container{{z-index:1600 !important}}
-
-@media (max-width: 700px) {{
-        .info {{ position: fixed; bottom: 88px; left: 12px; right: 12px; top: auto; max-width: none; max-height:36vh; }}
-        #map {{ height: calc(100% - 156px); }}
-        .info h3 {{ font-size:14px; }}
-        .footer {{ left: 12px; right: 12px; bottom: 12px; max-width: none; }}
-}}
+.leaflet-control-container{z-index:1600 !important}
+
+@media (max-width: 700px) {
+        .info { position: fixed; bottom: 88px; left: 12px; right: 12px; top: auto; max-width: none; max-height:36vh; }
+        #map { height: calc(100% - 156px); }
+        .info h3 { font-size:14px; }
+        .footer { left: 12px; right: 12px; bottom: 12px; max-width: none; }
+}
+.rotulo-grupo{background:transparent;border:0;box-shadow:none;font-weight:700;color:#073826}
 /* legenda sempre visível; botão de alternar removido do template para evitar bloqueio */
 </style>
 </head><body>
-<div class='header'>PRAD Simulado – Mata Atlântica (Pernambuco)</div>
+<div class='header'>{{ titulo }}</div>
 <div id='map'></div>
 <div class='info' id='infoPanel'>
   <h3>Local de Estudo</h3>
-    <strong>Município:</strong> Igarassu/PE<br/>
-  <strong>Bioma:</strong> Mata Atlântica<br/>
-  <strong>Área:</strong> 12 ha (APP + RL)<br/>
+  <strong>Projeto:</strong> {{ projeto }}<br/>
+  <strong>Bioma:</strong> {{ biomas }}<br/>
+  <strong>Parcelas:</strong> {{ n_parcelas }}<br/>
   <hr style='margin:8px 0;'/>
-  <h3>Legendas</h3>
-    <div class='legend-item'><span class='swatch' style='background:var(--bugn-3);'></span>Parcela P01 – Desempenho alto</div>
-    <div class='legend-item'><span class='swatch' style='background:var(--bugn-2);'></span>Parcela P02 – Recuperação progressiva</div>
+  <h3>Legendas</h3>{{ legenda_estagios }}
     <!-- Limites estadual e municipal removidos da legenda conforme solicitado -->
 </div>
 <div class='footer'><strong>Autor:</strong> Ronan Armando Caetano — Graduando em Ciências Biológicas (UFSC) • Técnico em Geoprocessamento (IFSC) • Técnico em Saneamento (IFSC)</div>
-<script src='{leaflet_js}'></script>
+<script src='{{ leaflet_js }}'></script>
 <script>
-var map = L.map('map', {{
-  minZoom: 12,
-  maxZoom: 18,
-  maxBounds: [[-7.95, -35.05], [-7.72, -34.80]]
-}}).setView([-7.8340,-34.9060], 14);
-
-L.tileLayer('https://tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{
+var map = L.map('map', {
+  maxZoom: {{ zoom_max }},
+  maxBounds: {{ limites }}
+});
+// projetos espalhados: o zoom mínimo cede até caber a área navegável inteira
+map.setMinZoom(Math.min({{ zoom_min }}, map.getBoundsZoom({{ limites }})));
+map.fitBounds({{ limites_parcelas }}, {maxZoom: {{ zoom_inicial }}});
+
+L.tileLayer('https://tile.openstreetmap.org/{z}/{x}/{y}.png', {
   maxZoom: 19, 
   attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contribuidores'
-}}).addTo(map);
-
-var geojsonData = {geojson_data};
-var geojsonEstadual = {geojson_estadual if geojson_estadual is not None else 'null'};
-var geojsonMunicipal = {geojson_municipal if geojson_municipal is not None else 'null'};
-var geojsonMunicipiosPE = {geojson_municipios_pe if geojson_municipios_pe is not None else 'null'};
-var geojsonBiomas = {geojson_biomas if geojson_biomas is not None else 'null'};
+}).addTo(map);
+
+{{ dados_camadas }}
+// indicadores da última campanha por parcela: {campos, estagios: [[nome, cor]], parcelas: {id: [valores]}}
+var indicadoresParcelas = {{ indicadores }};
+function indicadorParcela(feature) {
+    var v = indicadoresParcelas && feature.properties && indicadoresParcelas.parcelas[feature.properties.parcela];
+    if (!v) return null;
+    var r = {};
+    indicadoresParcelas.campos.forEach(function(c, i) { r[c] = v[i]; });
+    r.estagio = indicadoresParcelas.estagios[r.estagio_sucessional];
+    return r;
+}
+
+// Camada externa (arquivo ao lado do mapa): baixa a versão .gz e descomprime no navegador;
+// sem DecompressionStream (ou se a .gz falhar), baixa o .json
+function carregarCamadaExterna(url) {
+    function json(r) { if (!r.ok) throw new Error(url + ': HTTP ' + r.status); return r.json(); }
+    if (!window.DecompressionStream) return fetch(url).then(json);
+    return fetch(url + '.gz').then(function(r) {
+        if (!r.ok) throw new Error(r.status);
+        return new Response(r.body.pipeThrough(new DecompressionStream('gzip'))).json();
+    }).catch(function() { return fetch(url).then(json); });
+}
+
+// Camada em tiles vetoriais (z/x/y.json): só os tiles visíveis são baixados e desenhados em canvas,
+// com o mesmo `style`/`onEachFeature` de L.geoJSON (popups pelo clique no mapa)
+function camadaTiles(def, opcoes) {
+    var cache = {};
+    function existe(z, chave) { return def.zooms[z] && def.zooms[z].indexOf(chave) !== -1; }
+    function carregar(chave) {
+        return cache[chave] = cache[chave] || fetch(def.tiles + '/' + chave + '.json').then(function(r) {
+            if (!r.ok) throw new Error(chave + ': HTTP ' + r.status);
+            return r.json();
+        });
+    }
+    function tileDe(coords) {
+        var z = Math.min(coords.z, def.zoomMax), f = Math.pow(2, coords.z - z);
+        return {z: z, x: Math.floor(coords.x / f), y: Math.floor(coords.y / f), f: f};
+    }
+    function aneis(ft, k, ox, oy, cb) {
+        ft.rings.forEach(function(anel) {
+            cb(anel.map(function(p) { return [p[0] * k - ox, p[1] * k - oy]; }));
+        });
+    }
+    var Camada = L.GridLayer.extend({
+        createTile: function(coords, done) {
+            var tile = L.DomUtil.create('canvas'), tam = this.getTileSize(), t = tileDe(coords);
+            tile.width = tam.x; tile.height = tam.y;
+            var chave = t.z + '/' + t.x + '/' + t.y;
+            if (!existe(t.z, t.x + '/' + t.y)) { setTimeout(function() { done(null, tile); }, 0); return tile; }
+            carregar(chave).then(function(dados) {
+                var ctx = tile.getContext('2d'), k = tam.x * t.f / def.extent;
+                var ox = (coords.x - t.x * t.f) * tam.x, oy = (coords.y - t.y * t.f) * tam.y;
+                dados.features.forEach(function(ft) {
+                    var st = L.extend({color: '#3388ff', weight: 3, opacity: 1, fillOpacity: 0.2}, opcoes.style ? opcoes.style(ft) : {});
+                    ctx.beginPath();
+                    aneis(ft, k, ox, oy, function(pts) {
+                        pts.forEach(function(p, i) { i ? ctx.lineTo(p[0], p[1]) : ctx.moveTo(p[0], p[1]); });
+                        ctx.closePath();
+                    });
+                    if (st.fill !== false && st.fillOpacity) {
+                        ctx.globalAlpha = st.fillOpacity; ctx.fillStyle = st.fillColor || st.color; ctx.fill('evenodd');
+                    }
+                    if (st.stroke !== false && st.weight) {
+                        ctx.globalAlpha = st.opacity; ctx.strokeStyle = st.color; ctx.lineWidth = st.weight;
+                        ctx.setLineDash(st.dashArray ? String(st.dashArray).split(/[ ,]+/).map(Number) : []);
+                        ctx.stroke();
+                    }
+                });
+                done(null, tile);
+            }).catch(function(e) { done(e, tile); });
+            return tile;
+        },
+        getBounds: function() { return L.latLngBounds(def.limites || []); }
+    });
+    var camada = new Camada({maxZoom: {{ zoom_max }}});
+    // popup: feição sob o clique (par ímpar de cruzamentos), nos tiles já carregados
+    map.on('click', function(e) {
+        if (!map.hasLayer(camada) || !opcoes.onEachFeature) return;
+        var z = map.getZoom(), p = map.project(e.latlng, z), tam = camada.getTileSize();
+        var coords = {x: Math.floor(p.x / tam.x), y: Math.floor(p.y / tam.y), z: z}, t = tileDe(coords);
+        var chave = t.z + '/' + t.x + '/' + t.y;
+        if (!existe(t.z, t.x + '/' + t.y)) return;
+        carregar(chave).then(function(dados) {
+            var k = tam.x * t.f / def.extent, ox = (coords.x - t.x * t.f) * tam.x, oy = (coords.y - t.y * t.f) * tam.y;
+            var px = p.x - coords.x * tam.x, py = p.y - coords.y * tam.y;
+            for (var i = dados.features.length - 1; i >= 0; i--) {
+                var ft = dados.features[i], dentro = false;
+                aneis(ft, k, ox, oy, function(pts) {
+                    for (var a = 0, b = pts.length - 1; a < pts.length; b = a++) {
+                        if ((pts[a][1] > py) !== (pts[b][1] > py) &&
+                            px < (pts[b][0] - pts[a][0]) * (py - pts[a][1]) / (pts[b][1] - pts[a][1]) + pts[a][0]) dentro = !dentro;
+                    }
+                });
+                if (!dentro) continue;
+                var alvo = {bindPopup: function(html) { this.html = html; }, on: function() {}, setStyle: function() {}};
+                opcoes.onEachFeature(ft, alvo);
+                if (alvo.html) L.popup().setLatLng(e.latlng).setContent(alvo.html).openOn(map);
+                return;
+            }
+        });
+    });
+    return camada;
+}
+
+// Dados GeoJSON ou definição de tiles vetoriais ({tiles: pasta, ...})
+function camadaGeo(dados, opcoes) {
+    return dados && dados.tiles ? camadaTiles(dados, opcoes) : L.geoJSON(dados, opcoes);
+}
+
+// Troca os dados da camada pela versão do nível vigente no zoom atual
+// (camadas externas são baixadas na primeira vez que são ativadas; camadas em tiles seguem camadaTiles)
+function camadaPorZoom(niveis, layer) {
+    if (niveis.tiles) return camadaTiles(niveis, layer.options);
+    if (niveis.externa) {
+        var pedido = null;
+        layer.on('add', function() {
+            pedido = pedido || carregarCamadaExterna(niveis.externa).then(function(dados) {
+                camadaPorZoom(dados, layer);
+            }).catch(function(e) { pedido = null; console.warn('Falha ao carregar camada', niveis.externa, e); });
+        });
+        return layer;
+    }
+    var zooms = Object.keys(niveis).map(Number).sort(function(a, b) { return a - b; });
+    var atual = null;
+    function atualizar() {
+        var z = zooms[0];
+        zooms.forEach(function(n) { if (n <= map.getZoom()) z = n; });
+        if (z === atual) return;
+        atual = z;
+        layer.clearLayers();
+        layer.addData(niveis[z]);
+    }
+    map.on('zoomend', atualizar);
+    atualizar();
+    return layer;
+}
 
 // legenda sempre visível; controle de toggle removido do template
 
 // Camada principal: parcelas (visível por padrão)
-var parcelasLayer = L.geoJSON(geojsonData, {{
-    style: function(feature) {{
-        return {{
+var parcelasLayer = camadaGeo(geojsonData, {
+    style: function(feature) {
+        var ind = indicadorParcela(feature);
+        if (ind) {
+            // preenchimento pelo estágio sucessional, contorno pelo nível de alerta
+            return {
+                color: ind.alertas_criticos > 0 ? '{{ cor_critico }}' : ind.alertas_atencao > 0 ? '#fe9929' : '#2b8cbe',
+                fillColor: ind.estagio[1],
+                weight: 1.8,
+                fillOpacity: 0.45
+            };
+        }
+        return {
             color: feature.properties.parcela === 'P01' ? '#2b8cbe' : '#de2d26',
             weight: 1.8,
             fillOpacity: 0.45
-        }};
-    }},
-    onEachFeature: function(feature, layer) {{
-        if (feature.properties && feature.properties.descricao) {{
-            layer.bindPopup('<b>'+feature.properties.parcela+'</b><br/>'+feature.properties.descricao);
-        }}
-        layer.on('mouseover', function() {{ this.setStyle({{weight:3, fillOpacity:0.6}}); }});
-        layer.on('mouseout', function() {{ this.setStyle({{weight:1.8, fillOpacity:0.45}}); }});
-    }}
-}}).addTo(map);
+        };
+    },
+    onEachFeature: function(feature, layer) {
+        var ind = indicadorParcela(feature);
+        if (feature.properties && feature.properties.descricao) {
+            layer.bindPopup('<b>'+feature.properties.parcela+'</b><br/>'+feature.properties.descricao +
+                (ind ? '<br/>Estágio: ' + ind.estagio[0] + ' (score ' + ind.score_sucessional + ')' +
+                       '<br/>Sobrevivência: ' + ind.sobrevivencia_pct + '% • Copa: ' + ind.cobertura_copa_pct + '%' +
+                       '<br/>Alertas: ' + ind.alertas_criticos + ' críticos, ' + ind.alertas_atencao + ' de atenção' : ''));
+        }
+        layer.on('mouseover', function() { this.setStyle({weight:3, fillOpacity:0.6}); });
+        layer.on('mouseout', function() { this.setStyle({weight:1.8, fillOpacity:0.45}); });
+    }
+}).addTo(map);
 
 // Ajustar zoom inicial para as parcelas
-if (parcelasLayer.getBounds && parcelasLayer.getBounds().isValid()) {{
-    map.fitBounds(parcelasLayer.getBounds(), {{padding: [50, 50]}});
-}}
+if (parcelasLayer.getBounds && parcelasLayer.getBounds().isValid()) {
+    map.fitBounds(parcelasLayer.getBounds(), {padding: [50, 50]});
+}
+
+// Projetos grandes: abaixo de zoomParcelas, marcadores dos grupos pré-calculados no lugar dos polígonos
+var gruposParcelas = {{ grupos }};
+if (gruposParcelas) {
+    var gruposLayer = L.layerGroup();
+    var zoomsGrupos = Object.keys(gruposParcelas.zooms).map(Number).sort(function(a, b) { return a - b; });
+    var zoomGrupos = null;
+    var atualizarGrupos = function() {
+        var z = map.getZoom();
+        if (z >= gruposParcelas.zoomParcelas) {
+            zoomGrupos = null;
+            map.removeLayer(gruposLayer);
+            if (!map.hasLayer(parcelasLayer)) parcelasLayer.addTo(map);
+            return;
+        }
+        map.removeLayer(parcelasLayer);
+        var nivel = zoomsGrupos[0];
+        zoomsGrupos.forEach(function(n) { if (n <= z) nivel = n; });
+        if (nivel !== zoomGrupos) {
+            zoomGrupos = nivel;
+            gruposLayer.clearLayers();
+            gruposParcelas.zooms[nivel].forEach(function(v) {
+                var g = {};
+                gruposParcelas.campos.forEach(function(c, i) { g[c] = v[i]; });
+                var cor = g.alertas_criticos > 0 ? '{{ cor_critico }}' : g.alertas_atencao > 0 ? '#fe9929' : '#2b8cbe';
+                L.circleMarker([g.lat, g.lon], {radius: 6 + 3 * Math.log2(g.parcelas), color: cor, weight: 2, fillOpacity: 0.6})
+                    .bindTooltip(String(g.parcelas), {permanent: g.parcelas > 1, direction: 'center', className: 'rotulo-grupo'})
+                    .bindPopup('<b>' + g.parcelas + ' parcela(s)</b>' +
+                        (g.sobrevivencia_pct !== null ? '<br/>Sobrevivência média: ' + g.sobrevivencia_pct + '%' : '') +
+                        (g.cobertura_copa_pct !== null ? '<br/>Copa média: ' + g.cobertura_copa_pct + '%' : '') +
+                        '<br/>Alertas: ' + g.alertas_criticos + ' críticos, ' + g.alertas_atencao + ' de atenção')
+                    .on('dblclick', function(e) { map.setView(e.latlng, Math.min(nivel + 2, gruposParcelas.zoomParcelas)); })
+                    .addTo(gruposLayer);
+            });
+        }
+        gruposLayer.addTo(map);
+    };
+    map.on('zoomend', atualizarGrupos);
+    atualizarGrupos();
+}
 
 // Camada: limite estadual (opcional)
 var estadoLayer = null;
-    if (geojsonEstadual) {{
-    try {{
-        estadoLayer = L.geoJSON(geojsonEstadual, {{
-            style: function(f) {{ return {{color:'#1b7837', weight:3, fillOpacity:0}}; }},
-            onEachFeature: function(feature, layer) {{
+    if (geojsonEstadual) {
+    try {
+        estadoLayer = L.geoJSON(geojsonEstadual, {
+            style: function(f) { return {color:'#1b7837', weight:3, fillOpacity:0}; },
+            onEachFeature: function(feature, layer) {
                 var name = feature.properties && (feature.properties.nome || feature.properties.codarea || feature.properties.name);
                 if (name) layer.bindPopup('<strong>UF:</strong> ' + name);
-            }}
-        }});
-    }} catch(e) {{
+            }
+        });
+    } catch(e) {
         console.warn('Falha ao adicionar limite estadual:', e);
-    }}
+    }
     // adicionar ao mapa por padrão para que fique visível
     estadoLayer && estadoLayer.addTo(map);
-}}
+}
 
-// Camada: limite municipal (Igarassu) - opcional
+// Camada: limite municipal (opcional)
 var municipalLayer = null;
-    if (geojsonMunicipal) {{
-    try {{
-        municipalLayer = L.geoJSON(geojsonMunicipal, {{
-            style: function(f) {{ return {{color:'#984ea3', weight:2, dashArray:'6 6', fillOpacity:0}}; }},
-            onEachFeature: function(feature, layer) {{
+    if (geojsonMunicipal) {
+    try {
+        municipalLayer = L.geoJSON(geojsonMunicipal, {
+            style: function(f) { return {color:'#984ea3', weight:2, dashArray:'6 6', fillOpacity:0}; },
+            onEachFeature: function(feature, layer) {
                 var v = feature.properties && (feature.properties.nome || feature.properties.codarea || feature.properties.name);
                 if (v) layer.bindPopup('<strong>Município:</strong> ' + v);
-            }}
-        }});
-    }} catch(e) {{
+            }
+        });
+    } catch(e) {
         console.warn('Falha ao adicionar limite municipal:', e);
-    }}
+    }
     // adicionar ao mapa por padrão
     municipalLayer && municipalLayer.addTo(map);
-}}
+}
 
 // Camada: todos os municípios de Pernambuco (opcional)
 var municipiosPELayer = null;
-if (geojsonMunicipiosPE) {{
-    try {{
-        municipiosPELayer = L.geoJSON(geojsonMunicipiosPE, {{
-            style: function(f) {{ return {{color:'#ff7f00', weight:1, fillOpacity:0}}; }},
-            onEachFeature: function(feature, layer) {{
+if (geojsonMunicipiosPE) {
+    try {
+        municipiosPELayer = camadaPorZoom(geojsonMunicipiosPE, L.geoJSON(null, {
+            style: function(f) { return {color:'#ff7f00', weight:1, fillOpacity:0}; },
+            onEachFeature: function(feature, layer) {
                 var nm = feature.properties && (feature.properties.nome || feature.properties.NM_MUNICIP || feature.properties.name);
                 if (nm) layer.bindPopup('<strong>Município:</strong> ' + nm);
-            }}
-        }});
-    }} catch(e) {{
+            }
+        }));
+    } catch(e) {
         console.warn('Falha ao adicionar camada municípios PE:', e);
-    }}
-}}
+    }
+}
 
 // Camada: biomas (opcional) - destaca Mata Atlântica quando presente
 var biomasLayer = null;
-if (geojsonBiomas) {{
-    try {{
-        biomasLayer = L.geoJSON(geojsonBiomas, {{
-            style: function(f) {{
+if (geojsonBiomas) {
+    try {
+        biomasLayer = camadaPorZoom(geojsonBiomas, L.geoJSON(null, {
+            style: function(f) {
                 var name = (f.properties && (f.properties.nome || f.properties.NM_BIOMA || f.properties.name)) || '';
-                if (name.toLowerCase().indexOf('mata') !== -1) {{
-                    return {{color:'#2b8cbe', weight:1.5, fillOpacity:0.06}};
-                }}
-                return {{color:'#666', weight:1, fillOpacity:0.02}};
-            }},
-            onEachFeature: function(feature, layer) {{
+                if (name.toLowerCase().indexOf('mata') !== -1) {
+                    return {color:'#2b8cbe', weight:1.5, fillOpacity:0.06};
+                }
+                return {color:'#666', weight:1, fillOpacity:0.02};
+            },
+            onEachFeature: function(feature, layer) {
                 var n = feature.properties && (feature.properties.nome || feature.properties.NM_BIOMA || feature.properties.name);
                 if (n) layer.bindPopup('<strong>Bioma:</strong> ' + n);
-            }}
-        }});
-    }} catch(e) {{
+            }
+        }));
+    } catch(e) {
         console.warn('Falha ao adicionar camada biomas:', e);
-    }}
-}}
+    }
+}
 
 // Controle de camadas — adicione apenas as que existem
-var overlays = {{ 'Parcelas': parcelasLayer }};
+var overlays = { 'Parcelas': parcelasLayer };
 if (estadoLayer) overlays['Limite Estadual'] = estadoLayer;
-if (municipalLayer) overlays['Limite Municipal (Igarassu)'] = municipalLayer;
+if (municipalLayer) overlays['Limite Municipal'] = municipalLayer;
 if (municipiosPELayer) overlays['Municípios (PE)'] = municipiosPELayer;
 if (biomasLayer) overlays['Biomas (Mata Atlântica)'] = biomasLayer;
 
-L.control.layers(null, overlays, {{collapsed:false}}).addTo(map);
+L.control.layers(null, overlays, {collapsed:false}).addTo(map);
 </script>
-</body></html>"""
-    with open(path_out, 'w', encoding='utf-8') as f:
-        f.write(html)
+</body></html>''')
+
+
+def grupos_parcelas(geojson_data, sintese, coordenadas=None):
+    """Grupos de parcelas por zoom (de ZOOM_ESTADO até abaixo de ZOOM_PARCELAS) se o projeto for grande; senão None."""
+    colecao = json.loads(geojson_data) if geojson_data else {}
+    por_parcela = None
+    if sintese:
+        por_parcela = {row['parcela']: {campo: parse_float(str(row[campo])) for campo in CAMPOS_GRUPO[3:]}
+                       for row in sintese}
+    pontos = pontos_parcelas(colecao, por_parcela, coordenadas)
+    if len(pontos) < MIN_PARCELAS_AGRUPAR:
+        return None
+    return {'zoomParcelas': ZOOM_PARCELAS, 'campos': list(CAMPOS_GRUPO),
+            'zooms': agrupar(pontos, por_parcela or {}, ZOOM_ESTADO, ZOOM_PARCELAS - 1)}
+
+
+def _vertices(coords):
+    """Pares (lon, lat) de qualquer nível de aninhamento de `coordinates` (GeoJSON)."""
+    if coords and isinstance(coords[0], (int, float)):
+        yield coords
+        return
+    for c in coords or ():
+        yield from _vertices(c)
+
+
+def limites_projeto(geojson_data, coordenadas=None):
+    """
+    ([[sul, oeste], [norte, leste]] das parcelas, área navegável com MARGEM_MAPA) a partir dos
+    vértices do GeoJSON e das coordenadas do CSV; sem nenhum ponto, o estado (LIMITES_PE).
+    """
+    colecao = json.loads(geojson_data) if geojson_data else {}
+    pontos = [(p[1], p[0]) for f in colecao.get('features') or []
+              for p in _vertices((f.get('geometry') or {}).get('coordinates'))]
+    pontos += [c for c in (coordenadas or {}).values() if c]
+    if not pontos:
+        return LIMITES_PE, LIMITES_PE
+    lats = [p[0] for p in pontos]
+    lons = [p[1] for p in pontos]
+    sul, oeste, norte, leste = min(lats), min(lons), max(lats), max(lons)
+    return ([[sul, oeste], [norte, leste]],
+            [[round(sul - MARGEM_MAPA, 6), round(oeste - MARGEM_MAPA, 6)],
+             [round(norte + MARGEM_MAPA, 6), round(leste + MARGEM_MAPA, 6)]])
+
+
+def nome_projeto(input_file):
+    """Nome de exibição do projeto: a pasta do CSV, com '_' como espaço (ex.: 'Simulado PE')."""
+    return os.path.basename(os.path.dirname(os.path.abspath(input_file))).replace('_', ' ')
+
+
+def write_mapa(path_out, geojson_path, camadas=None, topojson=False, externas=False, tiles=False, sintese=None,
+               coordenadas=None, projeto='', biomas=()):
+    # Mapa com polígonos GeoJSON carregados; `sintese` (linhas de exportar_sintese_csv) colore as parcelas
+    # e `coordenadas` ({parcela: (lat, lon)}) localiza as parcelas sem polígono nos grupos e no enquadramento.
+    # `projeto` e `biomas` (do CSV) preenchem o título e o painel de informações
+    leaflet_css = "https://unpkg.com/leaflet@1.9.4/dist/leaflet.css"
+    leaflet_js = "https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"
+    
+    # Carregar GeoJSON principal (parcelas) se existir
+    geojson_data = "{}"
+    if geojson_path and os.path.exists(geojson_path):
+        with open(geojson_path, 'r', encoding='utf-8') as f:
+            geojson_data = f.read()
+    indicadores = indicadores_parcelas(geojson_data, sintese)
+    grupos = grupos_parcelas(geojson_data, sintese, coordenadas)
+    limites_parcelas, limites = limites_projeto(geojson_data, coordenadas)
+    limites_tiles, limites_visao = limites, None
+    zoom_min = ZOOM_MIN_MAPA
+    if grupos:
+        # com grupos (marcadores leves em qualquer zoom), o mapa se afasta até o estado inteiro
+        limites = [[min(limites[0][0], LIMITES_PE[0][0]), min(limites[0][1], LIMITES_PE[0][1])],
+                   [max(limites[1][0], LIMITES_PE[1][0]), max(limites[1][1], LIMITES_PE[1][1])]]
+        zoom_min = ZOOM_ESTADO
+        # tiles do estado inteiro só nos zooms de visão geral (em z15 seriam centenas de milhares)
+        limites_visao = limites
+    n_parcelas = len(sintese) if sintese else len(json.loads(geojson_data).get('features') or [])
+    legenda_estagios = ''.join(
+        f"\n    <div class='legend-item'><span class='swatch' style='background:{cor};'></span>Estágio {nome}</div>"
+        for nome, cor in indicadores['estagios']) if indicadores else ''
+
+    # Limites opcionais (estadual, municipal, municípios de PE, biomas) na mesma pasta do GeoJSON,
+    # a menos que já tenham sido carregados (modo lote)
+    if camadas is None:
+        geo_dir = os.path.dirname(geojson_path) if geojson_path else os.path.dirname(DEFAULT_GEOJSON)
+        camadas = carregar_camadas(geo_dir, zoom_min=zoom_min)
+    elif zoom_min > ZOOM_ESTADO:
+        camadas = recortar_camadas(camadas, zoom_min)
+    if tiles:
+        # as camadas em tiles dispensam TopoJSON/camadas externas
+        geojson_data, camadas = gerar_camadas_tiles(os.path.dirname(path_out), geojson_data, camadas, limites_tiles,
+                                                    limites_visao)
+        topojson = False
+    elif externas:
+        camadas = gravar_camadas_externas(os.path.dirname(path_out), camadas)
+    geojson_estadual = camadas.get('estadual')
+    geojson_municipal = camadas.get('municipal')
+    geojson_municipios_pe = camadas.get('municipios_pe')
+    geojson_biomas = camadas.get('biomas')
+    if topojson:
+        dados_camadas = _dados_topojson(geojson_data, camadas)
+    else:
+        dados_camadas = f"""var geojsonData = {geojson_data};
+var geojsonEstadual = {geojson_estadual if geojson_estadual is not None else 'null'};
+var geojsonMunicipal = {geojson_municipal if geojson_municipal is not None else 'null'};
+// camadas simplificadas: uma versão por nível de zoom {{zoom: FeatureCollection}}
+var geojsonMunicipiosPE = {geojson_municipios_pe if geojson_municipios_pe is not None else 'null'};
+var geojsonBiomas = {geojson_biomas if geojson_biomas is not None else 'null'};"""
+    
+    html = MODELO_MAPA.renderizar(
+        leaflet_css=leaflet_css, leaflet_js=leaflet_js, legenda_estagios=legenda_estagios,
+        titulo=f"PRAD {projeto} – {', '.join(biomas)}" if biomas else f'PRAD {projeto}',
+        projeto=projeto, biomas=', '.join(biomas) or 'não informado', n_parcelas=n_parcelas,
+        zoom_min=zoom_min, zoom_max=ZOOM_MAX_MAPA, zoom_inicial=ZOOM_INICIAL_MAPA,
+        limites=json.dumps(limites), limites_parcelas=json.dumps(limites_parcelas),
+        dados_camadas=dados_camadas, cor_critico=COLOR_ALERTA_CRITICO,
+        indicadores=json.dumps(indicadores, ensure_ascii=False, separators=(',', ':')) if indicadores else 'null',
+        grupos=json.dumps(grupos, separators=(',', ':')) if grupos else 'null')
+    gravar_se_mudou(path_out, html.encode('utf-8'))
+
+
+def garantir_camadas_ibge(espelho=None):
+    """Garante os limites oficiais adicionais (municípios PE / biomas) — baixa ou revalida se necessário."""
+    cache = CacheIBGE(espelho=espelho)
+    # Tentar baixar malha dos municípios de PE via endpoint direto; se falhar, agregar via lista de municípios
+    ok_mun = download_geojson_if_missing('api/v3/malhas/estados/26/municipios?formato=application/vnd.geo+json', DEFAULT_MUNICIPIOS, cache)
+    if not ok_mun:
+        download_all_municipios_pe(DEFAULT_MUNICIPIOS, cache)
+
+    # Biomas: a tentativa direta pode falhar — tentar baixar por lista/IDs
+    ok_biomas = download_geojson_if_missing('api/v3/malhas/biomas?formato=application/vnd.geo+json', DEFAULT_BIOMAS, cache)
+    if not ok_biomas:
+        download_all_biomas(DEFAULT_BIOMAS, cache)
+
+
+def biomas_projeto(grupos):
+    """Biomas (coluna `bioma` do CSV) presentes no projeto, em ordem alfabética."""
+    return sorted(set().union(*(acc.biomas for acc in grupos[CHAVE_PARCELA_DATA].values())))
+
+
+def coordenadas_mapa(input_file, geojson_file, n_parcelas):
+    """
+    Coordenadas do CSV por parcela quando o mapa precisa delas: agrupamento de projetos
+    grandes ou enquadramento de projetos sem GeoJSON de parcelas. None nos demais casos.
+    """
+    sem_poligonos = not (geojson_file and os.path.exists(geojson_file))
+    if (n_parcelas >= MIN_PARCELAS_AGRUPAR or sem_poligonos) and os.path.exists(input_file):
+        return coordenadas_parcelas(input_file)
+    return None
+
+
+def agregar_entrada(input_file, opcoes, validacao=None):
+    """Agrupamentos (parcela, data) e (espécie, data) de `input_file` conforme as opções da linha de comando."""
+    chaves = (CHAVE_PARCELA_DATA, CHAVE_ESPECIE_DATA)
+    validacao = RelatorioValidacao() if validacao is None else validacao
+    if opcoes.get('db') is not None:
+        from base_monitoramento import agregar_sql, conectar, validacao_importada
+        with closing(conectar(opcoes['db'])) as con:
+            grupos = agregar_sql(con, chaves, input_file)
+            validacao_importada(con, input_file, validacao)
+    elif opcoes.get('colunar'):
+        from colunar import agregar_colunar
+        grupos = agregar_colunar(input_file, chaves, validacao)
+    elif opcoes.get('incremental'):
+        # Reaproveita os grupos (parcela/espécie, data) inalterados desde a última execução
+        from cache_agregados import DEFAULT_CACHE as DEFAULT_CACHE_AGREGADOS, CacheAgregados
+        with CacheAgregados(opcoes.get('cache_incremental', DEFAULT_CACHE_AGREGADOS)) as cache:
+            grupos = cache.agregar(input_file, chaves, validacao=validacao)
+            print(f'Cache incremental: {cache.reaproveitados} grupos reaproveitados, {cache.recalculados} recalculados')
+    elif opcoes.get('workers', 1) > 1:
+        grupos = agregar_paralelo(input_file, chaves, opcoes['workers'], validacao=validacao)
+    else:
+        # Uma única passagem pelo CSV alimenta os agrupamentos por parcela e por espécie
+        grupos = agregar(read_rows(input_file, validacao), chaves)
+    if validacao.total:
+        print('Aviso (validação): ' + validacao.resumo())
+    return grupos
+
+
+def localizar_parcelas(path_out, input_file, geojson_file, grupos, validacao=None):
+    """
+    Grava `path_out` (CAMPOS_LOCALIZACAO) com o município e o bioma do IBGE de cada parcela, pelas
+    coordenadas do CSV e pelas camadas do projeto (ou compartilhadas); parcelas cujo bioma no CSV
+    diverge do IBGE vão para `validacao`. Devolve as linhas gravadas.
+    """
+    arquivos = arquivos_camadas(geojson_file)
+    localizador = Localizador(arquivos['municipios_pe'], arquivos['biomas'])
+    coordenadas = coordenadas_parcelas(input_file) if os.path.exists(input_file) else {}
+    linhas = conferir_parcelas(coordenadas, biomas_parcelas(grupos), localizador, validacao)
+    buf = io.StringIO(newline='')
+    writer = csv.writer(buf)
+    writer.writerow(CAMPOS_LOCALIZACAO)
+    writer.writerows(linhas)
+    gravar_se_mudou(path_out, buf.getvalue().encode('utf-8'))
+    return linhas
+
+
+def arquivos_camadas(geojson_file):
+    """Arquivo de cada camada de limites usada no mapa: na pasta do GeoJSON ou, se ausente, na compartilhada."""
+    geo_dir = os.path.dirname(geojson_file) if geojson_file else os.path.dirname(DEFAULT_GEOJSON)
+    base_dir = DIR_GEO_COMPARTILHADO
+    arquivos = {}
+    for nome, arquivo in CAMADAS_MAPA.items():
+        path = os.path.join(geo_dir, arquivo)
+        arquivos[nome] = path if os.path.exists(path) else os.path.join(base_dir, arquivo)
+    return arquivos
+
+
+def montar_grafo(input_file, out_dir, geojson_file, opcoes, publicar=False, catalogo=None, camadas=None):
+    """
+    Etapas do build de um projeto (scripts/grafo.py): catálogo e agregação, download dos
+    limites, relatório, síntese, localização das parcelas (município e bioma do IBGE), mapa e,
+    com `publicar`, a cópia para docs/. Os downloads
+    correm em paralelo com a agregação e o relatório; etapas atualizadas são puladas.
+    No lote, `catalogo` e `camadas` chegam já carregados e os limites já foram garantidos.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    projeto = opcoes.get('projeto') or nome_projeto(input_file)
+    relatorio_path = os.path.join(out_dir, 'relatorio.html')
+    mapa_path = os.path.join(out_dir, 'mapa.html')
+    sintese_path = os.path.join(out_dir, 'sintese_ultima_campanha.csv')
+    localizacao_path = os.path.join(out_dir, 'localizacao_parcelas.csv')
+    csv_entradas = [input_file] + ([opcoes['db']] if opcoes.get('db') is not None else [])
+    camadas_geo = arquivos_camadas(geojson_file)
+    grafo = Grafo(os.path.join(out_dir, ESTADO_ETAPAS), ETAPAS_SIMULTANEAS)
+
+    def carregar(ctx):
+        ctx['catalogo'] = catalogo if catalogo is not None else carregar_catalogo_especies()
+
+    def limites(ctx):
+        # no lote as camadas compartilhadas são garantidas uma vez, antes dos projetos
+        if camadas is None:
+            garantir_camadas_ibge(opcoes.get('espelho'))
+
+    def agregar_dados(ctx):
+        ctx['validacao'] = RelatorioValidacao()
+        grupos = agregar_entrada(input_file, opcoes, ctx['validacao'])
+        if not grupos[CHAVE_PARCELA_DATA]:
+            raise ValueError(f"nenhum registro de {input_file} na base {opcoes.get('db')}; "
+                             f"importe com: python scripts/base_monitoramento.py import {input_file}")
+        series, datas = group_metrics(grupos[CHAVE_PARCELA_DATA])
+        ultima_data = max(datas) if datas else ''
+        avaliacao = avaliar(series)
+        ctx.update(grupos=grupos, series=series, datas=datas, ultima_data=ultima_data, avaliacao=avaliacao,
+                   series_sp=group_by_species(grupos[CHAVE_ESPECIE_DATA])[0],
+                   classificacao=classificar_estagio_sucessional(series, ultima_data, avaliacao),
+                   alertas=gerar_alertas(series, ultima_data, avaliacao))
+
+    def relatorio(ctx):
+        write_relatorio(relatorio_path, ctx['series'], ctx['datas'], ctx['series_sp'], ctx['grupos'], ctx['catalogo'],
+                        max_series=opcoes.get('max_series', MAX_SERIES_LINHAS), canvas=opcoes.get('canvas', False),
+                        avaliacao=ctx['avaliacao'], projeto=projeto)
+
+    def sintese(ctx):
+        ctx['sintese'] = exportar_sintese_csv(ctx['series'], ctx['classificacao'], ctx['alertas'],
+                                              ctx['ultima_data'], sintese_path)
+
+    def localizar(ctx):
+        # conferência da coluna `bioma` com as camadas do IBGE, parcela a parcela
+        localizar_parcelas(localizacao_path, input_file, geojson_file, ctx['grupos'], ctx['validacao'])
+        if ctx['validacao'].divergencias:
+            print('Aviso (validação): ' + ctx['validacao'].resumo_divergencias())
+
+    def mapa(ctx):
+        write_mapa(mapa_path, geojson_file, camadas, opcoes.get('topojson', False), opcoes.get('externas', False),
+                   opcoes.get('tiles', False), ctx['sintese'], coordenadas_mapa(input_file, geojson_file, len(ctx['series'])),
+                   projeto, biomas_projeto(ctx['grupos']))
+
+    grafo.adicionar(Etapa('carregar', carregar, entradas=[DEFAULT_ESPECIES]))
+    grafo.adicionar(Etapa('agregar', agregar_dados, entradas=csv_entradas))
+    # o cache do IBGE decide o que revalidar; a etapa sempre roda (barata quando o cache está em dia)
+    grafo.adicionar(Etapa('limites', limites, sempre=True))
+    grafo.adicionar(Etapa('relatorio', relatorio, entradas=csv_entradas + [DEFAULT_ESPECIES],
+                          saidas=[relatorio_path], usa=['agregar', 'carregar'],
+                          parametros={'max_series': opcoes.get('max_series', MAX_SERIES_LINHAS),
+                                      'canvas': bool(opcoes.get('canvas')), 'projeto': projeto}))
+    grafo.adicionar(Etapa('sintese', sintese, entradas=csv_entradas, saidas=[sintese_path], usa=['agregar']))
+    grafo.adicionar(Etapa('localizar', localizar,
+                          entradas=csv_entradas + [camadas_geo['municipios_pe'], camadas_geo['biomas']],
+                          saidas=[localizacao_path], usa=['agregar'], depende=['limites']))
+    grafo.adicionar(Etapa('mapa', mapa, entradas=csv_entradas + [geojson_file] + list(camadas_geo.values()),
+                          saidas=[mapa_path], usa=['agregar', 'sintese'], depende=['limites'],
+                          parametros=dict({k: bool(opcoes.get(k)) for k in ('topojson', 'externas', 'tiles')},
+                                          projeto=projeto)))
+    if publicar:
+        from publish_docs import publicar as publicar_docs
+        # a cópia compara conteúdo arquivo a arquivo, então roda sempre
+        grafo.adicionar(Etapa('publicar', lambda ctx: publicar_docs(), depende=['relatorio', 'mapa', 'sintese'],
+                              sempre=True))
+    return grafo
+
+
+def descobrir_projetos(raiz=DEFAULT_PORTFOLIO):
+    """(nome, csv, pasta visuais, parcelas.geojson) para cada `raiz/*/monitoramento_*.csv`."""
+    projetos = []
+    for csv_path in sorted(glob.glob(os.path.join(raiz, '*', 'monitoramento_*.csv'))):
+        pasta = os.path.dirname(csv_path)
+        projetos.append((os.path.basename(pasta), csv_path,
+                         os.path.join(pasta, 'visuais'), os.path.join(pasta, 'geo', 'parcelas.geojson')))
+    return projetos
+
+
+# Caches incrementais do modo lote (um SQLite por projeto)
+DIR_CACHE_LOTE = os.path.join('saidas', 'cache_agregados')
+
+# Entradas compartilhadas do modo lote (carregadas uma vez por processo)
+_COMPARTILHADO = {}
+
+
+def _iniciar_lote(compartilhado):
+    _COMPARTILHADO.update(compartilhado)
+
+
+def _gerar_projeto_lote(projeto, opcoes):
+    """Roda o grafo de etapas de um projeto do lote; devolve (nome, situação, tempos) de grafo.executar."""
+    nome, csv_path, out_dir, geojson_file = projeto
+    camadas = carregar_camadas(os.path.dirname(geojson_file), _COMPARTILHADO.get('camadas'))
+    # cada projeto tem seu próprio SQLite incremental: processos do lote não disputam o mesmo arquivo
+    opcoes = dict(opcoes, projeto=nome.replace('_', ' '),
+                  cache_incremental=os.path.join(DIR_CACHE_LOTE, re.sub(r'[^\w.-]+', '_', nome) + '.sqlite'))
+    grafo = montar_grafo(csv_path, out_dir, geojson_file, opcoes, catalogo=_COMPARTILHADO.get('catalogo'),
+                         camadas=camadas)
+    situacao = grafo.executar(forcar=opcoes.get('forcar', False))
+    return nome, situacao, grafo.tempos
+
+
+def gerar_lote(raiz, opcoes, workers, publicar=False):
+    """
+    Gera os visuais de todos os projetos de `raiz` em paralelo e imprime os tempos por projeto.
+    Com `publicar`, copia os produtos para docs/ uma única vez ao final, se nenhum projeto falhou.
+    """
+    projetos = descobrir_projetos(raiz)
+    if not projetos:
+        print(f'Nenhum projeto encontrado em {raiz}/*/monitoramento_*.csv')
+        return 2
+    garantir_camadas_ibge(opcoes.get('espelho'))
+    compartilhado = {
+        'catalogo': carregar_catalogo_especies(),
+        'camadas': carregar_camadas(DIR_GEO_COMPARTILHADO),
+    }
+    # no lote o paralelismo é entre projetos; cada projeto agrega sequencialmente
+    opcoes = dict(opcoes, workers=1)
+    t0 = time.perf_counter()
+    resultados = []
+    if workers > 1 and len(projetos) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_lote, initargs=(compartilhado,)) as pool:
+            resultados = list(pool.map(_gerar_projeto_lote, projetos, [opcoes] * len(projetos)))
+    else:
+        _iniciar_lote(compartilhado)
+        resultados = [_gerar_projeto_lote(p, opcoes) for p in projetos]
+
+    etapas = ('agregar', 'relatorio', 'sintese', 'localizar', 'mapa')
+    print('\nTempos por projeto (s):')
+    print('  ' + 'projeto'.ljust(24) + ''.join(e.rjust(11) for e in etapas) + 'total'.rjust(9))
+    falhas = 0
+    for nome, situacao, tempos in resultados:
+        tempos = {e: t for e, t in tempos.items() if e in etapas}
+        if any(s not in ('executada', 'atualizada') for s in situacao.values()):
+            falhas += 1
+            print('  ' + nome.ljust(24) + '  falhou: ' + ', '.join(e for e, s in situacao.items() if s == 'falhou'))
+            continue
+        if not tempos:
+            print('  ' + nome.ljust(24) + '  inalterado')
+            continue
+        print('  ' + nome.ljust(24) + ''.join(f'{tempos[e]:11.2f}' if e in tempos else '-'.rjust(11) for e in etapas)
+              + f'{sum(tempos.values()):9.2f}')
+    print(f'  {len(projetos)} projetos em {time.perf_counter() - t0:.2f}s')
+    if falhas:
+        if publicar:
+            print('Publicação cancelada: há projetos com falha.')
+        return 2
+    if publicar:
+        from publish_docs import publicar as publicar_docs
+        publicar_docs()
+    return 0
 
 
 def main(argv):
     input_file = DEFAULT_INPUT
     out_dir = DEFAULT_OUT
     geojson_file = DEFAULT_GEOJSON
+    lote = None
+    publicar = False
+    workers = 1
+    opcoes = {}
     for i,a in enumerate(argv):
         if a in ('-i','--input') and i+1 < len(argv):
             input_file = argv[i+1]
@@ -1207,46 +2145,48 @@ def main(argv):
             out_dir = argv[i+1]
         if a in ('-g','--geojson') and i+1 < len(argv):
             geojson_file = argv[i+1]
-    if not os.path.exists(input_file):
+        if a == '--colunar':
+            opcoes['colunar'] = True
+        if a in ('-w','--workers') and i+1 < len(argv):
+            workers = int(argv[i+1])
+        if a == '--incremental':
+            opcoes['incremental'] = True
+        if a == '--db' and i+1 < len(argv):
+            opcoes['db'] = argv[i+1]
+        if a == '--espelho' and i+1 < len(argv):
+            opcoes['espelho'] = argv[i+1]
+        if a == '--topojson':
+            opcoes['topojson'] = True
+        if a == '--camadas-externas':
+            opcoes['externas'] = True
+        if a == '--tiles':
+            opcoes['tiles'] = True
+        if a == '--forcar':
+            opcoes['forcar'] = True
+        if a == '--graficos-canvas':
+            opcoes['canvas'] = True
+        if a == '--max-series' and i+1 < len(argv):
+            opcoes['max_series'] = int(argv[i+1])
+        if a == '--projeto' and i+1 < len(argv):
+            opcoes['projeto'] = argv[i+1]
+        if a == '--publicar':
+            publicar = True
+        if a == '--lote':
+            lote = argv[i+1] if i+1 < len(argv) and not argv[i+1].startswith('-') else DEFAULT_PORTFOLIO
+    if lote is not None:
+        return gerar_lote(lote, opcoes, workers, publicar)
+
+    opcoes['workers'] = workers
+    if workers > 1 and (opcoes.get('incremental') or opcoes.get('colunar') or opcoes.get('db') is not None):
+        print('Aviso: --workers é ignorado com --incremental, --colunar ou --db.')
+    if opcoes.get('db') is None and not os.path.exists(input_file):
         print(f"Arquivo de entrada não encontrado: {input_file}")
         return 2
-    os.makedirs(out_dir, exist_ok=True)
-
-    rows = list(read_rows(input_file))
-    series, datas = group_metrics(rows)
-    series_sp, _ = group_by_species(rows)
-    
-    # Calcular última data
-    ultima_data = max(datas) if datas else ''
-    
-    # Calcular classificação e alertas para síntese
-    classificacao = classificar_estagio_sucessional(series, ultima_data)
-    alertas = gerar_alertas(series, ultima_data)
-    
-    # Gerar arquivos
-    relatorio_path = os.path.join(out_dir, 'relatorio.html')
-    mapa_path = os.path.join(out_dir, 'mapa.html')
-    sintese_path = os.path.join(out_dir, 'sintese_ultima_campanha.csv')
-    
-    write_relatorio(relatorio_path, series, datas, series_sp, rows)
-    # Garantir que temos os limites oficiais adicionais (municipios PE / biomas) — baixar se necessário
-    # Tentar baixar malha dos municípios de PE via endpoint direto; se falhar, agregar via lista de municípios
-    ok_mun = download_geojson_if_missing('https://servicodados.ibge.gov.br/api/v3/malhas/estados/26/municipios?formato=application/vnd.geo+json', DEFAULT_MUNICIPIOS)
-    if not ok_mun:
-        download_all_municipios_pe(DEFAULT_MUNICIPIOS)
-
-    # Biomas: a tentativa direta pode falhar — tentar baixar por lista/IDs
-    ok_biomas = download_geojson_if_missing('https://servicodados.ibge.gov.br/api/v3/malhas/biomas?formato=application/vnd.geo+json', DEFAULT_BIOMAS)
-    if not ok_biomas:
-        download_all_biomas(DEFAULT_BIOMAS)
-
-    write_mapa(mapa_path, geojson_file)
-    exportar_sintese_csv(series, classificacao, alertas, ultima_data, sintese_path)
-
-    print('Arquivos gerados:')
-    print(' -', relatorio_path)
-    print(' -', mapa_path)
-    return 0
+    grafo = montar_grafo(input_file, out_dir, geojson_file, opcoes, publicar)
+    situacao = grafo.executar(forcar=opcoes.get('forcar', False))
+    print('Etapas:')
+    print(grafo.resumo())
+    return 0 if all(s in ('executada', 'atualizada') for s in situacao.values()) else 2
 
 if __name__ == '__main__':
     sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Executor de etapas de build em grafo de dependências.
+
+Cada `Etapa` declara:
+- `depende`: etapas que precisam terminar antes (ordem);
+- `usa`: dessas, as que entregam dados em memória (`contexto`) — se foram puladas
+  por estarem atualizadas e esta etapa precisar rodar, elas rodam sob demanda;
+- `entradas` / `saidas`: arquivos; a etapa é pulada quando os hashes das entradas,
+  das saídas, os `parametros` e a versão dos scripts são os mesmos da última execução
+  registrada (estado em JSON). Etapas `sempre=True` (ex.: revalidar downloads) nunca são puladas.
+
+Etapas sem dependência pendente rodam ao mesmo tempo em um pool de threads — o
+ganho vem de sobrepor E/S (rede, disco) ao processamento.
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from manifesto import gravar_se_mudou, hash_arquivo, versao_scripts
+
+
+class Etapa:
+    def __init__(self, nome, funcao, entradas=(), saidas=(), depende=(), usa=(), parametros=None, sempre=False):
+        self.nome = nome
+        self.funcao = funcao  # funcao(contexto)
+        self.entradas = list(entradas)
+        self.saidas = list(saidas)
+        self.usa = list(usa)
+        self.depende = list(dict.fromkeys(list(depende) + self.usa))
+        self.parametros = parametros or {}
+        self.sempre = sempre
+
+
+class Grafo:
+    """Conjunto de etapas; `executar` roda o que está desatualizado, em paralelo quando possível."""
+
+    def __init__(self, path_estado, workers=4):
+        self.path_estado = path_estado
+        self.workers = workers
+        self.etapas = {}
+        self.contexto = {}
+        self.situacao = {}  # nome -> 'executada' | 'atualizada' | 'falhou' | 'cancelada'
+        self.tempos = {}
+        self._travas = {}
+        self._trava_estado = threading.Lock()
+        try:
+            with open(path_estado, 'r', encoding='utf-8') as f:
+                self.estado = json.load(f)
+        except (OSError, ValueError):
+            self.estado = {}
+
+    def adicionar(self, etapa):
+        if etapa.nome in self.etapas:
+            raise ValueError(f'Etapa repetida: {etapa.nome}')
+        self.etapas[etapa.nome] = etapa
+        self._travas[etapa.nome] = threading.Lock()
+        return etapa
+
+    def _ordem(self):
+        """Ordem topológica (Kahn); levanta ValueError em dependência ausente ou ciclo."""
+        faltando = {d for e in self.etapas.values() for d in e.depende if d not in self.etapas}
+        if faltando:
+            raise ValueError(f'Dependências inexistentes: {sorted(faltando)}')
+        grau = {n: len(e.depende) for n, e in self.etapas.items()}
+        prontas = [n for n, g in grau.items() if g == 0]
+        ordem = []
+        while prontas:
+            n = prontas.pop()
+            ordem.append(n)
+            for m, e in self.etapas.items():
+                if n in e.depende:
+                    grau[m] -= 1
+                    if grau[m] == 0:
+                        prontas.append(m)
+        if len(ordem) != len(self.etapas):
+            raise ValueError('Ciclo entre as etapas: ' + ', '.join(sorted(set(self.etapas) - set(ordem))))
+        return ordem
+
+    def _assinatura(self, etapa):
+        return {'versao': versao_scripts(), 'parametros': etapa.parametros,
+                'entradas': {p: hash_arquivo(p) for p in etapa.entradas},
+                'saidas': {p: hash_arquivo(p) for p in etapa.saidas}}
+
+    def atualizada(self, etapa):
+        if etapa.sempre:
+            return False
+        atual = self._assinatura(etapa)
+        if any(h is None for h in atual['saidas'].values()):
+            return False
+        return self.estado.get(etapa.nome) == atual
+
+    def _rodar(self, nome, forcar):
+        """Executa `nome` (e, antes, as etapas de `usa` que foram puladas). Uma vez por etapa."""
+        etapa = self.etapas[nome]
+        with self._travas[nome]:
+            if self.situacao.get(nome) == 'executada':
+                return
+            for dep in etapa.usa:
+                self._rodar(dep, forcar=True)
+            t0 = time.perf_counter()
+            etapa.funcao(self.contexto)
+            self.tempos[nome] = time.perf_counter() - t0
+            with self._trava_estado:
+                self.estado[nome] = self._assinatura(etapa)
+                self.situacao[nome] = 'executada'
+
+    def _processar(self, nome, forcar):
+        etapa = self.etapas[nome]
+        if not forcar and self.atualizada(etapa):
+            with self._trava_estado:
+                self.situacao.setdefault(nome, 'atualizada')
+            return
+        self._rodar(nome, forcar)
+
+    def executar(self, forcar=False):
+        """Roda o grafo; devolve {etapa: situação}. Falhas cancelam só as etapas que dependem delas."""
+        self._ordem()
+        restantes = {n: set(e.depende) for n, e in self.etapas.items()}
+        erros = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            em_curso = {}
+            while restantes or em_curso:
+                for n in [n for n, deps in restantes.items() if not deps]:
+                    del restantes[n]
+                    em_curso[pool.submit(self._processar, n, forcar)] = n
+                if not em_curso:
+                    break
+                feitos, _ = wait(em_curso, return_when=FIRST_COMPLETED)
+                for futuro in feitos:
+                    n = em_curso.pop(futuro)
+                    if futuro.exception() is not None:
+                        erros[n] = futuro.exception()
+                        self.situacao[n] = 'falhou'
+                        self._cancelar(n, restantes)
+                        continue
+                    for deps in restantes.values():
+                        deps.discard(n)
+        self._salvar()
+        for n, e in erros.items():
+            print(f'Etapa {n} falhou: {e!r}')
+        return dict(self.situacao)
+
+    def _cancelar(self, nome, restantes):
+        for n in [n for n, e in self.etapas.items() if nome in e.depende]:
+            if n not in restantes:
+                continue
+            del restantes[n]
+            self.situacao[n] = 'cancelada'
+            self._cancelar(n, restantes)
+
+    def _salvar(self):
+        dados = json.dumps(self.estado, indent=1, sort_keys=True, ensure_ascii=False)
+        gravar_se_mudou(self.path_estado, dados.encode('utf-8'))
+
+    def resumo(self):
+        linhas = []
+        for n in self.etapas:
+            s = self.situacao.get(n, '-')
+            linhas.append(f'  {n.ljust(12)} {s.ljust(11)}' + (f'{self.tempos[n]:8.2f}s' if n in self.tempos else ''))
+        return '\n'.join(linhas)
@@ -14,15 +14,19 @@ Saídas:
 Uso:
   python scripts/indicadores_prad.py --input planilhas/monitoramento_exemplo.csv
   (ou apenas executar sem argumentos para usar o arquivo de exemplo)
+  python scripts/indicadores_prad.py --input ... --colunar   (backend NumPy opcional, para arquivos grandes)
+  python scripts/indicadores_prad.py --input ... --workers 8  (agrega shards do CSV em 8 processos)
+  python scripts/indicadores_prad.py --input ... --incremental (reaproveita saidas/cache_agregados.sqlite)
+  python scripts/indicadores_prad.py --input ... --db saidas/monitoramento.sqlite (agregados via SQL na base importada)
 
-Sem dependências externas (usa apenas biblioteca padrão).
+Sem dependências externas (usa apenas biblioteca padrão); `--colunar` requer NumPy.
 """
 import csv
 import os
 import sys
-from collections import defaultdict
-from statistics import mean
-from datetime import datetime
+
+from agregacao import CHAVE_PARCELA_DATA, RelatorioValidacao, agregar, agregar_paralelo, ler_registros
+from regras import METAS
 
 DEFAULT_INPUT = os.path.join('planilhas', 'monitoramento_exemplo.csv')
 OUTPUT_DIR = 'saidas'
@@ -34,69 +38,40 @@ REQUIRED_COLUMNS = [
     'cobertura_invasoras_pct','observacoes','foto'
 ]
 
-def parse_float(x, default=None):
-    try:
-        if x is None or x == '':
-            return default
-        return float(x)
-    except Exception:
-        return default
-
-
-def parse_int(x, default=None):
-    try:
-        if x is None or x == '':
-            return default
-        return int(float(x))
-    except Exception:
-        return default
-
-
-def read_rows(path):
-    with open(path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        cols = [c.strip() for c in reader.fieldnames or []]
-        missing = [c for c in REQUIRED_COLUMNS if c not in cols]
-        if missing:
-            raise ValueError(f'Colunas faltantes no CSV: {missing}')
-        for row in reader:
-            yield {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items()}
+def read_rows(path, validacao=None):
+    """Registros tipados (`agregacao.Registro`), convertidos uma única vez por linha."""
+    return ler_registros(path, REQUIRED_COLUMNS, validacao)
 
 
 def compute_indicators(rows):
-    # Agrupar por (parcela, data)
-    groups = defaultdict(list)
-    for r in rows:
-        key = (r['parcela'], r['data'])
-        groups[key].append(r)
+    # Agregar por (parcela, data) em uma única passagem sobre `rows`
+    grupos = agregar(rows, (CHAVE_PARCELA_DATA,))[CHAVE_PARCELA_DATA]
+    return summarize_groups(grupos)
+
 
+def summarize_groups(grupos):
+    """
+    Linhas de `indicadores_resumo.csv` a partir dos grupos (parcela, data): `AcumuladorGrupo`
+    ou `colunar.IndicadoresGrupo`.
+    """
     summaries = []
-    for (parcela, data), itens in groups.items():
-        plantadas_vivas = [parse_int(r['plantadas_vivas'], 0) for r in itens]
-        plantadas_totais = [parse_int(r['plantadas_totais'], 0) for r in itens]
-        alturas = [parse_float(r['altura_m']) for r in itens if parse_float(r['altura_m']) is not None]
-        diametros = [parse_float(r['diametro_cm']) for r in itens if parse_float(r['diametro_cm']) is not None]
-        cobertura_copa = [parse_float(r['cobertura_copa_pct']) for r in itens if parse_float(r['cobertura_copa_pct']) is not None]
-        cobertura_invas = [parse_float(r['cobertura_invasoras_pct']) for r in itens if parse_float(r['cobertura_invasoras_pct']) is not None]
-        especies = set([r['especie'] for r in itens if r['especie']])
-        biomas = set([r['bioma'] for r in itens if r['bioma']])
-
-        total_vivas = sum(plantadas_vivas)
-        total_plantadas = sum(plantadas_totais)
-        taxa_sobrevivencia = (total_vivas / total_plantadas * 100.0) if total_plantadas > 0 else None
-        altura_media = mean(alturas) if alturas else None
-        diametro_medio = mean(diametros) if diametros else None
-        cobertura_copa_media = mean(cobertura_copa) if cobertura_copa else None
-        cobertura_invas_media = mean(cobertura_invas) if cobertura_invas else None
-        riqueza = len(especies)
-        bioma = ';'.join(sorted(biomas)) if biomas else ''
-
-        # Classificar status em relação a metas simples
+    for (parcela, data), g in grupos.items():
+        total_vivas = g.vivas
+        total_plantadas = g.totais
+        taxa_sobrevivencia = g.sobrevivencia
+        altura_media = g.altura_media
+        diametro_medio = g.diametro_medio
+        cobertura_copa_media = g.copa_media
+        cobertura_invas_media = g.invasoras_media
+        riqueza = g.riqueza
+        bioma = ';'.join(sorted(g.biomas)) if g.biomas else ''
+
+        # Classificar status em relação às metas do PRAD (regras.METAS)
         status = []
         if taxa_sobrevivencia is not None:
-            status.append('OK_sobrevivencia' if taxa_sobrevivencia >= 80 else 'ATENCAO_sobrevivencia')
+            status.append('OK_sobrevivencia' if taxa_sobrevivencia >= METAS['sobrevivencia_meta'] else 'ATENCAO_sobrevivencia')
         if cobertura_invas_media is not None:
-            status.append('OK_invasoras' if cobertura_invas_media <= 20 else 'ATENCAO_invasoras')
+            status.append('OK_invasoras' if cobertura_invas_media <= METAS['invasoras_meta'] else 'ATENCAO_invasoras')
 
         summaries.append({
             'parcela': parcela,
@@ -129,17 +104,58 @@ def write_csv(path, rows):
 
 def main(argv):
     input_file = None
+    colunar = False
+    workers = 1
+    incremental = False
+    db = None
     for i, a in enumerate(argv):
         if a in ('-i', '--input') and i+1 < len(argv):
             input_file = argv[i+1]
+        if a in ('-w', '--workers') and i+1 < len(argv):
+            workers = int(argv[i+1])
+        if a == '--incremental':
+            incremental = True
+        if a == '--db' and i+1 < len(argv):
+            db = argv[i+1]
+        if a == '--colunar':
+            colunar = True
     if input_file is None:
         input_file = DEFAULT_INPUT
-    if not os.path.exists(input_file):
+    if db is None and not os.path.exists(input_file):
         print(f"Arquivo de entrada não encontrado: {input_file}")
         return 2
 
-    rows = list(read_rows(input_file))
-    summaries = compute_indicators(rows)
+    if workers > 1 and (incremental or colunar or db is not None):
+        print('Aviso: --workers é ignorado com --incremental, --colunar ou --db.')
+
+    validacao = RelatorioValidacao()
+    if db is not None:
+        # Agregados calculados por SQL na base importada (scripts/base_monitoramento.py import ...)
+        from base_monitoramento import agregar_sql, conectar, validacao_importada
+        con = conectar(db)
+        summaries = summarize_groups(agregar_sql(con, (CHAVE_PARCELA_DATA,), input_file)[CHAVE_PARCELA_DATA])
+        validacao_importada(con, input_file, validacao)
+        con.close()
+        if not summaries:
+            print(f"Nenhum registro de {input_file} na base {db}; importe com: python scripts/base_monitoramento.py import {input_file}")
+            return 2
+    elif colunar:
+        # Backend NumPy opcional: CSV convertido em colunas tipadas e reduzido de forma vetorizada
+        from colunar import indicadores_colunar
+        summaries = summarize_groups(indicadores_colunar(input_file, validacao=validacao))
+    elif incremental:
+        from cache_agregados import CacheAgregados
+        with CacheAgregados() as cache:
+            grupos = cache.agregar(input_file, (CHAVE_PARCELA_DATA,), REQUIRED_COLUMNS, validacao)
+        summaries = summarize_groups(grupos[CHAVE_PARCELA_DATA])
+    elif workers > 1:
+        # Shards por intervalo de bytes agregados em processos e mesclados
+        grupos = agregar_paralelo(input_file, (CHAVE_PARCELA_DATA,), workers, REQUIRED_COLUMNS, validacao)
+        summaries = summarize_groups(grupos[CHAVE_PARCELA_DATA])
+    else:
+        summaries = compute_indicators(read_rows(input_file, validacao))
+    if validacao.total:
+        print('Aviso (validação): ' + validacao.resumo())
     write_csv(OUTPUT_FILE, summaries)
 
     # Resumo no console agregado por parcela (última data)
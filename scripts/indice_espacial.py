@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Índice espacial (STR-tree) sobre os polígonos de limites e localização das parcelas.
+
+`IndiceEspacial` empacota as caixas envolventes dos polígonos em uma árvore R
+construída por Sort-Tile-Recursive; uma consulta por ponto desce só pelos nós
+cuja caixa contém o ponto (O(log n)) e testa ponto-em-polígono apenas nos
+candidatos, em vez de varrer todos os polígonos.
+
+Com os índices de `limite_municipios_pe.geojson` e `limite_biomas.geojson`, cada
+linha do CSV de monitoramento recebe o município e o bioma do IBGE, e a coluna
+`bioma` do CSV é conferida com o bioma do ponto. No build de um projeto
+(gerar_visuais.py, etapa `localizar`) a conferência é feita por parcela
+(`conferir_parcelas`): as divergências entram no `RelatorioValidacao` e a
+localização vai para visuais/localizacao_parcelas.csv.
+
+Uso:
+  python scripts/indice_espacial.py -i portfolio/Simulado_PE/monitoramento_simulado.csv -o saidas/monitoramento_localizado.csv
+      [--municipios GEOJSON] [--biomas GEOJSON]
+
+Saída: o CSV de entrada com as colunas municipio_ibge, bioma_ibge e bioma_confere
+(sim/nao, vazio quando não há camada de biomas ou o ponto está fora dela), e um
+resumo das parcelas cujo bioma diverge.
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import csv
+import json
+import os
+import sys
+import unicodedata
+
+from agregacao import CHAVE_PARCELA_DATA, ler_cabecalho, parse_float
+
+DEFAULT_INPUT = os.path.join('portfolio', 'Simulado_PE', 'monitoramento_simulado.csv')
+DEFAULT_OUT = os.path.join('saidas', 'monitoramento_localizado.csv')
+# camadas compartilhadas pelos projetos (DIR_GEO_COMPARTILHADO de gerar_visuais.py)
+DEFAULT_MUNICIPIOS = os.path.join('dados', 'geo', 'limite_municipios_pe.geojson')
+DEFAULT_BIOMAS = os.path.join('dados', 'geo', 'limite_biomas.geojson')
+CAMPOS_LOCALIZACAO = ('parcela', 'coordenada_lat', 'coordenada_lon', 'municipio_ibge', 'bioma', 'bioma_ibge',
+                      'bioma_confere')
+CAPACIDADE_NO = 16
+
+# codarea das malhas de biomas do IBGE -> nome
+BIOMAS_IBGE = {
+    '1': 'Amazônia', '2': 'Cerrado', '3': 'Mata Atlântica',
+    '4': 'Caatinga', '5': 'Pampa', '6': 'Pantanal',
+}
+
+
+def _caixa(aneis):
+    xs = [p[0] for anel in aneis for p in anel]
+    ys = [p[1] for anel in aneis for p in anel]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _poligonos(geometria):
+    tipo = geometria.get('type') if geometria else None
+    if tipo == 'Polygon':
+        return [geometria['coordinates']]
+    if tipo == 'MultiPolygon':
+        return geometria['coordinates']
+    return []
+
+
+def ponto_em_poligono(x, y, aneis):
+    """Par-ímpar sobre todos os anéis (o externo e os buracos)."""
+    dentro = False
+    for anel in aneis:
+        j = len(anel) - 1
+        for i in range(len(anel)):
+            xi, yi = anel[i][0], anel[i][1]
+            xj, yj = anel[j][0], anel[j][1]
+            if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+                dentro = not dentro
+            j = i
+    return dentro
+
+
+class IndiceEspacial:
+    """STR-tree sobre os polígonos de uma FeatureCollection; `localizar` devolve as propriedades da feição."""
+
+    def __init__(self, colecao, capacidade=CAPACIDADE_NO):
+        self.capacidade = capacidade
+        # folhas: (caixa, índice da feição, anéis) — uma por polígono de MultiPolygon
+        self.propriedades = []
+        itens = []
+        for i, f in enumerate(colecao.get('features', [])):
+            self.propriedades.append(f.get('properties') or {})
+            for aneis in _poligonos(f.get('geometry')):
+                if aneis and aneis[0]:
+                    itens.append((_caixa(aneis), i, aneis))
+        self.raiz = self._construir(itens) if itens else None
+
+    def _construir(self, itens):
+        """Sort-Tile-Recursive: fatias verticais por x, cada uma ordenada por y e cortada em nós."""
+        nivel = [(caixa, None, item) for caixa, *item in itens]
+        while len(nivel) > 1 or nivel[0][1] is None:
+            n = self.capacidade
+            nos = -(-len(nivel) // n)
+            fatias = max(1, round(nos ** 0.5))
+            por_fatia = -(-len(nivel) // fatias)
+            nivel.sort(key=lambda no: no[0][0] + no[0][2])
+            proximo = []
+            for a in range(0, len(nivel), por_fatia):
+                fatia = sorted(nivel[a:a + por_fatia], key=lambda no: no[0][1] + no[0][3])
+                for b in range(0, len(fatia), n):
+                    filhos = fatia[b:b + n]
+                    caixa = (min(c[0][0] for c in filhos), min(c[0][1] for c in filhos),
+                             max(c[0][2] for c in filhos), max(c[0][3] for c in filhos))
+                    proximo.append((caixa, filhos, None))
+            nivel = proximo
+        return nivel[0]
+
+    def candidatos(self, x, y):
+        """Folhas (índice da feição, anéis) cuja caixa contém o ponto."""
+        if self.raiz is None:
+            return
+        pilha = [self.raiz]
+        while pilha:
+            caixa, filhos, item = pilha.pop()
+            if not (caixa[0] <= x <= caixa[2] and caixa[1] <= y <= caixa[3]):
+                continue
+            if filhos is None:
+                yield item
+            else:
+                pilha.extend(filhos)
+
+    def localizar(self, lon, lat):
+        """Propriedades da feição que contém (lon, lat), ou None."""
+        for i, aneis in self.candidatos(lon, lat):
+            if ponto_em_poligono(lon, lat, aneis):
+                return self.propriedades[i]
+        return None
+
+
+def carregar_indice(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return IndiceEspacial(json.load(f))
+
+
+def _normalizar(nome):
+    sem_acento = unicodedata.normalize('NFKD', nome or '').encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sem_acento.lower().split())
+
+
+def nome_bioma(props):
+    if not props:
+        return ''
+    nome = props.get('nome') or props.get('NM_BIOMA') or props.get('name')
+    return nome or BIOMAS_IBGE.get(str(props.get('codarea', '')), str(props.get('codarea', '')))
+
+
+def codigo_municipio(props):
+    if not props:
+        return ''
+    return str(props.get('codarea') or props.get('CD_MUN') or props.get('nome') or '')
+
+
+class Localizador:
+    """Município e bioma de um ponto, com memória por coordenada (linhas da mesma parcela repetem o ponto)."""
+
+    def __init__(self, municipios=DEFAULT_MUNICIPIOS, biomas=DEFAULT_BIOMAS):
+        self.municipios = carregar_indice(municipios)
+        self.biomas = carregar_indice(biomas)
+        self._memoria = {}
+
+    def localizar(self, lat, lon):
+        """(código do município, nome do bioma); '' quando não há camada ou o ponto está fora dela."""
+        if lat is None or lon is None:
+            return '', ''
+        chave = (lat, lon)
+        if chave not in self._memoria:
+            mun = self.municipios.localizar(lon, lat) if self.municipios else None
+            bio = self.biomas.localizar(lon, lat) if self.biomas else None
+            self._memoria[chave] = (codigo_municipio(mun), nome_bioma(bio))
+        return self._memoria[chave]
+
+
+def localizar_csv(path_in, path_out, localizador):
+    """Grava path_out com municipio_ibge, bioma_ibge e bioma_confere; devolve {parcela: (bioma CSV, bioma IBGE)} divergentes."""
+    divergentes = {}
+    os.makedirs(os.path.dirname(path_out) or '.', exist_ok=True)
+    with open(path_in, newline='', encoding='utf-8') as f, open(path_out, 'w', newline='', encoding='utf-8') as out:
+        reader = csv.reader(f)
+        cols = ler_cabecalho(reader, ('parcela', 'bioma', 'coordenada_lat', 'coordenada_lon'))
+        i_parcela, i_bioma = cols.index('parcela'), cols.index('bioma')
+        i_lat, i_lon = cols.index('coordenada_lat'), cols.index('coordenada_lon')
+        w = csv.writer(out)
+        w.writerow(cols + ['municipio_ibge', 'bioma_ibge', 'bioma_confere'])
+        for row in reader:
+            if not row:
+                continue
+            celula = lambda i: row[i].strip() if i < len(row) else ''
+            municipio, bioma = localizador.localizar(parse_float(celula(i_lat)), parse_float(celula(i_lon)))
+            confere = ''
+            if bioma:
+                confere = 'sim' if _normalizar(celula(i_bioma)) == _normalizar(bioma) else 'nao'
+                if confere == 'nao':
+                    divergentes.setdefault(celula(i_parcela), (celula(i_bioma), bioma))
+            w.writerow(row + [municipio, bioma, confere])
+    return divergentes
+
+
+def biomas_parcelas(grupos):
+    """{parcela: {biomas da coluna `bioma`}} a partir dos agrupamentos (parcela, data) de agregacao.agregar."""
+    biomas = {}
+    for (parcela, _), acc in grupos[CHAVE_PARCELA_DATA].items():
+        biomas.setdefault(parcela, set()).update(acc.biomas)
+    return biomas
+
+
+def conferir_parcelas(coordenadas, biomas, localizador, validacao=None):
+    """
+    Município e bioma do IBGE de cada parcela ({parcela: (lat, lon)}), conferindo o bioma
+    com os de `biomas` ({parcela: {biomas do CSV}}). Devolve as linhas de CAMPOS_LOCALIZACAO;
+    as parcelas cujo bioma diverge vão para `validacao.divergencia`.
+    """
+    linhas = []
+    for parcela in sorted(coordenadas):
+        lat, lon = coordenadas[parcela]
+        municipio, bioma = localizador.localizar(lat, lon)
+        declarados = sorted(biomas.get(parcela) or ())
+        confere = ''
+        if bioma and declarados:
+            confere = 'sim' if any(_normalizar(b) == _normalizar(bioma) for b in declarados) else 'nao'
+            if confere == 'nao' and validacao is not None:
+                validacao.divergencia(parcela, 'bioma', ', '.join(declarados), bioma)
+        linhas.append([parcela, lat, lon, municipio, ', '.join(declarados), bioma, confere])
+    return linhas
+
+
+def main(argv):
+    input_file = DEFAULT_INPUT
+    out_file = DEFAULT_OUT
+    municipios = DEFAULT_MUNICIPIOS
+    biomas = DEFAULT_BIOMAS
+    for i, a in enumerate(argv):
+        if a in ('-i', '--input') and i + 1 < len(argv):
+            input_file = argv[i + 1]
+        if a in ('-o', '--out') and i + 1 < len(argv):
+            out_file = argv[i + 1]
+        if a == '--municipios' and i + 1 < len(argv):
+            municipios = argv[i + 1]
+        if a == '--biomas' and i + 1 < len(argv):
+            biomas = argv[i + 1]
+    if not os.path.exists(input_file):
+        print(f'Arquivo de entrada não encontrado: {input_file}')
+        return 2
+
+    localizador = Localizador(municipios, biomas)
+    if localizador.municipios is None:
+        print(f'Aviso: camada de municípios não encontrada ({municipios}); municipio_ibge ficará vazio')
+    if localizador.biomas is None:
+        print(f'Aviso: camada de biomas não encontrada ({biomas}); bioma do CSV não será conferido')
+    divergentes = localizar_csv(input_file, out_file, localizador)
+    print(f'Arquivo gerado: {out_file}')
+    for parcela, (csv_bioma, ibge) in divergentes.items():
+        print(f'Aviso: parcela {parcela}: bioma no CSV "{csv_bioma}" difere do IBGE "{ibge}"')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
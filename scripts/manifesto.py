@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Hashes e gravações do build: o que as etapas de scripts/grafo.py usam para pular o que não mudou.
+
+`hash_arquivo` (sha256, memorizado por caminho/mtime/tamanho) e `versao_scripts` (hash de
+scripts/*.py) compõem a assinatura de cada etapa; o estado fica em `<saída>/.etapas.json`.
+
+Também traz as gravações/cópias atômicas que só tocam o destino quando o conteúdo
+muda — o mtime dos arquivos inalterados é preservado, e o GitHub Pages não vê
+alterações onde não houve.
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import glob
+import hashlib
+import os
+import shutil
+
+_PASTA_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+# (caminho, mtime, tamanho) -> sha256, para não reler arquivos compartilhados entre projetos
+_HASHES = {}
+_VERSAO = None
+
+
+def hash_arquivo(path):
+    """sha256 do conteúdo de `path` (None se não existir)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    chave = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    if chave not in _HASHES:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for bloco in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloco)
+        _HASHES[chave] = h.hexdigest()
+    return _HASHES[chave]
+
+
+def versao_scripts():
+    """Hash dos scripts/*.py: qualquer mudança no código invalida o que foi gerado com ele."""
+    global _VERSAO
+    if _VERSAO is None:
+        h = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(_PASTA_SCRIPTS, '*.py'))):
+            h.update(os.path.basename(path).encode('utf-8'))
+            h.update(hash_arquivo(path).encode('ascii'))
+        _VERSAO = h.hexdigest()
+    return _VERSAO
+
+
+def gravar_se_mudou(path, dados):
+    """Grava `dados` (bytes) em `path` via temporário + rename, só se o conteúdo mudou. True se gravou."""
+    if os.path.exists(path) and os.path.getsize(path) == len(dados):
+        with open(path, 'rb') as f:
+            if f.read() == dados:
+                return False
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(dados)
+    os.replace(tmp, path)
+    return True
+
+
+def copiar_se_mudou(origem, destino):
+    """Cópia atômica de `origem` para `destino` se o conteúdo difere. True se copiou."""
+    if os.path.exists(destino) and hash_arquivo(origem) == hash_arquivo(destino):
+        return False
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+    tmp = f'{destino}.{os.getpid()}.tmp'
+    shutil.copy2(origem, tmp)
+    os.replace(tmp, destino)
+    return True
+
+
+def sincronizar_pasta(origem, destino):
+    """Espelha `origem` em `destino` copiando só os arquivos alterados e apagando os que sumiram. (copiados, removidos)"""
+    copiados = removidos = 0
+    existentes = set()
+    for raiz, _, arquivos in os.walk(origem):
+        for nome in arquivos:
+            rel = os.path.relpath(os.path.join(raiz, nome), origem)
+            existentes.add(rel)
+            copiados += copiar_se_mudou(os.path.join(raiz, nome), os.path.join(destino, rel))
+    for raiz, _, arquivos in os.walk(destino, topdown=False):
+        for nome in arquivos:
+            if os.path.relpath(os.path.join(raiz, nome), destino) not in existentes:
+                os.remove(os.path.join(raiz, nome))
+                removidos += 1
+        if raiz != destino and not os.listdir(raiz):
+            os.rmdir(raiz)
+    return copiados, removidos
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Camada mínima de modelos (templates) HTML e cache de seções renderizadas.
+
+`Modelo` compila o texto uma única vez (na criação) em uma lista de trechos
+literais e campos `{{ nome }}`; `renderizar(**valores)` só concatena. Chaves
+simples (CSS, JavaScript) ficam como estão, sem precisar de escape.
+
+`CacheSecoes` guarda seções já renderizadas (KPIs, gráficos, alertas, painel de
+espécies...) pela assinatura das entradas: se nada mudou desde a última
+execução, a seção é lida do cache (memória, depois `saidas/cache_secoes/`) em
+vez de ser gerada de novo. A assinatura inclui a `versao` (ex.: hash do código
+que gera as seções), para que mudanças no gerador invalidem o cache. Em disco,
+cada seção guarda só as ENTRADAS_POR_SECAO versões usadas mais recentemente; as
+demais são apagadas a cada gravação. Projetos do lote usam pastas separadas
+(`gerar_visuais.cache_secoes(projeto)`), então a poda vale por projeto.
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import hashlib
+import json
+import os
+import re
+
+DEFAULT_CACHE_SECOES = os.path.join('saidas', 'cache_secoes')
+ENTRADAS_POR_SECAO = 4
+_CAMPO = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+
+class Modelo:
+    """Template com campos `{{ nome }}`, compilado uma vez."""
+
+    def __init__(self, texto):
+        self.texto = texto
+        self.trechos = []  # (literal, campo ou None)
+        inicio = 0
+        for m in _CAMPO.finditer(texto):
+            self.trechos.append((texto[inicio:m.start()], m.group(1)))
+            inicio = m.end()
+        self.trechos.append((texto[inicio:], None))
+        self.campos = {campo for _, campo in self.trechos if campo}
+
+    def renderizar(self, **valores):
+        faltando = self.campos - valores.keys()
+        if faltando:
+            raise KeyError(f'Campos sem valor no modelo: {sorted(faltando)}')
+        partes = []
+        for literal, campo in self.trechos:
+            partes.append(literal)
+            if campo:
+                partes.append(str(valores[campo]))
+        return ''.join(partes)
+
+
+def _valor_assinatura(obj):
+    """Forma JSON de objetos fora do JSON: arrays viram listas, conjuntos listas ordenadas."""
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=str)
+    if hasattr(obj, 'tolist'):  # array('d'), arrays NumPy
+        return obj.tolist()
+    if type(obj).__repr__ is object.__repr__:
+        # str() traria o endereço do objeto e a assinatura mudaria a cada execução
+        raise TypeError(f'{type(obj).__name__} não tem representação estável para a assinatura')
+    return str(obj)
+
+
+def assinatura(*entradas):
+    """Hash estável de entradas serializáveis em JSON (ver `_valor_assinatura` para os demais objetos)."""
+    texto = json.dumps(entradas, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=_valor_assinatura)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+class CacheSecoes:
+    """Seções HTML renderizadas, indexadas por (nome, versão, entradas); em memória e em disco."""
+
+    def __init__(self, pasta=DEFAULT_CACHE_SECOES, versao='', manter=ENTRADAS_POR_SECAO):
+        self.pasta = pasta
+        self.versao = versao
+        self.manter = manter
+        self._memoria = {}
+        # estatística: seções reaproveitadas / geradas
+        self.reaproveitadas = self.geradas = 0
+
+    def secao(self, nome, entradas, gerar):
+        """HTML da seção `nome`: do cache se `entradas` não mudaram, senão `gerar()` (e grava no cache)."""
+        chave = assinatura(nome, self.versao, entradas)
+        html = self._memoria.get(chave)
+        path = os.path.join(self.pasta, nome, chave[:32] + '.html') if self.pasta else None
+        if html is None and path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                html = f.read()
+            os.utime(path)  # mais recente para a poda
+        if html is not None:
+            self.reaproveitadas += 1
+        else:
+            html = gerar()
+            self.geradas += 1
+            if path:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f'{path}.{os.getpid()}.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(html)
+                os.replace(tmp, path)
+                self._podar(os.path.dirname(path))
+        self._memoria[chave] = html
+        return html
+
+    def _podar(self, pasta):
+        """Apaga as versões de uma seção além das `manter` usadas mais recentemente."""
+        entradas = []
+        for nome in os.listdir(pasta):
+            if nome.endswith('.html'):
+                try:
+                    entradas.append((os.path.getmtime(os.path.join(pasta, nome)), nome))
+                except OSError:
+                    pass
+        for _, nome in sorted(entradas, reverse=True)[self.manter:]:
+            try:
+                os.remove(os.path.join(pasta, nome))
+            except OSError:
+                pass  # já apagada por outro processo
+
+    def resumo(self):
+        return f'{self.reaproveitadas} seções reaproveitadas, {self.geradas} geradas'
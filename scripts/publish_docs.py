@@ -4,14 +4,22 @@ Script simples para preparar os arquivos em `docs/` prontos para publicar no Git
 
 O que faz:
 - copia `relatorio.html`, `relatorio_tecnico.html` e `mapa.html` de `portfolio/Simulado_PE/visuais/` para `docs/Simulado_PE/visuais/`
+- copia as pastas `camadas/` (camadas externas do mapa, `gerar_visuais.py --camadas-externas`) e
+  `tiles/` (tiles vetoriais, `gerar_visuais.py --tiles`) só se o `mapa.html` atual as usar;
+  as que ele não usa mais são apagadas de `docs/`
 - gera `docs/index.html` com um dashboard de entrega que incorpora links/iframes para os 3 produtos
 
+Arquivos com conteúdo igual ao já publicado não são tocados (nem o `index.html`), e as
+gravações são atômicas — sem alterações em `docs/`, o deploy do Pages não é disparado.
+
 Uso:
   python scripts/publish_docs.py
 """
 import os
 import shutil
 
+from manifesto import copiar_se_mudou, gravar_se_mudou, sincronizar_pasta
+
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 SRC = os.path.join(ROOT, 'portfolio', 'Simulado_PE', 'visuais')
 DEST = os.path.join(ROOT, 'docs', 'Simulado_PE', 'visuais')
@@ -22,23 +30,14 @@ FILES = [
     'mapa.html'
 ]
 
-os.makedirs(DEST, exist_ok=True)
-
-copied = []
-for f in FILES:
-    srcf = os.path.join(SRC, f)
-    if os.path.exists(srcf):
-        destf = os.path.join(DEST, f)
-        shutil.copy2(srcf, destf)
-        copied.append(f)
-        print('Copiado', f, '->', destf)
-    else:
-        print('Aviso: arquivo não encontrado:', srcf)
+DIRS = [
+    'camadas',
+    'tiles'
+]
 
-index_path = os.path.join(ROOT, 'docs', 'index.html')
-os.makedirs(os.path.dirname(index_path), exist_ok=True)
+INDEX = os.path.join(ROOT, 'docs', 'index.html')
 
-template = '''<!doctype html>
+TEMPLATE_INDEX = '''<!doctype html>
 <html lang="pt-br">
 <head>
   <meta charset="utf-8" />
@@ -90,9 +89,60 @@ template = '''<!doctype html>
 </body>
 </html>'''
 
-content = template.replace('{COPIED_PLACEHOLDER}', ', '.join(copied) if copied else 'nenhum')
 
-with open(index_path, 'w', encoding='utf-8') as fh:
-    fh.write(content)
+def pastas_usadas(mapa):
+    """Pastas de DIRS que o mapa.html em `mapa` referencia (ex.: "tiles/parcelas", "camadas/biomas.json")."""
+    try:
+        with open(mapa, 'r', encoding='utf-8') as f:
+            texto = f.read()
+    except OSError:
+        return set()
+    return {d for d in DIRS if f'"{d}/' in texto or f"'{d}/" in texto}
+
+
+def publicar():
+    """Copia os produtos alterados para docs/ e atualiza docs/index.html se mudou. Devolve os itens publicados."""
+    os.makedirs(DEST, exist_ok=True)
+
+    copied = []
+    for f in FILES:
+        srcf = os.path.join(SRC, f)
+        if os.path.exists(srcf):
+            destf = os.path.join(DEST, f)
+            copied.append(f)
+            if copiar_se_mudou(srcf, destf):
+                print('Copiado', f, '->', destf)
+            else:
+                print('Inalterado', f)
+        else:
+            print('Aviso: arquivo não encontrado:', srcf)
+
+    # Camadas externas e tiles vetoriais do mapa, baixados sob demanda pelo mapa.html;
+    # sobras de builds com outras opções ficam fora da publicação
+    usadas = pastas_usadas(os.path.join(SRC, 'mapa.html'))
+    for d in DIRS:
+        srcd = os.path.join(SRC, d)
+        destd = os.path.join(DEST, d)
+        if d not in usadas or not os.path.isdir(srcd):
+            if os.path.isdir(destd):
+                shutil.rmtree(destd)
+                print(f'Removido {d}/ de {DEST} (não usado pelo mapa)')
+            continue
+        n_copiados, n_removidos = sincronizar_pasta(srcd, destd)
+        copied.append(d + '/')
+        print(f'Sincronizado {d}/ -> {destd} ({n_copiados} copiados, {n_removidos} removidos)')
+
+    index_path = INDEX
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+
+    content = TEMPLATE_INDEX.replace('{COPIED_PLACEHOLDER}', ', '.join(copied) if copied else 'nenhum')
+
+    if gravar_se_mudou(index_path, content.encode('utf-8')):
+        print('\nPágina de entrega gerada em docs/index.html')
+    else:
+        print('\nPágina de entrega inalterada: docs/index.html')
+    return copied
+
 
-print('\nPágina de entrega gerada em docs/index.html')
+if __name__ == '__main__':
+    publicar()
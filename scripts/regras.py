@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Regras do PRAD em um só lugar: metas, pesos do score sucessional e critérios de alerta.
+
+A configuração é declarativa (tabelas abaixo) e é compilada uma vez em um
+`Avaliador`, que faz uma varredura por colunas da matriz parcela × data: cada
+critério é uma compreensão Python sobre a `array('d')` da métrica em todas as
+células medidas (stdlib pura, sem NumPy — não é vetorizado), em vez de
+recalcular parcela por parcela só para a última campanha. O resultado
+(`Avaliacao`) traz score, estágio e alertas de todas as campanhas — a trajetória
+de estágios de cada parcela sai sem custo extra.
+
+`METAS` é a fonte única dos limites usados por gerar_visuais.py (alertas do
+dashboard) e indicadores_prad.py (status em indicadores_resumo.csv):
+- metas de gestão do PRAD (sobrevivência ≥ 80%, invasoras ≤ 20%), que definem OK/ATENÇÃO no resumo;
+- limites dos alertas (sobrevivência < 70% é crítica; invasoras > 25%, copa < 40% e
+  altura < 2,0 m pedem atenção).
+
+Uso:
+  python scripts/regras.py -i portfolio/Simulado_PE/monitoramento_simulado.csv [-o trajetoria.csv]
+      trajetória de score/estágio/alertas por parcela em todas as campanhas e, na
+      listagem, os episódios de cada alerta (início, resolução, campanhas)
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import csv
+import os
+import sys
+from array import array
+
+METAS = {
+    # metas de gestão (status OK/ATENÇÃO de indicadores_prad.py)
+    'sobrevivencia_meta': 80,
+    'invasoras_meta': 20,
+    # limites dos alertas do dashboard
+    'sobrevivencia_critica': 70,
+    'invasoras_max': 25,
+    'copa_min': 40,
+    'altura_min': 2.0,
+}
+
+# Score sucessional (0-100): média ponderada dos critérios, cada um normalizado para 0-100.
+# escala=None: métrica já é percentual; inverter: menos é melhor (100 - valor)
+CRITERIOS_ESTAGIO = (
+    {'metrica': 'sobrevivencia', 'peso': 0.25, 'escala': None},
+    {'metrica': 'shannon', 'peso': 0.15, 'escala': 2.0},             # Shannon max ~2.0 para 8 espécies
+    {'metrica': 'riqueza', 'peso': 0.10, 'escala': 8},               # 8 espécies = máximo
+    {'metrica': 'cobertura_copa', 'peso': 0.20, 'escala': None},
+    {'metrica': 'cobertura_invasoras', 'peso': 0.20, 'escala': None, 'inverter': True},
+    {'metrica': 'razao_copa_invasoras', 'peso': 0.10, 'escala': 5},  # razão 5:1 = excelente
+)
+
+# (score abaixo de, estágio); o último vale para o restante
+ESTAGIOS = ((34, 'Inicial'), (67, 'Intermediário'), (None, 'Avançado'))
+
+# Alertas: métrica comparada a um limite de METAS; `campanhas`: só a partir da N-ésima
+# campanha da parcela. A mensagem recebe `valor` e `limite`.
+REGRAS_ALERTA = (
+    {'categoria': 'Sobrevivência', 'tipo': 'CRÍTICO', 'metrica': 'sobrevivencia', 'condicao': '<',
+     'limite': 'sobrevivencia_critica', 'mensagem': 'Taxa de sobrevivência baixa ({valor:.1f}%) - Meta: ≥{limite:g}%'},
+    {'categoria': 'Invasoras', 'tipo': 'ATENÇÃO', 'metrica': 'cobertura_invasoras', 'condicao': '>',
+     'limite': 'invasoras_max', 'mensagem': 'Cobertura de invasoras elevada ({valor:.1f}%) - Meta: ≤{limite:g}%'},
+    {'categoria': 'Copa', 'tipo': 'ATENÇÃO', 'metrica': 'cobertura_copa', 'condicao': '<', 'campanhas': 3,
+     'limite': 'copa_min', 'mensagem': 'Cobertura de copa insuficiente ({valor:.1f}%) - Meta: ≥{limite:g}% após 18 meses'},
+    {'categoria': 'Crescimento', 'tipo': 'ATENÇÃO', 'metrica': 'altura_media', 'condicao': '<', 'campanhas': 4,
+     'limite': 'altura_min', 'mensagem': 'Crescimento lento - Altura média {valor:.2f}m após 2+ anos'},
+)
+
+# Tendências: a métrica cai (ou sobe) em `campanhas` campanhas seguidas da parcela.
+# A mensagem recebe `valor`, `inicial` (valor no começo da sequência) e `n` (campanhas).
+REGRAS_TENDENCIA = (
+    {'categoria': 'Tendência de sobrevivência', 'tipo': 'ATENÇÃO', 'metrica': 'sobrevivencia', 'direcao': 'queda',
+     'campanhas': 3, 'mensagem': 'Sobrevivência em queda há {n} campanhas ({inicial:.1f}% → {valor:.1f}%)'},
+    {'categoria': 'Tendência de invasoras', 'tipo': 'ATENÇÃO', 'metrica': 'cobertura_invasoras', 'direcao': 'alta',
+     'campanhas': 3, 'mensagem': 'Cobertura de invasoras em alta há {n} campanhas ({inicial:.1f}% → {valor:.1f}%)'},
+)
+
+_DIRECOES = {'queda': lambda v, anterior: v < anterior, 'alta': lambda v, anterior: v > anterior}
+
+_CONDICOES = {'<': lambda v, l: v < l, '>': lambda v, l: v > l,
+              '<=': lambda v, l: v <= l, '>=': lambda v, l: v >= l}
+
+
+class Matriz:
+    """
+    Células medidas da matriz parcela × data, em colunas: `parcela`/`data` (índices em
+    `parcelas`/`datas`), `campanha` (ordinal da medição na parcela, a partir de 1) e
+    uma `array('d')` por métrica. Ordem: parcela (como em `series`), depois data.
+    """
+
+    def __init__(self, series, metricas):
+        self.parcelas = list(series)
+        self.datas = sorted({d for s in series.values() for d in s['datas']})
+        pos = {d: i for i, d in enumerate(self.datas)}
+        self.parcela = array('i')
+        self.data = array('i')
+        self.campanha = array('i')
+        self.colunas = {m: array('d') for m in metricas}
+        for p, s in enumerate(series.values()):
+            n = len(s['datas'])
+            self.parcela.extend([p] * n)
+            self.data.extend(pos[d] for d in s['datas'])
+            self.campanha.extend(range(1, n + 1))
+            for m, col in self.colunas.items():
+                col.extend(s[m])
+
+    def __len__(self):
+        return len(self.parcela)
+
+
+class Avaliador:
+    """Configuração de regras compilada: transformações, pesos e condições resolvidos uma vez."""
+
+    def __init__(self, criterios=CRITERIOS_ESTAGIO, estagios=ESTAGIOS, regras_alerta=REGRAS_ALERTA, metas=METAS,
+                 tendencias=REGRAS_TENDENCIA):
+        self.criterios = [(c['metrica'], c['peso'], self._normalizacao(c)) for c in criterios]
+        self.estagios = estagios
+        self.regras = []
+        for r in regras_alerta:
+            if r['condicao'] not in _CONDICOES:
+                raise ValueError(f"Condição desconhecida na regra {r['categoria']}: {r['condicao']}")
+            self.regras.append(dict(r, teste=_CONDICOES[r['condicao']], limite=metas[r['limite']]))
+        self.tendencias = []
+        for t in tendencias:
+            if t['direcao'] not in _DIRECOES:
+                raise ValueError(f"Direção desconhecida na tendência {t['categoria']}: {t['direcao']}")
+            self.tendencias.append(dict(t, teste=_DIRECOES[t['direcao']]))
+        self.metricas = tuple(dict.fromkeys([m for m, _, _ in self.criterios] + [r['metrica'] for r in self.regras]
+                                            + [t['metrica'] for t in self.tendencias]))
+
+    @staticmethod
+    def _normalizacao(criterio):
+        escala = criterio.get('escala')
+        if criterio.get('inverter'):
+            if escala is None:
+                return lambda col: [max(100 - v, 0) for v in col]
+            return lambda col: [max(100 - (v / escala) * 100, 0) for v in col]
+        if escala is None:
+            return lambda col: [min(v, 100) for v in col]
+        return lambda col: [min((v / escala) * 100, 100) for v in col]
+
+    def estagio(self, score):
+        for limite, nome in self.estagios:
+            if limite is None or score < limite:
+                return nome
+
+    def avaliar(self, series):
+        """
+        Avalia todas as campanhas de todas as parcelas de `series` ({parcela: SerieTemporal}),
+        uma passada por critério/regra sobre a coluna inteira da métrica.
+        """
+        matriz = Matriz(series, self.metricas)
+        scores = [0.0] * len(matriz)
+        for metrica, peso, normalizar in self.criterios:
+            scores = [s + v * peso for s, v in zip(scores, normalizar(matriz.colunas[metrica]))]
+        # por regra, as células que disparam (em ordem de célula)
+        disparos = []
+        for r in self.regras:
+            col, teste, limite = matriz.colunas[r['metrica']], r['teste'], r['limite']
+            minimo = r.get('campanhas', 1)
+            disparos.append([i for i, (v, c) in enumerate(zip(col, matriz.campanha)) if c >= minimo and teste(v, limite)])
+        return Avaliacao(self, matriz, scores, disparos)
+
+
+class Avaliacao:
+    """
+    Score, estágio e alertas de cada célula (parcela, data) avaliada, mais o histórico dos
+    alertas: cada categoria ativa em campanhas seguidas de uma parcela forma um episódio
+    {parcela, categoria, tipo, inicio, fim, campanhas} — `fim` é a primeira campanha em que
+    o alerta deixou de valer (None se ainda ativo). `indice[parcela][categoria]` lista os episódios.
+    """
+
+    def __init__(self, avaliador, matriz, scores, disparos):
+        self.avaliador = avaliador
+        self.matriz = matriz
+        self.scores = scores
+        self.estagios = [avaliador.estagio(s) for s in scores]
+        # por célula: [(regra, campos extras da mensagem)]
+        self._alertas = [[] for _ in range(len(matriz))]
+        for r, celulas in zip(avaliador.regras, disparos):
+            for i in celulas:
+                self._alertas[i].append((r, {}))
+        self._por_data = {}
+        for i, d in enumerate(matriz.data):
+            self._por_data.setdefault(matriz.datas[d], []).append(i)
+        self._varrer()
+
+    def _varrer(self):
+        """Uma passagem pelas células (por parcela, em ordem de data): tendências e episódios."""
+        m = self.matriz
+        tendencias = self.avaliador.tendencias
+        self.episodios = []
+        self.indice = {}
+        self._desde = [None] * len(m)  # por célula: {categoria: início do episódio}
+        abertos = {}
+        sequencias = []
+        for i in range(len(m)):
+            parcela, data = m.parcelas[m.parcela[i]], m.datas[m.data[i]]
+            if m.campanha[i] == 1:
+                # nova parcela
+                abertos = {}
+                sequencias = [1] * len(tendencias)
+            else:
+                for k, t in enumerate(tendencias):
+                    col = m.colunas[t['metrica']]
+                    sequencias[k] = sequencias[k] + 1 if t['teste'](col[i], col[i - 1]) else 1
+                    if sequencias[k] >= t['campanhas']:
+                        self._alertas[i].append((t, {'n': sequencias[k], 'inicial': col[i - sequencias[k] + 1]}))
+            ativas = {r['categoria']: r for r, _ in self._alertas[i]}
+            for categoria in [c for c in abertos if c not in ativas]:
+                abertos.pop(categoria)['fim'] = data
+            desde = {}
+            for categoria, r in ativas.items():
+                ep = abertos.get(categoria)
+                if ep is None:
+                    ep = abertos[categoria] = {'parcela': parcela, 'categoria': categoria, 'tipo': r['tipo'],
+                                               'inicio': data, 'fim': None, 'campanhas': 0}
+                    self.episodios.append(ep)
+                    self.indice.setdefault(parcela, {}).setdefault(categoria, []).append(ep)
+                ep['campanhas'] += 1
+                desde[categoria] = ep['inicio']
+            self._desde[i] = desde
+
+    def historico(self, parcela, categoria=None):
+        """Episódios de alerta de `parcela` (só de `categoria`, se dada), em ordem de início."""
+        por_categoria = self.indice.get(parcela, {})
+        if categoria is not None:
+            return list(por_categoria.get(categoria, []))
+        return sorted((ep for eps in por_categoria.values() for ep in eps), key=lambda ep: ep['inicio'])
+
+    def _celulas(self, data):
+        return self._por_data.get(data, [])
+
+    def classificacao(self, data):
+        """{parcela: {score, estagio, sobrevivencia, shannon, riqueza, copa, invasoras, razao}} em `data`."""
+        m = self.matriz
+        col = m.colunas
+        return {m.parcelas[m.parcela[i]]: {
+            'score': self.scores[i],
+            'estagio': self.estagios[i],
+            'sobrevivencia': col['sobrevivencia'][i],
+            'shannon': col['shannon'][i],
+            'riqueza': col['riqueza'][i],
+            'copa': col['cobertura_copa'][i],
+            'invasoras': col['cobertura_invasoras'][i],
+            'razao': col['razao_copa_invasoras'][i],
+        } for i in self._celulas(data)}
+
+    def alertas(self, data):
+        """
+        Alertas em `data`, por parcela e na ordem de REGRAS_ALERTA e REGRAS_TENDENCIA:
+        {parcela, tipo, categoria, mensagem, valor, desde} (`desde`: início do episódio).
+        """
+        m = self.matriz
+        saida = []
+        for i in self._celulas(data):
+            for r, extras in self._alertas[i]:
+                valor = m.colunas[r['metrica']][i]
+                saida.append({'parcela': m.parcelas[m.parcela[i]], 'tipo': r['tipo'], 'categoria': r['categoria'],
+                              'mensagem': r['mensagem'].format(valor=valor, limite=r.get('limite'), **extras),
+                              'valor': valor, 'desde': self._desde[i][r['categoria']]})
+        return saida
+
+    def trajetoria(self):
+        """Linhas (parcela, data, campanha, score, estágio, alertas críticos, alertas de atenção) de todas as células."""
+        m = self.matriz
+        for i in range(len(m)):
+            tipos = [r['tipo'] for r, _ in self._alertas[i]]
+            yield (m.parcelas[m.parcela[i]], m.datas[m.data[i]], m.campanha[i], self.scores[i], self.estagios[i],
+                   tipos.count('CRÍTICO'), tipos.count('ATENÇÃO'))
+
+
+def indice_alertas(alertas):
+    """{parcela: {categoria: [alertas]}} em uma passagem pela lista de alertas."""
+    indice = {}
+    for a in alertas:
+        indice.setdefault(a['parcela'], {}).setdefault(a['categoria'], []).append(a)
+    return indice
+
+
+_AVALIADOR = None
+
+
+def avaliar(series):
+    """Avaliação de `series` com a configuração padrão (compilada uma vez por processo)."""
+    global _AVALIADOR
+    if _AVALIADOR is None:
+        _AVALIADOR = Avaliador()
+    return _AVALIADOR.avaliar(series)
+
+
+def main(argv):
+    from agregacao import CHAVE_PARCELA_DATA, agregar, ler_registros
+    from gerar_visuais import DEFAULT_INPUT, group_metrics
+
+    input_file = DEFAULT_INPUT
+    path_out = None
+    for i, a in enumerate(argv):
+        if a in ('-i', '--input') and i+1 < len(argv):
+            input_file = argv[i+1]
+        if a in ('-o', '--out') and i+1 < len(argv):
+            path_out = argv[i+1]
+    if not os.path.exists(input_file):
+        print(f'Arquivo de entrada não encontrado: {input_file}')
+        return 2
+    series, _ = group_metrics(agregar(ler_registros(input_file), (CHAVE_PARCELA_DATA,))[CHAVE_PARCELA_DATA])
+    avaliacao = avaliar(series)
+    linhas = list(avaliacao.trajetoria())
+    if path_out:
+        os.makedirs(os.path.dirname(path_out) or '.', exist_ok=True)
+        with open(path_out, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['parcela', 'data', 'campanha', 'score_sucessional', 'estagio_sucessional',
+                             'alertas_criticos', 'alertas_atencao'])
+            writer.writerows((p, d, c, f'{s:.1f}', e, nc, na) for p, d, c, s, e, nc, na in linhas)
+        print(f'Arquivo gerado: {path_out}')
+        return 0
+    anterior = None
+    for k, (p, d, c, s, e, nc, na) in enumerate(linhas):
+        if p != anterior:
+            print(p)
+            anterior = p
+        print(f'  {d}  #{c}  score={s:5.1f}  {e.ljust(13)}  alertas: {nc} críticos, {na} atenção')
+        if k + 1 == len(linhas) or linhas[k + 1][0] != p:
+            for ep in avaliacao.historico(p):
+                fim = f"resolvido em {ep['fim']}" if ep['fim'] else 'ativo'
+                print(f"    [{ep['categoria']}] desde {ep['inicio']}, {fim} ({ep['campanhas']} campanhas)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Pirâmide estática de tiles vetoriais (z/x/y) para as camadas do mapa.
+
+Cada camada (parcelas, municípios de PE, biomas) é cortada, para cada zoom entre
+`zoom_min` e `zoom_max`, nos tiles Web Mercator que a contêm, no estilo do
+GeoJSON-VT/MVT:
+- a geometria é simplificada para o zoom (scripts/geometria.py, divisas preservadas);
+- coordenadas viram inteiros locais do tile (0..EXTENT), com uma borda (`BUFFER`)
+  para que as arestas criadas pelo recorte fiquem fora da área visível;
+- cada tile é um JSON compacto {"features": [{"properties": ..., "rings": [[[x, y], ...], ...]}]},
+  gravado em PASTA/<z>/<x>/<y>.json.
+
+Só os tiles dentro de `limites` (a área navegável do mapa) são gerados. O mapa
+busca apenas os tiles visíveis, então o custo de desenho depende da janela e não
+do tamanho da camada.
+
+Uso:
+  python scripts/tiles_vetoriais.py portfolio/Simulado_PE/geo/parcelas.geojson saidas/tiles/parcelas 12 15
+
+Sem dependências externas (usa apenas biblioteca padrão).
+"""
+import json
+import math
+import os
+import shutil
+import sys
+
+from geometria import casas_decimais, simplificar_colecao, tolerancia_zoom
+
+EXTENT = 4096
+BUFFER = 64
+
+
+def projetar(lon, lat, zoom):
+    """Coordenadas globais (unidades de tile * EXTENT) de um ponto no `zoom` (Web Mercator)."""
+    n = (1 << zoom) * EXTENT
+    lat = max(min(lat, 85.0511), -85.0511)
+    s = math.sin(math.radians(lat))
+    return (lon + 180.0) / 360.0 * n, (0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)) * n
+
+
+def _recortar(anel, x0, y0, x1, y1):
+    """Sutherland–Hodgman: parte do anel dentro do retângulo [x0, x1] x [y0, y1]."""
+    for eixo, limite, dentro_maior in ((0, x0, True), (0, x1, False), (1, y0, True), (1, y1, False)):
+        if not anel:
+            break
+        saida = []
+        anterior = anel[-1]
+        for atual in anel:
+            dentro_atual = atual[eixo] >= limite if dentro_maior else atual[eixo] <= limite
+            dentro_anterior = anterior[eixo] >= limite if dentro_maior else anterior[eixo] <= limite
+            if dentro_atual != dentro_anterior:
+                t = (limite - anterior[eixo]) / (atual[eixo] - anterior[eixo])
+                outro = 1 - eixo
+                p = [0.0, 0.0]
+                p[eixo] = limite
+                p[outro] = anterior[outro] + t * (atual[outro] - anterior[outro])
+                saida.append(tuple(p))
+            if dentro_atual:
+                saida.append(atual)
+            anterior = atual
+        anel = saida
+    return anel
+
+
+def _aneis_geometria(geometria):
+    tipo = geometria.get('type') if geometria else None
+    if tipo == 'Polygon':
+        return list(geometria['coordinates'])
+    if tipo == 'MultiPolygon':
+        return [anel for poligono in geometria['coordinates'] for anel in poligono]
+    return []
+
+
+def faixa_tiles(limites, zoom):
+    """(x mínimo, y mínimo, x máximo, y máximo) dos tiles que cobrem `limites` ((sul, oeste), (norte, leste))."""
+    (sul, oeste), (norte, leste) = limites
+    x0, y0 = projetar(oeste, norte, zoom)
+    x1, y1 = projetar(leste, sul, zoom)
+    return int(x0 // EXTENT), int(y0 // EXTENT), int(x1 // EXTENT), int(y1 // EXTENT)
+
+
+def gerar_tiles(colecao, pasta, zoom_min, zoom_max, limites=None, limites_zoom=None):
+    """
+    Grava a pirâmide de `colecao` em `pasta` (substituindo a anterior) e devolve
+    {'zooms': {z: ['x/y', ...]}, 'limites': [[sul, oeste], [norte, leste]] da camada}.
+    `limites_zoom` ({zoom: limites}) troca o recorte de `limites` nos zooms indicados.
+    """
+    shutil.rmtree(pasta, ignore_errors=True)
+    features = colecao.get('features', [])
+    coords = [c for f in features for anel in _aneis_geometria(f.get('geometry')) for c in anel]
+    if not coords:
+        return {'zooms': {}, 'limites': None}
+    caixa = [[min(c[1] for c in coords), min(c[0] for c in coords)],
+             [max(c[1] for c in coords), max(c[0] for c in coords)]]
+
+    zooms = {}
+    for zoom in range(zoom_min, zoom_max + 1):
+        # simplificação de meio pixel no zoom, preservando divisas compartilhadas
+        tol = tolerancia_zoom(zoom, 0.5)
+        simples = simplificar_colecao(colecao, tol, casas_decimais(tol))
+        recorte = (limites_zoom or {}).get(zoom, limites)
+        faixa = faixa_tiles(recorte, zoom) if recorte else None
+        tiles = {}
+        for f in simples['features']:
+            aneis = [[projetar(x, y, zoom) for x, y, *_ in anel] for anel in _aneis_geometria(f.get('geometry'))]
+            if not aneis:
+                continue
+            xs = [p[0] for anel in aneis for p in anel]
+            ys = [p[1] for anel in aneis for p in anel]
+            tx0, tx1 = int((min(xs) - BUFFER) // EXTENT), int((max(xs) + BUFFER) // EXTENT)
+            ty0, ty1 = int((min(ys) - BUFFER) // EXTENT), int((max(ys) + BUFFER) // EXTENT)
+            if faixa:
+                tx0, ty0 = max(tx0, faixa[0]), max(ty0, faixa[1])
+                tx1, ty1 = min(tx1, faixa[2]), min(ty1, faixa[3])
+            for tx in range(tx0, tx1 + 1):
+                ox = tx * EXTENT
+                for ty in range(ty0, ty1 + 1):
+                    oy = ty * EXTENT
+                    recortados = []
+                    for anel in aneis:
+                        parte = _recortar(anel, ox - BUFFER, oy - BUFFER, ox + EXTENT + BUFFER, oy + EXTENT + BUFFER)
+                        local = []
+                        for x, y in parte:
+                            p = [round(x - ox), round(y - oy)]
+                            if not local or local[-1] != p:
+                                local.append(p)
+                        if len(local) >= 3:
+                            recortados.append(local)
+                    if recortados:
+                        tiles.setdefault((tx, ty), []).append({'properties': f.get('properties') or {}, 'rings': recortados})
+        for (tx, ty), conteudo in tiles.items():
+            path = os.path.join(pasta, str(zoom), str(tx), f'{ty}.json')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as out:
+                json.dump({'features': conteudo}, out, ensure_ascii=False, separators=(',', ':'))
+        zooms[str(zoom)] = sorted(f'{tx}/{ty}' for tx, ty in tiles)
+    return {'zooms': zooms, 'limites': caixa}
+
+
+def main(argv):
+    if len(argv) < 4:
+        print(__doc__)
+        return 2
+    origem, pasta, zoom_min, zoom_max = argv[0], argv[1], int(argv[2]), int(argv[3])
+    with open(origem, 'r', encoding='utf-8') as f:
+        colecao = json.load(f)
+    indice = gerar_tiles(colecao, pasta, zoom_min, zoom_max)
+    for z, tiles in indice['zooms'].items():
+        print(f'z{z}: {len(tiles)} tiles')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,67 @@
+"""Apoio dos testes: caminho dos scripts, amostra do portfólio e um gerador de CSVs de monitoramento."""
+import csv
+import os
+import random
+import sys
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(RAIZ, 'scripts'))
+
+AMOSTRA = os.path.join(RAIZ, 'portfolio', 'Simulado_PE', 'monitoramento_simulado.csv')
+
+CABECALHO = ['parcela', 'data', 'bioma', 'coordenada_lat', 'coordenada_lon', 'especie', 'nome_popular',
+             'plantadas_vivas', 'plantadas_totais', 'altura_m', 'diametro_cm', 'cobertura_copa_pct',
+             'cobertura_invasoras_pct', 'observacoes', 'foto']
+
+ESPECIES = ('Inga vera', 'Cecropia pachystachya', 'Schinus terebinthifolia', 'Genipa americana',
+            'Tabebuia aurea', 'Anadenanthera colubrina')
+BIOMAS = ('Mata Atlantica', 'Caatinga', 'Mata Atlântica, litoral')
+DATAS = ('2024-08-10', '2025-02-15', '2025-08-20', '2026-02-18')
+
+
+def gerar_linhas(n, semente=1, parcelas=12, invalidas=True, quebras=True):
+    """
+    `n` linhas (sem cabeçalho) de monitoramento sintético; com `invalidas`, algumas células
+    ruins; com `quebras`, observações entre aspas com quebra de linha.
+    """
+    observacoes = ('', 'ok', 'replantio "parcial"') + (('linha\ncom quebra',) if quebras else ())
+    rnd = random.Random(semente)
+    linhas = []
+    for _ in range(n):
+        p = rnd.randrange(parcelas)
+        totais = rnd.randint(5, 40)
+        linha = [f'P{p:02d}', rnd.choice(DATAS), BIOMAS[p % len(BIOMAS)],
+                 f'{-8 + p * 0.01:.4f}', f'{-35 - p * 0.01:.4f}', rnd.choice(ESPECIES), 'Nome, popular',
+                 str(rnd.randint(0, totais)), str(totais), f'{rnd.uniform(0.3, 6):.2f}',
+                 f'{rnd.uniform(0.5, 15):.1f}', str(rnd.randint(0, 100)), f'{rnd.uniform(0, 60):.3f}',
+                 rnd.choice(observacoes), '']
+        if invalidas and rnd.random() < 0.05:
+            linha[rnd.choice((3, 7, 9, 10, 11, 12))] = rnd.choice(('x', '1,5', ' ', 'n/d', ' 7 '))
+        if rnd.random() < 0.05:
+            linha[rnd.choice((9, 10, 11, 12))] = ''
+        linhas.append(linha)
+    return linhas
+
+
+def escrever_csv(path, linhas, cabecalho=CABECALHO):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f, lineterminator='\n')
+        w.writerow(cabecalho)
+        w.writerows(linhas)
+    return path
+
+
+def estados(grupos):
+    """{chave: [(grupo, estado do acumulador)]} na ordem dos grupos (comparação exata)."""
+    return {chave: [(k, acc.estado()) for k, acc in destino.items()] for chave, destino in grupos.items()}
+
+
+def resumos(grupos):
+    """
+    {chave: [(grupo, indicadores)]} na ordem dos grupos: contagens e médias, que não dependem
+    da ordem em que as somas foram acumuladas (parciais mesclados, SQL).
+    """
+    return {chave: [(k, (acc.linhas, acc.vivas, acc.totais, acc.altura_media, acc.diametro_medio, acc.copa_media,
+                         acc.invasoras_media, acc.vivos_por_sp, sorted(acc.biomas)))
+                    for k, acc in destino.items()]
+            for chave, destino in grupos.items()}
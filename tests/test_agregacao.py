@@ -0,0 +1,152 @@
+"""Agregação em passagem única (scripts/agregacao.py)."""
+import csv
+import math
+import os
+import tempfile
+import unittest
+from collections import defaultdict
+from statistics import fmean
+
+import comum  # antes dos módulos de scripts/: acerta o sys.path
+import agregacao
+from agregacao import (CHAVE_ESPECIE_DATA, CHAVE_PARCELA_DATA, AcumuladorGrupo, RelatorioValidacao, Registro, agregar,
+                       agregar_paralelo, conversor, ler_registros, media_soma)
+
+CHAVES = (CHAVE_PARCELA_DATA, CHAVE_ESPECIE_DATA)
+
+
+class MediaSomaTest(unittest.TestCase):
+
+    def test_reproduz_a_media_decimal(self):
+        valores = [0.1, 0.2, 0.3]
+        self.assertNotEqual(sum(valores) / 3, 0.2)
+        self.assertEqual(media_soma(sum(valores), 3), 0.2)
+        soma = 0.0
+        for v in (0.1, 1.2, 1.175):
+            soma += v
+        self.assertNotEqual(soma / 3, 0.825)
+        self.assertEqual(media_soma(soma, 3), 0.825)
+
+    def test_grupo_vazio(self):
+        self.assertIsNone(media_soma(0.0, 0))
+
+
+class AcumuladorGrupoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registros = list(ler_registros(comum.AMOSTRA))
+
+    def test_somas_simples_e_contagens(self):
+        acc = AcumuladorGrupo()
+        for reg in self.registros:
+            acc.adicionar(reg)
+        alturas = [r.altura for r in self.registros if r.altura is not None]
+        self.assertEqual(acc.linhas, len(self.registros))
+        self.assertEqual(acc.n_altura, len(alturas))
+        self.assertEqual(acc.soma_altura, sum(alturas))
+        self.assertAlmostEqual(acc.altura_media, fmean(alturas), places=12)
+        self.assertEqual(acc.vivas, sum(r.vivas for r in self.registros))
+
+    def test_estado_ida_e_volta(self):
+        acc = AcumuladorGrupo()
+        for reg in self.registros:
+            acc.adicionar(reg)
+        copia = AcumuladorGrupo.de_estado(acc.estado())
+        self.assertEqual(copia.estado(), acc.estado())
+        self.assertEqual(copia.riqueza, acc.riqueza)
+        self.assertEqual(copia.shannon, acc.shannon)
+
+    def test_mesclar_equivale_a_um_acumulador(self):
+        inteiro, a, b = AcumuladorGrupo(), AcumuladorGrupo(), AcumuladorGrupo()
+        meio = len(self.registros) // 2
+        for i, reg in enumerate(self.registros):
+            inteiro.adicionar(reg)
+            (a if i < meio else b).adicionar(reg)
+        a.mesclar(b)
+        for m in ('linhas', 'vivas', 'totais', 'altura_media', 'diametro_medio', 'copa_media', 'invasoras_media',
+                  'vivos_por_sp', 'biomas'):
+            self.assertEqual(getattr(a, m), getattr(inteiro, m), m)
+
+
+class AgregarTest(unittest.TestCase):
+
+    def test_amostra_contra_referencia_direta(self):
+        grupos = agregar(ler_registros(comum.AMOSTRA), CHAVES)[CHAVE_PARCELA_DATA]
+        linhas = defaultdict(list)
+        with open(comum.AMOSTRA, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                linhas[(row['parcela'], row['data'])].append(row)
+        self.assertEqual(list(grupos), list(linhas))
+        for k, rows in linhas.items():
+            acc = grupos[k]
+            self.assertEqual(acc.vivas, sum(int(r['plantadas_vivas']) for r in rows))
+            self.assertEqual(acc.totais, sum(int(r['plantadas_totais']) for r in rows))
+            self.assertEqual(acc.riqueza, len({r['especie'] for r in rows}))
+            for campo, coluna in (('altura_media', 'altura_m'), ('copa_media', 'cobertura_copa_pct')):
+                valores = [float(r[coluna]) for r in rows if r[coluna].strip()]
+                self.assertTrue(math.isclose(getattr(acc, campo), fmean(valores), rel_tol=1e-12), (k, campo))
+
+    def test_celulas_invalidas_contadas(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = comum.escrever_csv(os.path.join(tmp, 'm.csv'), comum.gerar_linhas(400, semente=3))
+            validacao = RelatorioValidacao()
+            grupos = agregar(ler_registros(path, validacao=validacao), CHAVES)
+        self.assertGreater(validacao.total, 0)
+        self.assertEqual(validacao.linhas, 400)
+        self.assertEqual(sum(acc.linhas for acc in grupos[CHAVE_PARCELA_DATA].values()), 400)
+        self.assertEqual(validacao.exemplos, sorted(validacao.exemplos, key=lambda e: e[0]))
+
+
+class ConversorTest(unittest.TestCase):
+
+    def converter(self, row, cols=comum.CABECALHO):
+        validacao = RelatorioValidacao()
+        return conversor(cols, validacao)(row, 7), validacao
+
+    def test_linha_valida(self):
+        row = ['P01', ' 2025-02-15 ', 'Caatinga', '-8.1', '-35.2', 'Inga vera', 'Ingá', ' 12 ', '20', '1.5', '',
+               '30', '0', 'obs', '']
+        reg, val = self.converter(row)
+        self.assertEqual(reg, Registro('P01', '2025-02-15', 'Caatinga', 'Inga vera', -8.1, -35.2, 12, 20, 1.5, None,
+                                       30.0, 0.0))
+        self.assertEqual((val.linhas, val.total), (1, 0))
+
+    def test_celulas_invalidas_caem_celula_a_celula(self):
+        row = ['P01', '2025-02-15', 'Caatinga', 'x', '-35.2', 'Inga vera', 'Ingá', '12.0', '20', ' ', '1,5',
+               '30', '0', '', '']
+        reg, val = self.converter(row)
+        self.assertEqual((reg.lat, reg.vivas, reg.altura, reg.diametro), (None, 12, None, None))
+        self.assertEqual(val.invalidas, {'coordenada_lat': 1, 'diametro_cm': 1})
+        self.assertEqual(val.exemplos, [(7, 'coordenada_lat', 'x'), (7, 'diametro_cm', '1,5')])
+
+    def test_linha_curta_e_colunas_em_outra_ordem(self):
+        reg, val = self.converter(['P02', '2025-02-15', 'Caatinga'])
+        self.assertEqual(reg, Registro('P02', '2025-02-15', 'Caatinga', '', None, None, 0, 0, None, None, None, None))
+        cols = ['especie', 'parcela', 'data', 'plantadas_vivas', 'plantadas_totais']
+        reg, val = self.converter(['Inga vera', 'P03', '2025-08-20', '4', '5'], cols)
+        self.assertEqual((reg.parcela, reg.especie, reg.vivas, reg.totais, reg.bioma), ('P03', 'Inga vera', 4, 5, ''))
+        self.assertEqual(val.total, 0)
+
+
+class AgregarParaleloTest(unittest.TestCase):
+
+    def setUp(self):
+        minimo = agregacao.TAMANHO_MINIMO_SHARD
+        agregacao.TAMANHO_MINIMO_SHARD = 0  # divide até arquivos pequenos
+        self.addCleanup(setattr, agregacao, 'TAMANHO_MINIMO_SHARD', minimo)
+
+    def test_mesmo_resultado_do_sequencial(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            # este modo não aceita quebras de linha entre aspas
+            path = comum.escrever_csv(os.path.join(tmp, 'm.csv'), comum.gerar_linhas(3000, semente=11, quebras=False))
+            esperado_val = RelatorioValidacao()
+            esperado = agregar(ler_registros(path, validacao=esperado_val), CHAVES)
+            for workers in (2, 3, 7):
+                val = RelatorioValidacao()
+                obtido = agregar_paralelo(path, CHAVES, workers, validacao=val)
+                self.assertEqual(comum.resumos(obtido), comum.resumos(esperado), workers)
+                self.assertEqual(val.resumo(), esperado_val.resumo(), workers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Base SQLite (scripts/base_monitoramento.py): agregados por SQL iguais aos do caminho em streaming."""
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing, redirect_stdout
+from unittest import mock
+
+import comum  # antes dos módulos de scripts/: acerta o sys.path
+import base_monitoramento
+from agregacao import CHAVE_ESPECIE_DATA, CHAVE_PARCELA_DATA, RelatorioValidacao, agregar, ler_registros
+from base_monitoramento import agregar_sql, conectar, importar, main, validacao_importada
+
+CHAVES = (CHAVE_PARCELA_DATA, CHAVE_ESPECIE_DATA)
+
+
+class BaseMonitoramentoTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.pasta = tmp.name
+        self.banco = os.path.join(tmp.name, 'base.sqlite')
+
+    def test_agregar_sql_igual_ao_streaming(self):
+        # os biomas gerados incluem um nome com vírgula
+        path = comum.escrever_csv(os.path.join(self.pasta, 'm.csv'), comum.gerar_linhas(600, semente=9))
+        esperado_val = RelatorioValidacao()
+        esperado = agregar(ler_registros(path, validacao=esperado_val), CHAVES)
+        with closing(conectar(self.banco)) as con:
+            importar(con, path)
+            obtido = agregar_sql(con, CHAVES, path)
+            val = validacao_importada(con, path)
+        self.assertEqual(comum.resumos(obtido), comum.resumos(esperado))
+        self.assertIn({'Mata Atlântica, litoral'}, [acc.biomas for acc in obtido[CHAVE_PARCELA_DATA].values()])
+        self.assertEqual(val.resumo(), esperado_val.resumo())
+
+    def test_filtro_por_arquivo_e_reimportacao(self):
+        a = comum.escrever_csv(os.path.join(self.pasta, 'a.csv'), comum.gerar_linhas(100, semente=1))
+        b = comum.escrever_csv(os.path.join(self.pasta, 'b.csv'), comum.gerar_linhas(50, semente=2))
+        with closing(conectar(self.banco)) as con:
+            self.assertEqual((importar(con, a), importar(con, b), importar(con, a)), (100, 50, 100))
+            obtido = agregar_sql(con, CHAVES, b)
+        esperado = agregar(ler_registros(b), CHAVES)
+        self.assertEqual(comum.resumos(obtido), comum.resumos(esperado))
+
+    def test_main_fecha_a_base_em_erro(self):
+        abertas = []
+
+        def conectar_registrando(path):
+            abertas.append(conectar(path))
+            return abertas[-1]
+
+        with mock.patch.object(base_monitoramento, 'conectar', conectar_registrando), redirect_stdout(io.StringIO()):
+            self.assertEqual(main(['--db', self.banco, 'import', os.path.join(self.pasta, 'nao_existe.csv')]), 2)
+        self.assertEqual(len(abertas), 1)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            abertas[0].execute('SELECT 1')
+
+
+if __name__ == '__main__':
+    unittest.main()
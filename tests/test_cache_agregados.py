@@ -0,0 +1,78 @@
+"""Cache incremental por grupo (scripts/cache_agregados.py): mesmo resultado de uma leitura completa."""
+import os
+import tempfile
+import unittest
+
+import comum  # antes dos módulos de scripts/: acerta o sys.path
+from agregacao import CHAVE_ESPECIE_DATA, CHAVE_PARCELA_DATA, RelatorioValidacao, agregar, ler_registros
+from cache_agregados import CacheAgregados
+
+CHAVES = (CHAVE_PARCELA_DATA, CHAVE_ESPECIE_DATA)
+
+
+class CacheAgregadosTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.csv = os.path.join(tmp.name, 'm.csv')
+        self.banco = os.path.join(tmp.name, 'cache.sqlite')
+        self.linhas = comum.gerar_linhas(800, semente=5)
+
+    def rodar(self):
+        """Agrega pelo cache e confere com a leitura completa; devolve (reaproveitados, recalculados)."""
+        comum.escrever_csv(self.csv, self.linhas)
+        esperado_val = RelatorioValidacao()
+        esperado = agregar(ler_registros(self.csv, validacao=esperado_val), CHAVES)
+        val = RelatorioValidacao()
+        with CacheAgregados(self.banco) as cache:
+            obtido = cache.agregar(self.csv, CHAVES, validacao=val)
+            estatistica = cache.reaproveitados, cache.recalculados
+        self.assertEqual(comum.estados(obtido), comum.estados(esperado))
+        self.assertEqual(val.resumo(), esperado_val.resumo())
+        return estatistica
+
+    def test_primeira_execucao_e_arquivo_igual(self):
+        reaproveitados, recalculados = self.rodar()
+        self.assertEqual(reaproveitados, 0)
+        self.assertEqual(self.rodar(), (recalculados, 0))
+
+    def test_acrescimo_de_campanha(self):
+        self.rodar()
+        novas = comum.gerar_linhas(40, semente=6)
+        for linha in novas:
+            linha[1] = '2026-08-30'
+        self.linhas += novas
+        reaproveitados, recalculados = self.rodar()
+        self.assertGreater(reaproveitados, 0)
+        self.assertGreater(recalculados, 0)
+
+    def test_edicao_no_meio(self):
+        self.rodar()
+        self.linhas[100][9] = 'xx'
+        self.linhas[300][7] = '3'
+        reaproveitados, recalculados = self.rodar()
+        self.assertGreater(reaproveitados, 0)
+        self.assertLessEqual(recalculados, 4)
+
+    def test_linha_removida_desloca_os_exemplos(self):
+        # células inválidas só depois da linha removida, em grupos que não mudam
+        for linha in self.linhas:
+            linha[3] = '-8.0'
+        self.linhas[600][3] = 'x'
+        self.linhas[700][3] = 'y'
+        self.rodar()
+        del self.linhas[10]
+        reaproveitados, _ = self.rodar()
+        self.assertGreater(reaproveitados, 0)
+        self.linhas.insert(0, list(self.linhas[50]))
+        self.rodar()
+
+    def test_grupo_removido(self):
+        self.rodar()
+        self.linhas = [linha for linha in self.linhas if linha[0] != 'P03']
+        self.rodar()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""Cache das malhas do IBGE contra um servidor HTTP local (scripts/cache_ibge.py)."""
+import gzip
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import cache_ibge  # noqa: E402
+from cache_ibge import CacheIBGE, ErroHTTP  # noqa: E402
+
+
+class _Servidor(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Manipulador)
+        self.recursos = {}       # caminho -> corpo (bytes)
+        self.falhas = {}         # caminho -> quantas respostas 500 antes do 200
+        self.requisicoes = []    # (caminho, If-None-Match)
+        self.gzip = False
+
+
+class _Manipulador(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, corpo=b'', cabecalhos=()):
+        self.send_response(status)
+        for nome, valor in cabecalhos:
+            self.send_header(nome, valor)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        srv = self.server
+        etag_cliente = self.headers.get('If-None-Match')
+        srv.requisicoes.append((self.path, etag_cliente))
+        if srv.falhas.get(self.path):
+            srv.falhas[self.path] -= 1
+            return self._responder(500)
+        corpo = srv.recursos.get(self.path.split('?', 1)[0])
+        if corpo is None:
+            return self._responder(404)
+        etag = '"%d"' % hash(corpo)
+        if etag_cliente == etag:
+            return self._responder(304, cabecalhos=[('ETag', etag)])
+        cabecalhos = [('ETag', etag)]
+        if srv.gzip and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            corpo = gzip.compress(corpo)
+            cabecalhos.append(('Content-Encoding', 'gzip'))
+        self._responder(200, corpo, cabecalhos)
+
+
+class CacheIBGETest(unittest.TestCase):
+
+    def setUp(self):
+        self.srv = _Servidor()
+        threading.Thread(target=self.srv.serve_forever, daemon=True).start()
+        self.addCleanup(self.srv.server_close)
+        self.addCleanup(self.srv.shutdown)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        espera = cache_ibge.ESPERA_INICIAL
+        cache_ibge.ESPERA_INICIAL = 0
+        self.addCleanup(setattr, cache_ibge, 'ESPERA_INICIAL', espera)
+
+    def cache(self, **kw):
+        base = 'http://127.0.0.1:%d/' % self.srv.server_address[1]
+        return CacheIBGE(pasta=os.path.join(self.tmp.name, 'cache'), base_url=base, **kw)
+
+    def test_revalida_com_etag_e_304(self):
+        self.srv.recursos['/malha/1'] = b'{"a": 1}'
+        self.assertEqual(self.cache(validade=0).obter('malha/1'), b'{"a": 1}')
+        cache = self.cache(validade=0)
+        self.assertEqual(cache.obter('malha/1'), b'{"a": 1}')
+        self.assertEqual((cache.baixados, cache.revalidados), (0, 1))
+        self.assertIsNone(self.srv.requisicoes[0][1])
+        self.assertIsNotNone(self.srv.requisicoes[1][1])
+
+    def test_dentro_da_validade_nao_acessa_a_rede(self):
+        self.srv.recursos['/malha/1'] = b'x'
+        self.cache().obter('malha/1')
+        cache = self.cache()
+        self.assertEqual(cache.obter('malha/1'), b'x')
+        self.assertEqual(cache.locais, 1)
+        self.assertEqual(len(self.srv.requisicoes), 1)
+
+    def test_conteudo_alterado_e_baixado_de_novo(self):
+        self.srv.recursos['/malha/1'] = b'v1'
+        self.cache(validade=0).obter('malha/1')
+        self.srv.recursos['/malha/1'] = b'v2'
+        cache = self.cache(validade=0)
+        self.assertEqual(cache.obter('malha/1'), b'v2')
+        self.assertEqual(cache.baixados, 1)
+
+    def test_gzip_descomprimido(self):
+        corpo = b'{"type": "FeatureCollection", "features": []}' * 100
+        self.srv.recursos['/malha/gz'] = corpo
+        self.srv.gzip = True
+        self.assertEqual(self.cache().obter('malha/gz'), corpo)
+
+    def test_repete_em_erro_500(self):
+        self.srv.recursos['/malha/1'] = b'ok'
+        self.srv.falhas['/malha/1'] = cache_ibge.TENTATIVAS - 1
+        self.assertEqual(self.cache().obter('malha/1'), b'ok')
+        self.assertEqual(len(self.srv.requisicoes), cache_ibge.TENTATIVAS)
+
+    def test_erro_500_persistente_sem_copia_local(self):
+        self.srv.falhas['/malha/1'] = cache_ibge.TENTATIVAS
+        with self.assertRaises(ErroHTTP) as erro:
+            self.cache().obter('malha/1')
+        self.assertEqual(erro.exception.codigo, 500)
+
+    def test_erro_500_persistente_usa_copia_vencida(self):
+        self.srv.recursos['/malha/1'] = b'antigo'
+        self.cache().obter('malha/1')
+        self.srv.falhas['/malha/1'] = cache_ibge.TENTATIVAS
+        self.assertEqual(self.cache(validade=0).obter('malha/1'), b'antigo')
+
+    def test_retomada_baixa_so_o_que_falta(self):
+        for i in range(5):
+            self.srv.recursos['/malha/%d' % i] = b'm%d' % i
+        cache = self.cache()
+        for i in range(3):  # execução interrompida depois de 3 malhas
+            cache.obter('malha/%d' % i)
+        del self.srv.requisicoes[:]
+        cache = self.cache()
+        self.assertEqual([cache.obter('malha/%d' % i) for i in range(5)], [b'm%d' % i for i in range(5)])
+        self.assertEqual(sorted(p for p, _ in self.srv.requisicoes), ['/malha/3', '/malha/4'])
+        self.assertEqual((cache.locais, cache.baixados), (3, 2))
+
+    def test_espelho_offline(self):
+        self.srv.recursos['/api/malha/7'] = b'{"m": 7}'
+        self.srv.recursos['/api/malha/8'] = b'{"m": 8}'
+        cache = self.cache()
+        cache.obter('api/malha/7?formato=json')
+        cache.obter('api/malha/8')
+        espelho = os.path.join(self.tmp.name, 'espelho')
+        self.assertEqual(cache.espelhar(espelho), 2)
+        offline = self.cache(espelho=espelho)
+        self.assertEqual(offline.obter_json('api/malha/7?formato=json'), {'m': 7})
+        self.assertEqual(len(self.srv.requisicoes), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
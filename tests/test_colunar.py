@@ -0,0 +1,82 @@
+"""Backend colunar opcional (scripts/colunar.py): mesmo resultado do caminho em streaming."""
+import math
+import os
+import tempfile
+import unittest
+
+import comum  # antes dos módulos de scripts/: acerta o sys.path
+import colunar
+from agregacao import CHAVE_ESPECIE_DATA, CHAVE_PARCELA_DATA, RelatorioValidacao, agregar, ler_registros
+
+CHAVES = (CHAVE_PARCELA_DATA, CHAVE_ESPECIE_DATA)
+
+
+@unittest.skipIf(colunar.np is None, 'NumPy não instalado')
+class ColunarTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.pasta = tmp.name
+
+    def csv(self, nome, texto):
+        path = os.path.join(self.pasta, nome)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(texto)
+        return path
+
+    def texto_gerado(self, n=600, semente=7):
+        path = comum.escrever_csv(os.path.join(self.pasta, 'base.csv'), comum.gerar_linhas(n, semente))
+        with open(path, encoding='utf-8', newline='') as f:
+            return f.read()
+
+    def assertEquivalente(self, path):
+        esperado_val = RelatorioValidacao()
+        esperado = agregar(ler_registros(path, validacao=esperado_val), CHAVES)
+        val = RelatorioValidacao()
+        obtido = colunar.agregar_colunar(path, CHAVES, val)
+        self.assertEqual(comum.estados(obtido), comum.estados(esperado))
+        self.assertEqual(val.resumo(), esperado_val.resumo())
+
+        indicadores = colunar.indicadores_colunar(path)
+        grupos = esperado[CHAVE_PARCELA_DATA]
+        self.assertEqual(list(indicadores), list(grupos))
+        for k, ind in indicadores.items():
+            acc = grupos[k]
+            for campo in colunar.IndicadoresGrupo._fields:
+                if campo == 'shannon':  # somado em outra ordem
+                    self.assertTrue(math.isclose(ind.shannon, acc.shannon, rel_tol=1e-12, abs_tol=1e-15), k)
+                else:
+                    self.assertEqual(getattr(ind, campo), getattr(acc, campo), (k, campo))
+
+    def test_amostra(self):
+        self.assertEquivalente(comum.AMOSTRA)
+
+    def test_gerado_com_aspas_quebras_e_invalidas(self):
+        self.assertEquivalente(self.csv('m.csv', self.texto_gerado()))
+
+    def test_blocos_pequenos(self):
+        path = self.csv('m.csv', self.texto_gerado())
+        tamanho = colunar.TAMANHO_BLOCO
+        colunar.TAMANHO_BLOCO = 300
+        self.addCleanup(setattr, colunar, 'TAMANHO_BLOCO', tamanho)
+        self.assertEquivalente(path)
+
+    def test_crlf_e_sem_quebra_final(self):
+        texto = self.texto_gerado(200)
+        self.assertEquivalente(self.csv('crlf.csv', texto.replace('\n', '\r\n')))
+        self.assertEquivalente(self.csv('sem_nl.csv', texto.rstrip('\n')))
+
+    def test_aspas_no_meio_do_campo(self):
+        texto = self.texto_gerado(200).replace(',ok,', ',Boa "san"idade,', 3)
+        self.assertEquivalente(self.csv('aspas.csv', texto))
+
+    def test_linhas_curtas_e_numeros_entre_aspas(self):
+        linhas = self.texto_gerado(100).split('\n')
+        linhas[5] = 'P01,2025-02-15,Caatinga'
+        linhas[9] = 'P03,2025-02-15,Caatinga,-8.0,-35.0,"Inga, ""vera""",Ingá,"28"," 35",1.1,"1.6",32,40,,'
+        self.assertEquivalente(self.csv('curtas.csv', '\n'.join(linhas)))
+
+
+if __name__ == '__main__':
+    unittest.main()
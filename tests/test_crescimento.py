@@ -0,0 +1,68 @@
+"""Crescimento entre campanhas (scripts/crescimento.py): intervalos reais, regressão e taxas indefinidas."""
+import math
+import unittest
+
+import comum  # noqa: F401  antes dos módulos de scripts/: acerta o sys.path
+from crescimento import DIAS_MES, formatar, meses_desde, regressao, regressao_movel, taxas
+from gerar_visuais import METRICAS_PARCELA, SerieTemporal, _secao_incrementos, calcular_incrementos
+
+
+def serie(datas, alturas):
+    s = SerieTemporal(METRICAS_PARCELA)
+    for d, h in zip(datas, alturas):
+        s.adicionar(d, **dict(dict.fromkeys(METRICAS_PARCELA, 0.0), altura_media=h, diametro_medio=h * 2))
+    return s
+
+
+class TaxasTest(unittest.TestCase):
+
+    def test_intervalos_irregulares(self):
+        datas = ['2024-01-01', '2024-04-01', '2025-01-01', '2025-02-15']
+        alturas = [1.0 + 0.1 * m for m in meses_desde(datas)]  # 0,1 m/mês, com intervalos de 3, 9 e 1,5 meses
+        t = taxas(serie(datas, alturas), 'altura_media')
+        self.assertAlmostEqual(t['meses'][0], 91 / DIAS_MES)
+        for taxa in t['taxa'] + t['suavizada']:
+            self.assertAlmostEqual(taxa, 0.1)
+        self.assertAlmostEqual(t['tendencia'], 0.1)
+        self.assertAlmostEqual(t['r2'], 1.0)
+
+    def test_data_invalida_e_intervalo_nulo(self):
+        # '2024-13-01' não é data; '2025-01-01T10:00' cai no mesmo dia da campanha anterior
+        datas = ['2024-01-01', '2024-13-01', '2025-01-01', '2025-01-01T10:00', '2025-07-01']
+        t = taxas(serie(datas, [1.0, 1.5, 2.0, 2.0, 2.5]), 'altura_media')
+        self.assertTrue(all(math.isnan(v) for v in t['taxa'][:3]))
+        self.assertAlmostEqual(t['taxa'][3], 0.5 / (181 / DIAS_MES))
+        self.assertIsNotNone(t['tendencia'])  # a data inválida fica fora da regressão
+
+    def test_serie_curta(self):
+        t = taxas(serie(['2024-01-01'], [1.0]), 'altura_media')
+        self.assertEqual((t['taxa'], t['suavizada'], t['tendencia'], t['r2']), ([], [], None, None))
+
+    def test_regressao(self):
+        self.assertEqual(regressao([0, 1, 2], [1, 3, 5]), (2.0, 1.0))
+        self.assertEqual(regressao([0, 1, 2], [4, 4, 4]), (0.0, 1.0))
+        self.assertIsNone(regressao([1, 1], [2, 3]))
+        self.assertIsNone(regressao([0, math.nan], [1, 2]))
+        inclinacoes = regressao_movel([0, 1, 2, 3, 4, 5], [0, 1, 2, 3, 5, 7], janela=3)
+        self.assertEqual(len(inclinacoes), 5)
+        self.assertAlmostEqual(inclinacoes[0], 1.0)
+        self.assertAlmostEqual(inclinacoes[-1], 2.0)
+
+    def test_formatar(self):
+        self.assertEqual(formatar(0.12345, '.3f'), '0.123')
+        self.assertEqual(formatar(math.nan, '.3f'), '–')
+        self.assertEqual(formatar(None, '+.2f'), '–')
+
+
+class SecaoIncrementosTest(unittest.TestCase):
+
+    def test_taxa_indefinida_aparece_como_traco(self):
+        series = {'P01': serie(['2024-01-01', '2024-01-01T09:00', '2024-07-01'], [1.0, 1.2, 1.8])}
+        html = _secao_incrementos(calcular_incrementos(series), {}, {})
+        self.assertNotIn('nan', html.lower())
+        self.assertIn('–', html)
+        self.assertIn('P01', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+"""Simplificação das camadas de limites (scripts/geometria.py)."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import comum  # antes dos módulos de scripts/: acerta o sys.path
+import geometria
+from geometria import (douglas_peucker, niveis_simplificados, niveis_usados, simplificar_colecao, topologia,
+                       zooms_usados)
+
+MUNICIPIOS = os.path.join(comum.RAIZ, 'dados', 'geo', 'limite_municipios_pe.geojson')
+
+
+def poligono(anel, **props):
+    return {'type': 'Feature', 'properties': props, 'geometry': {'type': 'Polygon', 'coordinates': [anel]}}
+
+
+def vizinhos():
+    """Dois quadrados lado a lado com uma divisa sinuosa em x ≈ 1."""
+    divisa = [[1 + 0.001 * (i % 2), i / 10] for i in range(11)]  # de (1, 0) a (1, 1), ziguezague
+    esquerda = [[0, 0]] + divisa + [[0, 1], [0, 0]]
+    direita = [[2, 0], [2, 1]] + divisa[::-1] + [[2, 0]]
+    return {'type': 'FeatureCollection', 'features': [poligono(esquerda, nome='E'), poligono(direita, nome='D')]}
+
+
+def na_divisa(anel):
+    return {tuple(p) for p in anel if 0.9 < p[0] < 1.1}
+
+
+class SimplificacaoTest(unittest.TestCase):
+
+    def test_douglas_peucker(self):
+        reta = [(i, 0.0001 * (i % 2)) for i in range(10)]
+        self.assertEqual(douglas_peucker(reta, 0.01), [reta[0], reta[-1]])
+        self.assertEqual(douglas_peucker(reta, 0.00001), reta)
+        self.assertEqual(len(douglas_peucker(reta, 0.01, manter_meio=True)), 3)
+
+    def test_divisa_compartilhada_igual_nos_dois_lados(self):
+        colecao = vizinhos()
+        simples = simplificar_colecao(colecao, tolerancia=0.01, casas=4)
+        esquerda, direita = (f['geometry']['coordinates'][0] for f in simples['features'])
+        self.assertEqual(na_divisa(esquerda), na_divisa(direita))
+        self.assertLess(len(na_divisa(esquerda)), 11)
+        for anel in (esquerda, direita):
+            self.assertEqual(anel[0], anel[-1])
+            self.assertGreaterEqual(len(anel), 4)
+        self.assertEqual(colecao['features'][0]['geometry']['coordinates'][0][1], [1, 0.0])  # entrada intacta
+
+
+class NiveisTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.origem = os.path.join(tmp.name, 'vizinhos.geojson')
+        with open(self.origem, 'w', encoding='utf-8') as f:
+            json.dump(vizinhos(), f)
+
+    def niveis_em_cache(self):
+        with open(geometria.caminho_cache(self.origem), encoding='utf-8') as f:
+            return sorted(json.load(f)['niveis'], key=int)
+
+    def test_zooms_usados(self):
+        self.assertEqual(zooms_usados((8, 10, 12), 7, 18), [8, 10, 12])
+        self.assertEqual(zooms_usados((8, 10, 12), 11, 18), [10, 12])
+        self.assertEqual(zooms_usados((8, 10, 12), 13, 18), [12])
+        self.assertEqual(zooms_usados((8, 10, 12), 7, 9), [8])
+        self.assertEqual(list(niveis_usados({'8': 'a', '12': 'b'}, 12, 18)), ['12'])
+
+    def test_cache_guarda_so_os_niveis_pedidos(self):
+        so_12 = niveis_simplificados(self.origem, (12,))
+        self.assertEqual(self.niveis_em_cache(), ['12'])
+        todos = niveis_simplificados(self.origem, (8, 10, 12))
+        self.assertEqual(list(todos), ['8', '10', '12'])
+        self.assertEqual(todos['12'], so_12['12'])
+        self.assertEqual(self.niveis_em_cache(), ['8', '10', '12'])
+
+    def test_origem_alterada_invalida_o_cache(self):
+        niveis_simplificados(self.origem, (8, 10, 12))
+        with open(self.origem, 'w', encoding='utf-8') as f:
+            json.dump({'type': 'FeatureCollection', 'features': vizinhos()['features'][:1]}, f)
+        self.assertEqual(len(niveis_simplificados(self.origem, (12,))['12']['features']), 1)
+        self.assertEqual(self.niveis_em_cache(), ['12'])
+
+    @unittest.skipUnless(os.path.exists(MUNICIPIOS), 'sem a malha de municípios de PE')
+    def test_municipios_menores_por_nivel(self):
+        origem = os.path.join(os.path.dirname(self.origem), 'municipios.geojson')
+        shutil.copyfile(MUNICIPIOS, origem)
+        versoes = niveis_simplificados(origem)
+        tamanhos = [len(json.dumps(versoes[z])) for z in ('8', '10', '12')]
+        self.assertEqual(tamanhos, sorted(tamanhos))
+        self.assertLess(tamanhos[-1], os.path.getsize(MUNICIPIOS))
+
+
+def decodificar(topo, nome):
+    """Coordenadas de cada (Multi)Polygon do objeto `nome`, como faz o DECODIFICADOR_TOPOJSON do mapa."""
+    (sx, sy), (tx, ty) = topo['transform']['scale'], topo['transform']['translate']
+    arcos = []
+    for arco in topo['arcs']:
+        x = y = 0
+        pontos = []
+        for dx, dy in arco:
+            x, y = x + dx, y + dy
+            pontos.append((x * sx + tx, y * sy + ty))
+        arcos.append(pontos)
+
+    def linha(ids):
+        pontos = []
+        for k, i in enumerate(ids):
+            a = arcos[~i][::-1] if i < 0 else arcos[i]
+            pontos.extend(a[1:] if k else a)
+        return pontos
+    def aneis(lista):
+        return [linha(ids) for ids in lista]
+    return [aneis(g['arcs']) if g['type'] == 'Polygon' else [aneis(p) for p in g['arcs']]
+            for g in topo['objects'][nome]['geometries']]
+
+
+def mesmo_anel(a, b, tol):
+    """`a` e `b` (fechados) são o mesmo anel, a menos do ponto de partida e de `tol` por coordenada."""
+    a, b = a[:-1], b[:-1]
+    if len(a) != len(b):
+        return False
+    return any(all(abs(a[(k + i) % len(a)][0] - q[0]) <= tol and abs(a[(k + i) % len(a)][1] - q[1]) <= tol
+                   for i, q in enumerate(b))
+               for k in range(len(a)))
+
+
+class TopologiaTest(unittest.TestCase):
+
+    def test_divisa_vira_um_arco_compartilhado(self):
+        topo = topologia({'vizinhos': vizinhos()})
+        esquerda, direita = (g['arcs'][0] for g in topo['objects']['vizinhos']['geometries'])
+        compartilhados = {i if i >= 0 else ~i for i in esquerda} & {i if i >= 0 else ~i for i in direita}
+        self.assertEqual(len(compartilhados), 1)
+        arco = compartilhados.pop()
+        self.assertEqual(len(topo['arcs'][arco]), 11)
+        # o mesmo arco é percorrido em sentidos opostos pelos dois polígonos (~i = invertido)
+        self.assertEqual({arco in esquerda, arco in direita}, {True, False})
+        self.assertEqual({~arco in esquerda, ~arco in direita}, {True, False})
+
+    def test_diferencas_inteiras_e_ida_e_volta(self):
+        colecao = vizinhos()
+        topo = topologia({'vizinhos': colecao, 'outra': {'type': 'FeatureCollection', 'features': [
+            poligono([[3, 3], [4, 3], [4, 4], [3, 3]])]}}, quantizacao=10_000)
+        for arco in topo['arcs']:
+            self.assertTrue(all(isinstance(v, int) for d in arco for v in d))
+            self.assertTrue(all(abs(dx) < 10_000 and abs(dy) < 10_000 for dx, dy in arco))
+        tol = max(topo['transform']['scale'])
+        for geom, feature in zip(decodificar(topo, 'vizinhos'), colecao['features']):
+            self.assertTrue(mesmo_anel(geom[0], feature['geometry']['coordinates'][0], tol))
+        self.assertTrue(mesmo_anel(decodificar(topo, 'outra')[0][0], [[3, 3], [4, 3], [4, 4], [3, 3]], tol))
+        self.assertEqual([g['properties'] for g in topo['objects']['vizinhos']['geometries']],
+                         [{'nome': 'E'}, {'nome': 'D'}])
+
+    @unittest.skipUnless(os.path.exists(MUNICIPIOS), 'sem a malha de municípios de PE')
+    def test_municipios_menor_que_geojson(self):
+        with open(MUNICIPIOS, encoding='utf-8') as f:
+            municipios = json.load(f)
+        simples = simplificar_colecao(municipios, 0.001, 4)
+        topo = topologia({'municipios': simples})
+        self.assertLess(len(json.dumps(topo, separators=(',', ':'))),
+                        len(json.dumps(simples, separators=(',', ':'))) * 0.7)
+        tol = max(topo['transform']['scale'])
+        for geom, feature in zip(decodificar(topo, 'municipios'), simples['features']):
+            g = feature['geometry']
+            aneis = g['coordinates'] if g['type'] == 'Polygon' else [a for p in g['coordinates'] for a in p]
+            decodificados = geom if g['type'] == 'Polygon' else [a for p in geom for a in p]
+            self.assertEqual(len(decodificados), len(aneis))
+            for a, b in zip(decodificados, aneis):
+                self.assertTrue(mesmo_anel(a, b, tol))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Decimação e faixas dos gráficos do relatório (LTTB, min-max e percentis de gerar_visuais.py)."""
+import math
+import unittest
+
+import comum  # noqa: F401  antes dos módulos de scripts/: acerta o sys.path
+from gerar_visuais import PIXELS_ROTULO_X, decimar, faixa_percentis, lttb, minmax, rotulos_x
+
+
+def serie(n, pico=None):
+    pontos = [(i, math.sin(i / 50)) for i in range(n)]
+    if pico is not None:
+        pontos[pico] = (pico, 10.0)
+    return pontos
+
+
+class DecimacaoTest(unittest.TestCase):
+
+    def assertIndicesValidos(self, indices, n, limite):
+        self.assertLessEqual(len(indices), limite)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], n - 1)
+        self.assertEqual(indices, sorted(set(indices)))
+
+    def test_lttb(self):
+        pontos = serie(1000, pico=437)
+        indices = lttb(pontos, 50)
+        self.assertEqual(len(indices), 50)
+        self.assertIndicesValidos(indices, 1000, 50)
+        self.assertIn(437, indices)
+
+    def test_lttb_serie_curta_fica_inteira(self):
+        self.assertEqual(lttb(serie(10), 50), list(range(10)))
+        self.assertEqual(lttb(serie(10), 2), list(range(10)))
+
+    def test_minmax_guarda_os_extremos_de_cada_balde(self):
+        pontos = serie(1000, pico=501)
+        indices = minmax(pontos, 20)
+        self.assertIn(501, indices)
+        self.assertIn(min(range(1000), key=lambda i: pontos[i][1]), indices)
+        self.assertEqual(indices, sorted(set(indices)))
+
+    def test_decimar(self):
+        for n in (100, 999, 20_000):  # sem decimação, só LTTB, min-max + LTTB
+            indices = decimar(serie(n, pico=n // 3), orcamento=200)
+            self.assertIndicesValidos(indices, n, 200)
+            self.assertIn(n // 3, indices)
+        self.assertEqual(decimar(serie(100), orcamento=200), list(range(100)))
+
+
+class EixoEFaixaTest(unittest.TestCase):
+
+    def test_rotulos_x_espacados(self):
+        largura = 520
+        maximo = (largura - 80) // PIXELS_ROTULO_X + 1
+        self.assertEqual(list(rotulos_x(['d'] * 3, largura)), [0, 1, 2])
+        indices = list(rotulos_x(['d'] * 200, largura))
+        self.assertLessEqual(len(indices), maximo)
+        self.assertEqual(indices[0], 0)
+
+    def test_faixa_percentis(self):
+        alinhadas = [[1, None, 3], [2, None, None], [3, None, 5]]
+        p10, p50, p90 = faixa_percentis(alinhadas, vazio=0)
+        self.assertEqual(p50, [2, 2, 4])  # data sem medição repete a anterior
+        self.assertAlmostEqual(p10[0], 1.2)
+        self.assertAlmostEqual(p90[2], 4.8)
+        self.assertEqual(faixa_percentis([[None], [None]], vazio=7), ([7], [7], [7]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""Etapas de build em grafo (scripts/grafo.py): pula o que está atualizado, cancela só o que depende da falha."""
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import comum  # noqa: F401  antes dos módulos de scripts/: acerta o sys.path
+from grafo import Etapa, Grafo
+from manifesto import gravar_se_mudou
+
+
+class GrafoTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.pasta = tmp.name
+        self.estado = os.path.join(tmp.name, '.etapas.json')
+        self.entrada = os.path.join(tmp.name, 'entrada.csv')
+        self.saida = os.path.join(tmp.name, 'relatorio.html')
+        gravar_se_mudou(self.entrada, b'a,b\n1,2\n')
+        self.rodadas = []
+
+    def grafo(self, parametros=None):
+        """ler -> relatorio (usa os dados em memória de ler) e mapa, independente."""
+        def ler(contexto):
+            self.rodadas.append('ler')
+            with open(self.entrada, 'rb') as f:
+                contexto['dados'] = f.read()
+
+        def relatorio(contexto):
+            self.rodadas.append('relatorio')
+            gravar_se_mudou(self.saida, contexto['dados'].upper())
+
+        def mapa(contexto):
+            self.rodadas.append('mapa')
+
+        g = Grafo(self.estado, workers=2)
+        g.adicionar(Etapa('ler', ler, entradas=[self.entrada]))
+        g.adicionar(Etapa('relatorio', relatorio, entradas=[self.entrada], saidas=[self.saida], usa=['ler'],
+                          parametros=parametros))
+        g.adicionar(Etapa('mapa', mapa, sempre=True))
+        return g
+
+    def test_segunda_execucao_pula_o_que_nao_mudou(self):
+        self.assertEqual(self.grafo().executar(), {'ler': 'executada', 'relatorio': 'executada', 'mapa': 'executada'})
+        self.rodadas.clear()
+        self.assertEqual(self.grafo().executar(), {'ler': 'atualizada', 'relatorio': 'atualizada', 'mapa': 'executada'})
+        self.assertEqual(self.rodadas, ['mapa'])
+
+    def test_mudanca_reexecuta_e_roda_dependencia_em_memoria(self):
+        self.grafo().executar()
+        for mudar in (lambda: gravar_se_mudou(self.entrada, b'a,b\n3,4\n'),  # entrada
+                      lambda: os.remove(self.saida),                       # saída apagada
+                      lambda: gravar_se_mudou(self.saida, b'editado')):    # saída alterada
+            mudar()
+            self.rodadas.clear()
+            self.grafo().executar()
+            self.assertEqual(sorted(self.rodadas), ['ler', 'mapa', 'relatorio'])
+            with open(self.entrada, 'rb') as f, open(self.saida, 'rb') as g:
+                self.assertEqual(g.read(), f.read().upper())
+        self.rodadas.clear()
+        self.grafo(parametros={'zoom': 12}).executar()
+        self.assertIn('relatorio', self.rodadas)
+
+    def test_falha_cancela_so_os_dependentes(self):
+        def falhar(contexto):
+            raise RuntimeError('sem rede')
+
+        g = self.grafo()
+        g.adicionar(Etapa('baixar', falhar, sempre=True))
+        g.adicionar(Etapa('publicar', lambda contexto: None, depende=['baixar', 'relatorio']))
+        with redirect_stdout(io.StringIO()) as saida:
+            situacao = g.executar()
+        self.assertEqual((situacao['baixar'], situacao['publicar'], situacao['relatorio']),
+                         ('falhou', 'cancelada', 'executada'))
+        self.assertIn('sem rede', saida.getvalue())
+
+    def test_ciclo_e_dependencia_inexistente(self):
+        g = Grafo(self.estado)
+        g.adicionar(Etapa('a', lambda contexto: None, depende=['b']))
+        with self.assertRaisesRegex(ValueError, 'inexistentes'):
+            g.executar()
+        g.adicionar(Etapa('b', lambda contexto: None, depende=['a']))
+        with self.assertRaisesRegex(ValueError, 'Ciclo'):
+            g.executar()
+        with self.assertRaises(ValueError):
+            g.adicionar(Etapa('a', lambda contexto: None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""Índice espacial STR-tree (scripts/indice_espacial.py): mesmas respostas de uma varredura completa."""
+import json
+import os
+import random
+import unittest
+
+import comum  # antes dos módulos de scripts/: acerta o sys.path
+from agregacao import RelatorioValidacao
+from indice_espacial import IndiceEspacial, _poligonos, conferir_parcelas, ponto_em_poligono
+
+MUNICIPIOS = os.path.join(comum.RAIZ, 'dados', 'geo', 'limite_municipios_pe.geojson')
+
+
+def quadrado(x, y, lado=1.0):
+    return [[x, y], [x + lado, y], [x + lado, y + lado], [x, y + lado], [x, y]]
+
+
+def grade(n):
+    """n×n quadrados unitários; o do canto (0, 0) tem um buraco no meio."""
+    features = []
+    for i in range(n):
+        for j in range(n):
+            aneis = [quadrado(i, j)]
+            if (i, j) == (0, 0):
+                aneis.append(quadrado(0.4, 0.4, 0.2))
+            features.append({'type': 'Feature', 'properties': {'id': f'{i}-{j}'},
+                             'geometry': {'type': 'Polygon', 'coordinates': aneis}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def contem(colecao, x, y):
+    """Índices das feições que contêm o ponto (varredura completa)."""
+    return {i for i, f in enumerate(colecao['features'])
+            if any(ponto_em_poligono(x, y, aneis) for aneis in _poligonos(f['geometry']))}
+
+
+class IndiceEspacialTest(unittest.TestCase):
+
+    def assertMesmaResposta(self, colecao, indice, pontos):
+        props = [f.get('properties') or {} for f in colecao['features']]
+        for x, y in pontos:
+            esperado = contem(colecao, x, y)
+            obtido = indice.localizar(x, y)
+            if esperado:
+                self.assertIn(props.index(obtido), esperado, (x, y))
+            else:
+                self.assertIsNone(obtido, (x, y))
+
+    def test_grade_com_buraco(self):
+        colecao = grade(20)
+        indice = IndiceEspacial(colecao, capacidade=4)
+        rnd = random.Random(3)
+        pontos = [(rnd.uniform(-1, 21), rnd.uniform(-1, 21)) for _ in range(500)]
+        self.assertMesmaResposta(colecao, indice, pontos)
+        self.assertEqual(indice.localizar(5.5, 7.5), {'id': '5-7'})
+        self.assertIsNone(indice.localizar(0.5, 0.5))  # no buraco
+        self.assertEqual(indice.localizar(0.2, 0.2), {'id': '0-0'})
+        self.assertIsNone(indice.localizar(25, 25))
+        self.assertLessEqual(len(list(indice.candidatos(5.5, 7.5))), 4)
+
+    def test_colecao_vazia(self):
+        self.assertIsNone(IndiceEspacial({'type': 'FeatureCollection', 'features': []}).localizar(0, 0))
+
+    @unittest.skipUnless(os.path.exists(MUNICIPIOS), 'sem a malha de municípios de PE')
+    def test_municipios_de_pe(self):
+        with open(MUNICIPIOS, encoding='utf-8') as f:
+            colecao = json.load(f)
+        indice = IndiceEspacial(colecao)
+        rnd = random.Random(5)
+        pontos = [(rnd.uniform(-41.4, -34.8), rnd.uniform(-9.5, -7.3)) for _ in range(150)]
+        self.assertMesmaResposta(colecao, indice, pontos)
+
+
+class _LocalizadorFixo:
+    def __init__(self, respostas):
+        self.respostas = respostas
+
+    def localizar(self, lat, lon):
+        return self.respostas[(lat, lon)]
+
+
+class ConferirParcelasTest(unittest.TestCase):
+
+    def test_divergencia_de_bioma(self):
+        coordenadas = {'P01': (-8.0, -35.0), 'P02': (-8.5, -38.0), 'P03': (-9.0, -40.0)}
+        biomas = {'P01': {'Mata Atlantica'}, 'P02': {'Mata Atlântica'}, 'P03': set()}
+        localizador = _LocalizadorFixo({(-8.0, -35.0): ('2611606', 'Mata Atlântica'),
+                                        (-8.5, -38.0): ('2613008', 'Caatinga'),
+                                        (-9.0, -40.0): ('2611101', 'Caatinga')})
+        validacao = RelatorioValidacao()
+        linhas = conferir_parcelas(coordenadas, biomas, localizador, validacao)
+        self.assertEqual([linha[-1] for linha in linhas], ['sim', 'nao', ''])
+        self.assertEqual(validacao.divergencias, [('P02', 'bioma', 'Mata Atlântica', 'Caatinga')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Hashes e gravações do build (scripts/manifesto.py): só tocam o destino quando o conteúdo muda."""
+import os
+import tempfile
+import unittest
+
+import comum  # noqa: F401  antes dos módulos de scripts/: acerta o sys.path
+from manifesto import copiar_se_mudou, gravar_se_mudou, hash_arquivo, sincronizar_pasta
+
+
+class ManifestoTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.pasta = tmp.name
+
+    def caminho(self, *partes):
+        return os.path.join(self.pasta, *partes)
+
+    def test_hash_acompanha_o_conteudo(self):
+        path = self.caminho('a.txt')
+        self.assertIsNone(hash_arquivo(path))
+        gravar_se_mudou(path, b'um')
+        antes = hash_arquivo(path)
+        self.assertEqual(hash_arquivo(path), antes)
+        gravar_se_mudou(path, b'dois')
+        self.assertNotEqual(hash_arquivo(path), antes)
+        gravar_se_mudou(self.caminho('b.txt'), b'um')
+        self.assertEqual(hash_arquivo(self.caminho('b.txt')), antes)
+
+    def test_gravar_preserva_arquivo_igual(self):
+        path = self.caminho('sub', 'a.html')
+        self.assertTrue(gravar_se_mudou(path, b'<html>'))
+        os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+        self.assertFalse(gravar_se_mudou(path, b'<html>'))
+        self.assertEqual(os.stat(path).st_mtime_ns, 1_000_000_000)
+        self.assertTrue(gravar_se_mudou(path, b'<html/>'))
+        self.assertEqual(os.listdir(self.caminho('sub')), ['a.html'])  # sem temporários
+
+    def test_copiar_se_mudou(self):
+        origem, destino = self.caminho('o.json'), self.caminho('d', 'o.json')
+        gravar_se_mudou(origem, b'{}')
+        self.assertTrue(copiar_se_mudou(origem, destino))
+        self.assertFalse(copiar_se_mudou(origem, destino))
+        gravar_se_mudou(origem, b'{"a": 1}')
+        self.assertTrue(copiar_se_mudou(origem, destino))
+        with open(destino, 'rb') as f:
+            self.assertEqual(f.read(), b'{"a": 1}')
+
+    def test_sincronizar_pasta(self):
+        origem, destino = self.caminho('saidas'), self.caminho('docs')
+        gravar_se_mudou(os.path.join(origem, 'index.html'), b'a')
+        gravar_se_mudou(os.path.join(origem, 'geo', 'x.json'), b'b')
+        self.assertEqual(sincronizar_pasta(origem, destino), (2, 0))
+        self.assertEqual(sincronizar_pasta(origem, destino), (0, 0))
+        os.remove(os.path.join(origem, 'geo', 'x.json'))
+        gravar_se_mudou(os.path.join(origem, 'index.html'), b'c')
+        self.assertEqual(sincronizar_pasta(origem, destino), (1, 1))
+        self.assertEqual(os.listdir(destino), ['index.html'])  # pasta vazia removida
+
+
+if __name__ == '__main__':
+    unittest.main()
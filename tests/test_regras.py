@@ -0,0 +1,88 @@
+"""Regras do PRAD (scripts/regras.py): alertas, tendências e episódios da varredura por colunas."""
+import unittest
+
+import comum  # noqa: F401  antes dos módulos de scripts/: acerta o sys.path
+from gerar_visuais import METRICAS_PARCELA, SerieTemporal
+from regras import Avaliador, avaliar, indice_alertas
+
+DATAS = ['2024-01-15', '2024-07-15', '2025-01-15', '2025-07-15', '2026-01-15']
+SAUDAVEL = {'sobrevivencia': 90.0, 'cobertura_copa': 60.0, 'cobertura_invasoras': 10.0, 'riqueza': 8.0,
+            'shannon': 2.0, 'altura_media': 3.0, 'diametro_medio': 5.0, 'razao_copa_invasoras': 6.0}
+
+
+def serie(datas=DATAS, **colunas):
+    """Série saudável em todas as `datas`, com as métricas de `colunas` (uma lista por métrica) trocadas."""
+    s = SerieTemporal(METRICAS_PARCELA)
+    for k, d in enumerate(datas):
+        s.adicionar(d, **dict(SAUDAVEL, **{m: valores[k] for m, valores in colunas.items()}))
+    return s
+
+
+class AlertasTest(unittest.TestCase):
+
+    def test_parcela_saudavel_sem_alertas(self):
+        avaliacao = avaliar({'P01': serie()})
+        self.assertEqual(avaliacao.episodios, [])
+        self.assertEqual(avaliacao.alertas(DATAS[0]), [])
+        self.assertEqual({c['estagio'] for c in avaliacao.classificacao(DATAS[-1]).values()}, {'Avançado'})
+
+    def test_regra_so_a_partir_da_campanha(self):
+        # copa baixa desde o início; a regra de copa só vale a partir da 3ª campanha
+        avaliacao = avaliar({'P01': serie(cobertura_copa=[30.0] * 5)})
+        self.assertEqual([a['categoria'] for a in avaliacao.alertas(DATAS[1])], [])
+        alertas = avaliacao.alertas(DATAS[2])
+        self.assertEqual([(a['categoria'], a['desde']) for a in alertas], [('Copa', DATAS[2])])
+        self.assertIn('30.0%', alertas[0]['mensagem'])
+
+    def test_episodios_resolvidos_e_reabertos(self):
+        avaliacao = avaliar({'P01': serie(sobrevivencia=[90.0, 60.0, 65.0, 90.0, 50.0])})
+        episodios = [(ep['inicio'], ep['fim'], ep['campanhas'])
+                     for ep in avaliacao.historico('P01', 'Sobrevivência')]
+        self.assertEqual(episodios, [(DATAS[1], DATAS[3], 2), (DATAS[4], None, 1)])
+        self.assertEqual([a['desde'] for a in avaliacao.alertas(DATAS[2])], [DATAS[1]])
+        self.assertEqual(avaliacao.historico('P02'), [])
+        criticos = [(c, n) for _, _, c, _, _, n, _ in avaliacao.trajetoria()]
+        self.assertEqual(criticos, [(1, 0), (2, 1), (3, 1), (4, 0), (5, 1)])
+
+    def test_episodio_nao_atravessa_parcelas(self):
+        baixa = [50.0] * 5
+        avaliacao = avaliar({'P01': serie(sobrevivencia=baixa), 'P02': serie(DATAS[2:], sobrevivencia=baixa[2:])})
+        self.assertEqual([(ep['parcela'], ep['inicio'], ep['campanhas']) for ep in avaliacao.episodios],
+                         [('P01', DATAS[0], 5), ('P02', DATAS[2], 3)])
+
+    def test_indice_alertas(self):
+        avaliacao = avaliar({'P01': serie(sobrevivencia=[50.0] * 5, cobertura_invasoras=[30.0] * 5),
+                             'P02': serie(cobertura_invasoras=[30.0] * 5)})
+        indice = indice_alertas(avaliacao.alertas(DATAS[0]))
+        self.assertEqual({p: sorted(c) for p, c in indice.items()},
+                         {'P01': ['Invasoras', 'Sobrevivência'], 'P02': ['Invasoras']})
+
+    def test_condicao_desconhecida(self):
+        with self.assertRaises(ValueError):
+            Avaliador(regras_alerta=({'categoria': 'X', 'tipo': 'CRÍTICO', 'metrica': 'riqueza', 'condicao': '!=',
+                                      'limite': 'copa_min', 'mensagem': ''},))
+
+
+class TendenciasTest(unittest.TestCase):
+
+    def test_queda_seguida(self):
+        avaliacao = avaliar({'P01': serie(sobrevivencia=[95.0, 90.0, 85.0, 80.0, 82.0])})
+        self.assertEqual(avaliacao.alertas(DATAS[1]), [])
+        alerta, = avaliacao.alertas(DATAS[2])
+        self.assertEqual(alerta['categoria'], 'Tendência de sobrevivência')
+        self.assertEqual(alerta['mensagem'], 'Sobrevivência em queda há 3 campanhas (95.0% → 85.0%)')
+        self.assertIn('há 4 campanhas', avaliacao.alertas(DATAS[3])[0]['mensagem'])
+        ep, = avaliacao.historico('P01', 'Tendência de sobrevivência')
+        self.assertEqual((ep['inicio'], ep['fim'], ep['campanhas']), (DATAS[2], DATAS[4], 2))
+
+    def test_sequencia_reinicia_na_nova_parcela(self):
+        # a alta de P01 não continua na primeira campanha de P02
+        avaliacao = avaliar({'P01': serie(DATAS[:2], cobertura_invasoras=[10.0, 15.0]),
+                             'P02': serie(DATAS[2:], cobertura_invasoras=[12.0, 14.0, 16.0])})
+        self.assertEqual(avaliacao.alertas(DATAS[3]), [])
+        alerta, = avaliacao.alertas(DATAS[4])
+        self.assertEqual((alerta['parcela'], alerta['categoria']), ('P02', 'Tendência de invasoras'))
+
+
+if __name__ == '__main__':
+    unittest.main()